@@ -1,23 +1,28 @@
 # activity.py
 import pandas as pd
 import matplotlib.pyplot as plt
-import mplcursors
-
-def plot_activity_levels(cow_id, compare_with_cow_id=None, file_path=None):
-    # Close any previously opened figures
-    plt.close('all')
-
-    # Load the dataset with specified encoding
-    try:
-        data = pd.read_csv(file_path, encoding='utf-8')
-    except UnicodeDecodeError:
-        data = pd.read_csv(file_path, encoding='ISO-8859-1')  # Try an alternative encoding
-
-    # Extracting data for the specified cow ID and Group mean
-    columns_to_extract = ['Unnamed: 0', str(cow_id), 'Group mean']
+from cowindex import CowIndex
+from chartviews import POPOUT_FIGURES
+from downsampling import LevelOfDetail
+from hovertooltip import HoverTooltip
+from predictionstore import herd_predictions
+
+def load_activity_series(cow_id, compare_with_cow_id=None, file_path=None, job=None):
+    """
+    Loads and prepares the series plotted by draw_activity_levels. Safe to run in a worker thread.
+    """
+    # Extracting data for the specified cow ID and Group mean, reading only those columns through the cow index
+    herd_index = CowIndex(file_path)
+    columns_to_extract = [str(cow_id), 'Group mean']
     if compare_with_cow_id:
         columns_to_extract.append(str(compare_with_cow_id))
-    cow_data = data[columns_to_extract].copy()
+    for column in columns_to_extract:
+        if column not in herd_index:
+            raise KeyError(f"Cow ID {column} was not found in the activity data.")
+    if job is not None:
+        job.check()
+        job.report(0.5, "Reading activity data")
+    cow_data = herd_index.read(columns_to_extract)
     cow_data.columns = ['Date', 'Activity Level', 'Entire Cow Herd Activity Level'] + ([f'Cow {compare_with_cow_id} Activity Level'] if compare_with_cow_id else [])
 
     # Converting 'Date' to datetime format using .loc to avoid SettingWithCopyWarning
@@ -26,75 +31,80 @@ def plot_activity_levels(cow_id, compare_with_cow_id=None, file_path=None):
     # Calculate the week number from the start date
     cow_data['Week Number'] = ((cow_data['Date'] - cow_data['Date'].min()).dt.days // 7) + 1
 
+    # Next-day forecasts come from the prediction store, computed once per dataset and model version
+    try:
+        predictions = herd_predictions(file_path, job=job)
+    except (OSError, ValueError, KeyError) as error:
+        print(f"No activity forecasts: {error}")
+        predictions = None
+    if predictions is not None and str(cow_id) in predictions:
+        cow_data['Predicted Activity Level'] = predictions.on_dates(cow_id, cow_data['Date'])
+    return cow_data
+
+def plot_activity_levels(cow_id, compare_with_cow_id=None, file_path=None):
+    draw_activity_levels(load_activity_series(cow_id, compare_with_cow_id, file_path), cow_id, compare_with_cow_id)
+
+def draw_activity_levels(cow_data, cow_id, compare_with_cow_id=None):
+    # Builds the figures, must run on the Tk thread
     # Plotting the activity levels and group mean activity levels over time
     plt.style.use('dark_background')
 
     # Plot for the main cow ID
-    fig1, ax1 = plt.subplots(figsize=(12, 6))
-    cow_line, = ax1.plot(cow_data['Date'], cow_data['Activity Level'], linestyle='-', label=f'Cow {cow_id} Activity Level', color='blue')
-    group_line, = ax1.plot(cow_data['Date'], cow_data['Entire Cow Herd Activity Level'], linestyle='-', label='Entire Cow Herd Activity Level', color='red')
-
-    cow_marker = ax1.scatter(cow_data['Date'], cow_data['Activity Level'], color='blue', s=50, label=f'Cow {cow_id} Activity Level')
-    group_marker = ax1.scatter(cow_data['Date'], cow_data['Entire Cow Herd Activity Level'], color='red', s=50, label='Entire Cow Herd Activity Level')
+    # Pop-out figures come from a bounded pool, the oldest window is closed past its limit
+    fig1, ax1 = POPOUT_FIGURES.subplots(figsize=(12, 6))
+    # Lines are downsampled to the axes width, markers only appear once zoomed in
+    detail1 = LevelOfDetail(ax1, cow_data['Date'])
+    detail1.line(cow_data['Activity Level'], linestyle='-', label=f'Cow {cow_id} Activity Level', color='blue')
+    detail1.line(cow_data['Entire Cow Herd Activity Level'], linestyle='-', label='Entire Cow Herd Activity Level', color='red')
+    has_forecast = 'Predicted Activity Level' in cow_data
+    if has_forecast:
+        detail1.line(cow_data['Predicted Activity Level'], linestyle='--', label=f'Cow {cow_id} Predicted Activity Level', color='orange')
+
+    detail1.markers(cow_data['Activity Level'], color='blue', s=50, label=f'Cow {cow_id} Activity Level')
+    detail1.markers(cow_data['Entire Cow Herd Activity Level'], color='red', s=50, label='Entire Cow Herd Activity Level')
 
     ax1.set_title(f'Activity Levels of Cow ID {cow_id} vs Entire Cow Herd Activity Level')
     ax1.set_xlabel('Week Number')
     ax1.set_ylabel('Activity Level')
     ax1.grid(True, color='gray')
 
-    week_numbers = cow_data['Week Number'].unique()
-    week_labels = [f'Week {int(week)}' for week in week_numbers]
-    week_dates = cow_data['Date'].iloc[::7]
-    ax1.set_xticks(week_dates)
-    ax1.set_xticklabels(week_labels, rotation=45)
+    detail1.week_ticks(rotation=45)
 
     handles, labels = ax1.get_legend_handles_labels()
-    handles = [handles[0], handles[1]]
-    labels = [labels[0], labels[1]]
+    num_lines = 3 if has_forecast else 2
+    handles = handles[:num_lines]
+    labels = labels[:num_lines]
     ax1.legend(handles, labels)
 
     plt.tight_layout()
 
-    tooltip_labels = {
-        cow_marker: f'Cow {cow_id} Activity Level',
-        group_marker: 'Entire Cow Herd Activity Level',
-    }
-
-    cursor1 = mplcursors.cursor([cow_marker, group_marker], hover=True)
-    cursor1.connect("add", lambda sel: sel.annotation.set_text(
-        f'{tooltip_labels[sel.artist]}:\nDate: {cow_data["Date"].iloc[int(sel.index)].strftime("%Y-%m-%d")}\nActivity Level: {sel.target[1]:.2f}'
-    ))
-    cursor1.connect("add", lambda sel: sel.annotation.get_bbox_patch().set(
-        boxstyle="round,pad=0.3", edgecolor=sel.artist.get_edgecolor(), facecolor='black', alpha=1
-    ))
-    cursor1.connect("add", lambda sel: sel.annotation.arrow_patch.set(
-        arrowstyle='-|>', color='white'
-    ))
+    tooltip1 = HoverTooltip(ax1, cow_data['Date'], 'Activity Level')
+    tooltip1.add_series(f'Cow {cow_id} Activity Level', cow_data['Activity Level'], 'blue')
+    tooltip1.add_series('Entire Cow Herd Activity Level', cow_data['Entire Cow Herd Activity Level'], 'red')
+    if has_forecast:
+        tooltip1.add_series(f'Cow {cow_id} Predicted Activity Level', cow_data['Predicted Activity Level'], 'orange')
 
     # Show the first plot
     fig1.show()
 
     if compare_with_cow_id:
         # Plot for the comparison
-        fig2, ax2 = plt.subplots(figsize=(12, 6))
-        cow_line, = ax2.plot(cow_data['Date'], cow_data['Activity Level'], linestyle='-', label=f'Cow {cow_id} Activity Level', color='blue')
-        compare_line, = ax2.plot(cow_data['Date'], cow_data[f'Cow {compare_with_cow_id} Activity Level'], linestyle='-', label=f'Cow {compare_with_cow_id} Activity Level', color='lime')
-        group_line, = ax2.plot(cow_data['Date'], cow_data['Entire Cow Herd Activity Level'], linestyle='-', label='Entire Cow Herd Activity Level', color='red')
+        fig2, ax2 = POPOUT_FIGURES.subplots(figsize=(12, 6))
+        detail2 = LevelOfDetail(ax2, cow_data['Date'])
+        detail2.line(cow_data['Activity Level'], linestyle='-', label=f'Cow {cow_id} Activity Level', color='blue')
+        detail2.line(cow_data[f'Cow {compare_with_cow_id} Activity Level'], linestyle='-', label=f'Cow {compare_with_cow_id} Activity Level', color='lime')
+        detail2.line(cow_data['Entire Cow Herd Activity Level'], linestyle='-', label='Entire Cow Herd Activity Level', color='red')
 
-        cow_marker = ax2.scatter(cow_data['Date'], cow_data['Activity Level'], color='blue', s=50, label=f'Cow {cow_id} Activity Level')
-        compare_marker = ax2.scatter(cow_data['Date'], cow_data[f'Cow {compare_with_cow_id} Activity Level'], color='lime', s=50, label=f'Cow {compare_with_cow_id} Activity Level')
-        group_marker = ax2.scatter(cow_data['Date'], cow_data['Entire Cow Herd Activity Level'], color='red', s=50, label='Entire Cow Herd Activity Level')
+        detail2.markers(cow_data['Activity Level'], color='blue', s=50, label=f'Cow {cow_id} Activity Level')
+        detail2.markers(cow_data[f'Cow {compare_with_cow_id} Activity Level'], color='lime', s=50, label=f'Cow {compare_with_cow_id} Activity Level')
+        detail2.markers(cow_data['Entire Cow Herd Activity Level'], color='red', s=50, label='Entire Cow Herd Activity Level')
 
         ax2.set_title(f'Activity Levels of Cow ID {cow_id} vs Entire Cow Herd Activity Level vs Cow ID {compare_with_cow_id}')
         ax2.set_xlabel('Week Number')
         ax2.set_ylabel('Activity Level')
         ax2.grid(True, color='gray')
 
-        week_numbers = cow_data['Week Number'].unique()
-        week_labels = [f'Week {int(week)}' for week in week_numbers]
-        week_dates = cow_data['Date'].iloc[::7]
-        ax2.set_xticks(week_dates)
-        ax2.set_xticklabels(week_labels, rotation=45)
+        detail2.week_ticks(rotation=45)
 
         handles, labels = ax2.get_legend_handles_labels()
         handles = [handles[0], handles[1], handles[2]]
@@ -103,22 +113,10 @@ def plot_activity_levels(cow_id, compare_with_cow_id=None, file_path=None):
 
         plt.tight_layout()
 
-        tooltip_labels = {
-            cow_marker: f'Cow {cow_id} Activity Level',
-            group_marker: 'Entire Cow Herd Activity Level',
-            compare_marker: f'Cow {compare_with_cow_id} Activity Level'
-        }
-
-        cursor2 = mplcursors.cursor([cow_marker, group_marker, compare_marker], hover=True)
-        cursor2.connect("add", lambda sel: sel.annotation.set_text(
-            f'{tooltip_labels[sel.artist]}:\nDate: {cow_data["Date"].iloc[int(sel.index)].strftime("%Y-%m-%d")}\nActivity Level: {sel.target[1]:.2f}'
-        ))
-        cursor2.connect("add", lambda sel: sel.annotation.get_bbox_patch().set(
-            boxstyle="round,pad=0.3", edgecolor=sel.artist.get_edgecolor(), facecolor='black', alpha=1
-        ))
-        cursor2.connect("add", lambda sel: sel.annotation.arrow_patch.set(
-            arrowstyle='-|>', color='white'
-        ))
+        tooltip2 = HoverTooltip(ax2, cow_data['Date'], 'Activity Level')
+        tooltip2.add_series(f'Cow {cow_id} Activity Level', cow_data['Activity Level'], 'blue')
+        tooltip2.add_series('Entire Cow Herd Activity Level', cow_data['Entire Cow Herd Activity Level'], 'red')
+        tooltip2.add_series(f'Cow {compare_with_cow_id} Activity Level', cow_data[f'Cow {compare_with_cow_id} Activity Level'], 'lime')
 
         # Show the second plot
         fig2.show()
@@ -0,0 +1,159 @@
+# backgroundjobs.py
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_MS = 50  # How often the Tk thread checks for finished jobs
+
+class JobCancelled(Exception):
+    pass
+
+class JobContext:
+    """
+    Handed to a job function so it can report progress and stop early when cancelled.
+    """
+
+    def __init__(self, key, progress_queue):
+        self.key = key
+        self._cancel_event = threading.Event()
+        self._progress_queue = progress_queue
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check(self):
+        # Call between steps, raises JobCancelled once the job was cancelled
+        if self._cancel_event.is_set():
+            raise JobCancelled(self.key)
+
+    def report(self, fraction, message=""):
+        self._progress_queue.put((self, fraction, message))
+
+class _Job:
+    def __init__(self, key, signature, future, context, on_done, on_error, on_progress):
+        self.key = key
+        self.signature = signature
+        self.future = future
+        self.context = context
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+
+class BackgroundJobs:
+    """
+    Runs data loading and figure preparation off the Tk thread.
+
+    Results and progress are handed back on the Tk thread by polling with root.after(), so the
+    callbacks can touch widgets. Jobs are keyed: submitting the same key and arguments again while
+    the job is still running returns the running job instead of queuing a duplicate load, and
+    submitting the same key with new arguments cancels the older job.
+    """
+
+    def __init__(self, root, max_workers=2, poll_ms=POLL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dashboard-job")
+        self._jobs = {}
+        self._progress = queue.Queue()
+        self._polling = False
+
+    def submit(self, key, func, *args, on_done=None, on_error=None, on_progress=None, **kwargs):
+        """
+        Runs func(*args, job=context, **kwargs) in a worker thread.
+
+        Parameters:
+        - key: hashable name of the action, e.g. "visualize", used for coalescing and cancellation.
+        - func: the function to run, it receives the JobContext as the 'job' keyword argument.
+        - on_done: called on the Tk thread with the result.
+        - on_error: called on the Tk thread with the exception (not called for cancelled jobs).
+        - on_progress: called on the Tk thread with (fraction, message).
+
+        Returns:
+        - context: the JobContext of the running (or coalesced) job.
+        """
+        signature = (func, args, tuple(sorted(kwargs.items())))
+        running = self._jobs.get(key)
+        if running is not None and not running.future.done():
+            if running.signature == signature and not running.context.cancelled():
+                return running.context  # Repeated click, keep the load that is already running
+            self.cancel(key)
+
+        context = JobContext(key, self._progress)
+        future = self._executor.submit(func, *args, job=context, **kwargs)
+        self._jobs[key] = _Job(key, signature, future, context, on_done, on_error, on_progress)
+        self._start_polling()
+        return context
+
+    def cancel(self, key):
+        job = self._jobs.pop(key, None)
+        if job is not None:
+            job.context.cancel()
+            job.future.cancel()
+
+    def is_running(self, key):
+        job = self._jobs.get(key)
+        return job is not None and not job.future.done()
+
+    def shutdown(self):
+        for key in list(self._jobs):
+            self.cancel(key)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _start_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        try:
+            # Progress first, only for jobs that are still current
+            while True:
+                try:
+                    context, fraction, message = self._progress.get_nowait()
+                except queue.Empty:
+                    break
+                job = self._jobs.get(context.key)
+                if job is not None and job.context is context and job.on_progress:
+                    self._run_callback(job, job.on_progress, fraction, message)
+
+            for key, job in list(self._jobs.items()):
+                if not job.future.done():
+                    continue
+                del self._jobs[key]
+                if job.context.cancelled() or job.future.cancelled():
+                    continue
+                error = job.future.exception()
+                if error is None:
+                    if job.on_done:
+                        self._run_callback(job, job.on_done, job.future.result())
+                elif not isinstance(error, JobCancelled) and job.on_error:
+                    self._run_callback(job, job.on_error, error)
+        finally:
+            # Keep polling for the other jobs whatever a callback did
+            if self._jobs:
+                self.root.after(self.poll_ms, self._poll)
+            else:
+                self._polling = False
+
+    def _run_callback(self, job, callback, *args):
+        # A failing callback, e.g. one touching a closed window, must not stop the other jobs from delivering
+        try:
+            callback(*args)
+        except Exception:
+            print(f"Error in a callback of background job '{job.key}':")
+            traceback.print_exc()
+
+def get_background_jobs(widget):
+    """
+    Returns the BackgroundJobs shared by every window of the application the widget belongs to.
+    """
+    root = widget._root()
+    jobs = getattr(root, '_background_jobs', None)
+    if jobs is None:
+        jobs = BackgroundJobs(root)
+        root._background_jobs = jobs
+    return jobs
@@ -0,0 +1,156 @@
+# backtesting.py
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from batchstream import WindowDataset
+from forecasting import evaluate_forecaster, make_forecaster
+
+BACKTEST_WINDOWS = ('expanding', 'sliding')
+
+_worker_matrix = None
+_worker_memory = None
+
+def rolling_origin_folds(num_windows, num_folds=5, test_size=None, min_train_size=None, window='expanding', gap=0):
+    """
+    Temporal folds over the window starts: every fold trains on windows before its test block.
+
+    The test blocks are consecutive and end at the last window. With window='expanding' each fold
+    trains on everything before its test block, with 'sliding' on the min_train_size windows just
+    before it. Folds are index ranges, nothing is copied.
+
+    Parameters:
+    - num_windows: int, number of windows in the dataset.
+    - num_folds: int, number of folds.
+    - test_size: int, windows per test block (default shares the windows after min_train_size between the
+      folds, or splits all of them into num_folds + 1 blocks).
+    - min_train_size: int, windows in the first training set, and in every one with 'sliding'.
+    - window: str, 'expanding' or 'sliding'.
+    - gap: int, windows left out between training and test, e.g. to skip days a forecast could not use yet.
+
+    Returns:
+    - folds: list of dicts with the fold number and its 'train' and 'test' ranges of window positions.
+    """
+    if window not in BACKTEST_WINDOWS:
+        raise ValueError(f"Unknown window '{window}', expected one of {BACKTEST_WINDOWS}.")
+    if not test_size:
+        test_size = (num_windows - min_train_size - gap) // num_folds if min_train_size else num_windows // (num_folds + 1)
+    first_test = num_windows - num_folds * test_size
+    min_train_size = min_train_size or first_test - gap
+    if test_size < 1 or min_train_size < 1 or first_test - gap < min_train_size:
+        raise ValueError(f"{num_windows} windows are too few for {num_folds} folds of {test_size} test windows "
+                         f"and at least {max(min_train_size, 1)} training windows.")
+
+    folds = []
+    for fold in range(num_folds):
+        test_start = first_test + fold * test_size
+        train_stop = test_start - gap
+        train_start = 0 if window == 'expanding' else train_stop - min_train_size
+        folds.append({'fold': fold, 'train': range(train_start, train_stop), 'test': range(test_start, test_start + test_size)})
+    return folds
+
+def _attach(source):
+    # Worker initializer: maps the base matrix once per process, from shared memory or the .npy file
+    global _worker_matrix, _worker_memory
+    kind, location, shape, dtype, offset = source
+    if kind == 'shared_memory':
+        _worker_memory = shared_memory.SharedMemory(name=location)
+        _worker_matrix = np.ndarray(shape, dtype=dtype, buffer=_worker_memory.buf)
+    else:
+        _worker_matrix = np.memmap(location, dtype=dtype, mode='r', shape=shape, offset=offset)
+
+def _evaluate_fold(fold, sequence_length, model, options, matrix=None):
+    matrix = _worker_matrix if matrix is None else matrix
+    train_dataset = WindowDataset(matrix, sequence_length, np.arange(fold['train'].start, fold['train'].stop))
+    test_dataset = WindowDataset(matrix, sequence_length, np.arange(fold['test'].start, fold['test'].stop))
+    start = time.perf_counter()
+    forecaster = make_forecaster(model, **options).fit(train_dataset)
+    fit_seconds = time.perf_counter() - start
+    metrics = evaluate_forecaster(forecaster, test_dataset)
+    return {
+        'fold': fold['fold'],
+        'train_start': fold['train'].start,
+        'train_stop': fold['train'].stop,
+        'test_start': fold['test'].start,
+        'test_stop': fold['test'].stop,
+        'mae': metrics['mae'],
+        'rmse': metrics['rmse'],
+        'persistence_mae': metrics['persistence_mae'],
+        'fit_seconds': fit_seconds,
+        'train_samples_per_sec': forecaster.fit_stats['samples_per_sec'],
+        'seconds': time.perf_counter() - start,
+    }
+
+def backtest(matrix, sequence_length, folds, model='ridge', max_workers=None, **options):
+    """
+    Fits and scores a model on every fold, the folds in parallel worker processes.
+
+    The workers share one copy of the base matrix: a memory-mapped .npy file is mapped again by
+    each worker, any other array is copied once into shared memory. Every fold only gathers its
+    own mini-batches from it.
+
+    Parameters:
+    - matrix: numpy array or memmap of shape (num_rows, num_features).
+    - sequence_length: int, the length of each window.
+    - folds: list from rolling_origin_folds.
+    - model: str, one of forecasting.FORECAST_MODELS.
+    - max_workers: int, worker processes (default one per CPU, 1 runs the folds in this process).
+    - options: passed to the model, e.g. epochs for 'conv'.
+
+    Returns:
+    - table: pandas DataFrame with one row of metrics and timings per fold.
+    """
+    if max_workers == 1:
+        rows = [_evaluate_fold(fold, sequence_length, model, options, matrix) for fold in folds]
+        return pd.DataFrame(rows).set_index('fold')
+
+    memory = None
+    if isinstance(matrix, np.memmap) and matrix.filename and matrix.flags.c_contiguous:
+        source = ('memmap', matrix.filename, matrix.shape, matrix.dtype.str, matrix.offset)
+    else:
+        matrix = np.ascontiguousarray(matrix)
+        memory = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+        np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=memory.buf)[...] = matrix
+        source = ('shared_memory', memory.name, matrix.shape, matrix.dtype.str, 0)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach, initargs=(source,)) as executor:
+            rows = list(executor.map(_evaluate_fold, folds, [sequence_length] * len(folds), [model] * len(folds), [options] * len(folds)))
+    finally:
+        if memory is not None:
+            memory.close()
+            memory.unlink()
+    return pd.DataFrame(rows).set_index('fold')
+
+def backtest_windowed_data(data_dir='.', model='ridge', num_folds=5, window='expanding', max_workers=None, **options):
+    """
+    Backtests a model on the windows saved by timeseriesformatting.py, memory-mapped from data_dir.
+
+    Returns:
+    - table: pandas DataFrame with one row per fold, see backtest.
+    """
+    from traincode import load_windowed_data
+
+    activity_matrix, _, sequence_length = load_windowed_data(data_dir)
+    folds = rolling_origin_folds(len(activity_matrix) - sequence_length, num_folds, window=window)
+    return backtest(activity_matrix, sequence_length, folds, model, max_workers, **options)
+
+if __name__ == "__main__":
+    from gapfill import fill_gaps
+    from syntheticherd import make_herd_data
+
+    # A synthetic herd scaled to [0, 1] like the preprocessed data
+    values, _ = fill_gaps(make_herd_data(300, 730).iloc[:, 1:].to_numpy(dtype=np.float64), 'linear')
+    value_min, value_max = values.min(axis=0), values.max(axis=0)
+    matrix = ((values - value_min) / np.where(value_max > value_min, value_max - value_min, 1.0)).astype(np.float32)
+    sequence_length = 30
+    folds = rolling_origin_folds(len(matrix) - sequence_length, num_folds=20, test_size=14)
+
+    for workers in sorted({1, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        table = backtest(matrix, sequence_length, folds, 'ridge', max_workers=workers)
+        print(f"{len(folds)} folds with {workers} worker(s): {time.perf_counter() - start:.2f}s wall, "
+              f"{table['seconds'].sum():.2f}s of fold time")
+    print(table[['train_start', 'train_stop', 'test_start', 'test_stop', 'mae', 'persistence_mae']].to_string())
+    print(f"Mean MAE {table['mae'].mean():.4f} +/- {table['mae'].std():.4f} (repeating the last day: {table['persistence_mae'].mean():.4f})")
@@ -0,0 +1,216 @@
+# batchstream.py
+import copy
+import queue
+import threading
+import numpy as np
+from slidingwindows import column_windows
+
+class WindowDataset:
+    """
+    Sequence windows over a base matrix that are only materialised one mini-batch at a time.
+
+    Window i covers rows i .. i + sequence_length - 1 of the matrix and its target is row
+    i + sequence_length. The matrix can be a memory-mapped .npy file, so the full
+    (num_sequences, sequence_length, num_features) tensor never has to exist.
+    """
+
+    def __init__(self, matrix, sequence_length, indices=None):
+        """
+        Parameters:
+        - matrix: numpy array (or memmap) of shape (num_rows, num_features).
+        - sequence_length: int, the length of each sequence.
+        - indices: optional array of window start rows to restrict the dataset to, e.g. a train split.
+        """
+        if matrix.ndim != 2:
+            raise ValueError(f"Expected a 2D matrix, got shape {matrix.shape}.")
+        self.matrix = matrix
+        self.sequence_length = sequence_length
+        num_sequences = max(len(matrix) - sequence_length, 0)
+        if indices is None:
+            indices = np.arange(num_sequences)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        if len(self.indices) and (self.indices.min() < 0 or self.indices.max() >= num_sequences):
+            raise IndexError("Window indices fall outside the matrix.")
+        self._offsets = np.arange(sequence_length)
+
+    def __len__(self):
+        return len(self.indices)
+
+    @property
+    def num_features(self):
+        return self.matrix.shape[1]
+
+    def subset(self, positions):
+        # Positions are relative to this dataset, the result shares the same matrix
+        return WindowDataset(self.matrix, self.sequence_length, self.indices[positions])
+
+    def take(self, positions):
+        """
+        Gathers a mini-batch of windows and targets.
+
+        Parameters:
+        - positions: array of positions within this dataset.
+
+        Returns:
+        - X: numpy array of shape (batch_size, sequence_length, num_features).
+        - y: numpy array of shape (batch_size, num_features).
+        """
+        starts = self.indices[positions]
+        X = self.matrix[starts[:, None] + self._offsets]
+        y = self.matrix[starts + self.sequence_length]
+        return X, y
+
+class CowWindowDataset:
+    """
+    One sample per (cow, window) pair, so a single model serves every cow and new cows alike.
+
+    A sample has shape (sequence_length, channels): the cow's own readings, the group mean of the
+    same days and optionally the cow's temperature. Its target is the cow's reading the day after.
+    Every channel is a strided view over the cows x days matrices, so the num_cows * num_windows
+    samples exist only as indices. Samples are numbered window by window (window * num_cows + cow),
+    so a temporal split is a range of them and a shuffled mini-batch mixes cows.
+    """
+
+    per_cow = True  # take returns ready samples, not herd windows
+
+    def __init__(self, matrix, sequence_length, num_cows=None, group_column=-1, temperature=None, indices=None):
+        """
+        Parameters:
+        - matrix: numpy array (or memmap) of shape (num_rows, num_features) with the cow columns first.
+        - sequence_length: int, the length of each sequence.
+        - num_cows: int, number of cow columns (default is every column except the group mean).
+        - group_column: int, column of the group mean, or None for no group mean channel.
+        - temperature: optional numpy array of shape (num_rows, num_cows), the same days and cows.
+        - indices: optional array of sample numbers to restrict the dataset to, e.g. a train split.
+        """
+        if matrix.ndim != 2:
+            raise ValueError(f"Expected a 2D matrix, got shape {matrix.shape}.")
+        if num_cows is None:
+            num_cows = matrix.shape[1] - (group_column is not None)
+        if group_column is not None and group_column % matrix.shape[1] < num_cows:
+            raise ValueError("The group mean column must come after the cow columns.")
+        if temperature is not None and temperature.shape != (len(matrix), num_cows):
+            raise ValueError(f"Expected temperature of shape {(len(matrix), num_cows)}, got {temperature.shape}.")
+        self.matrix = matrix
+        self.sequence_length = sequence_length
+        self.num_cows = num_cows
+        self.num_windows = max(len(matrix) - sequence_length, 0)
+
+        self.channels = [column_windows(matrix, sequence_length, 0, num_cows)]
+        if group_column is not None:
+            self.channels.append(column_windows(matrix, sequence_length, group_column, num_cows, column_step=0))
+        if temperature is not None:
+            self.channels.append(column_windows(temperature, sequence_length, 0, num_cows))
+        self.targets = matrix[sequence_length:sequence_length + self.num_windows, :num_cows].T
+
+        num_samples = num_cows * self.num_windows
+        if indices is None:
+            indices = np.arange(num_samples)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        if len(self.indices) and (self.indices.min() < 0 or self.indices.max() >= num_samples):
+            raise IndexError("Sample indices fall outside the matrix.")
+
+    def __len__(self):
+        return len(self.indices)
+
+    @property
+    def num_channels(self):
+        return len(self.channels)
+
+    def window_samples(self, start, stop):
+        # Sample numbers of every cow in windows start .. stop - 1
+        return np.arange(start * self.num_cows, stop * self.num_cows)
+
+    def subset(self, positions):
+        # The subset shares the channel views
+        subset = copy.copy(self)
+        subset.indices = self.indices[positions]
+        return subset
+
+    def take(self, positions):
+        """
+        Gathers a mini-batch of samples and targets.
+
+        Parameters:
+        - positions: array of positions within this dataset.
+
+        Returns:
+        - X: numpy array of shape (batch_size, sequence_length, channels).
+        - y: numpy array of shape (batch_size,).
+        """
+        windows, cows = np.divmod(self.indices[positions], self.num_cows)
+        X = np.stack([channel[cows, windows] for channel in self.channels], axis=2)
+        return X, self.targets[cows, windows]
+
+def _batch_positions(num_samples, batch_size, shuffle, seed, drop_last):
+    order = np.random.default_rng(seed).permutation(num_samples) if shuffle else np.arange(num_samples)
+    stop = num_samples - num_samples % batch_size if drop_last else num_samples
+    for start in range(0, stop, batch_size):
+        yield order[start:start + batch_size]
+
+def iterate_batches(dataset, batch_size=32, shuffle=False, seed=None, drop_last=False, prefetch=0):
+    """
+    Yields (X, y) mini-batches from a dataset such as WindowDataset.
+
+    Parameters:
+    - dataset: object with __len__ and take(positions) returning (X, y).
+    - batch_size: int, number of sequences per batch.
+    - shuffle: bool, draw the windows in a random order instead of temporal order (default is False).
+    - seed: optional int seed for the shuffle.
+    - drop_last: bool, skip the final batch when it is smaller than batch_size (default is False).
+    - prefetch: int, number of batches to prepare ahead in a background thread, 0 disables it.
+
+    Yields:
+    - X: numpy array of shape (batch_size, sequence_length, num_features).
+    - y: numpy array of shape (batch_size, num_features).
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1.")
+    batches = _batch_positions(len(dataset), batch_size, shuffle, seed, drop_last)
+
+    if prefetch <= 0:
+        for positions in batches:
+            yield dataset.take(positions)
+        return
+
+    yield from _prefetched(dataset, batches, prefetch)
+
+_DONE = object()
+
+def _prefetched(dataset, batches, prefetch):
+    buffer = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+
+    def put(item):
+        # Gives up once the consumer has stopped, so a full buffer never blocks the thread
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for positions in batches:
+                if not put(dataset.take(positions)):
+                    return
+            put(_DONE)
+        except BaseException as error:
+            put(error)
+
+    worker = threading.Thread(target=producer, name="batch-prefetch", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Unblock the producer when the consumer stops early
+        stop.set()
+        worker.join(timeout=1)
@@ -0,0 +1,195 @@
+# benchmarksuite.py
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import warnings
+import numpy as np
+import pandas as pd
+from datacache import clear_cache
+from preprocessing import (apply_normalization, handle_missing_values, identify_and_handle_outliers, label_date_column,
+                           load_data, process_sensor_data, remove_duplicates)
+from syntheticherd import FIRST_COW_ID, write_herd_files
+from timeseriesformatting import create_activity_sequences, determine_dynamic_sequence_length
+from traincode import train_test_split_temporal
+
+BENCHMARK_HISTORY_FILE = 'benchmark_history.json'
+REGRESSION_FACTOR = 1.2  # Slower than the previous run of the same configuration by more than this is reported
+
+def measure(func, repeats=3):
+    """
+    Best wall time over the repeats, then the peak traced memory of one more run.
+
+    Memory is traced in its own run because tracemalloc slows the code down.
+
+    Returns:
+    - seconds: float, the best time.
+    - peak_bytes: int, the largest memory traced at once while func ran.
+    """
+    seconds = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak_bytes
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+@contextlib.contextmanager
+def _in_directory(path):
+    # The stages keep their parsed-data cache in the working directory
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+def _plot_construction(file_path, cow_id):
+    # Builds and renders the activity chart once, off screen
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from activity import plot_activity_levels
+
+    def build():
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # fig.show() warns on the non-interactive backend
+            plot_activity_levels(cow_id, file_path=file_path)
+            for number in plt.get_fignums():
+                plt.figure(number).canvas.draw()
+        plt.close('all')
+    return build
+
+def run_benchmarks(num_cows=300, num_days=730, missing_rate=0.02, outlier_rate=0.001, repeats=3, seed=0):
+    """
+    Times and memory-profiles the pipeline stages on a synthetic herd.
+
+    Parameters:
+    - num_cows, num_days, missing_rate, outlier_rate, seed: shape of the synthetic herd (see syntheticherd.py).
+    - repeats: int, timing repeats per benchmark, the best one is kept.
+
+    Returns:
+    - results: dict of benchmark name -> {'seconds', 'peak_bytes'}.
+    """
+    results = {}
+
+    def record(name, func):
+        seconds, peak_bytes = measure(func, repeats)
+        results[name] = {'seconds': seconds, 'peak_bytes': peak_bytes}
+
+    with tempfile.TemporaryDirectory() as work_dir, _in_directory(work_dir), contextlib.redirect_stdout(io.StringIO()):
+        file_path = write_herd_files(work_dir, num_cows, num_days, missing_rate, outlier_rate, seed=seed)['activity']
+
+        def cold_load():
+            clear_cache()
+            return load_data(file_path)
+        record('load_data_cold', cold_load)
+        record('load_data_cached', lambda: load_data(file_path))
+
+        # Each cleaning step runs on a fresh copy of the frame the step before it produces
+        raw = label_date_column(load_data(file_path))
+        record('handle_missing_values', lambda: handle_missing_values(raw.copy()))
+        filled, _ = handle_missing_values(raw.copy())
+        record('remove_duplicates', lambda: remove_duplicates(filled.copy()))
+        record('identify_and_handle_outliers', lambda: identify_and_handle_outliers(filled.copy()))
+        capped, _ = identify_and_handle_outliers(filled.copy())
+        record('apply_normalization', lambda: apply_normalization(capped.copy()))
+        normalized, _ = apply_normalization(capped.copy())
+        record('process_sensor_data', lambda: process_sensor_data(file_path, 'activity', work_dir))
+
+        activity_data = normalized.drop(columns=['date'])
+        sequence_length = determine_dynamic_sequence_length(activity_data)
+        record('create_activity_sequences', lambda: create_activity_sequences(activity_data, sequence_length))
+        record('create_activity_sequences_copy', lambda: create_activity_sequences(activity_data, sequence_length, copy=True))
+        X, y, _ = create_activity_sequences(activity_data, sequence_length)
+        record('train_test_split_temporal', lambda: train_test_split_temporal(X, y))
+
+        record('plot_activity_levels', _plot_construction(file_path, str(FIRST_COW_ID)))
+        clear_cache()
+    return results
+
+def load_history(history_path=BENCHMARK_HISTORY_FILE):
+    if os.path.exists(history_path):
+        with open(history_path, 'r') as f:
+            return json.load(f)
+    return []
+
+def append_history(record, history_path=BENCHMARK_HISTORY_FILE):
+    history = load_history(history_path)
+    history.append(record)
+    with open(history_path + '.tmp', 'w') as f:
+        json.dump(history, f, indent=2)
+    os.replace(history_path + '.tmp', history_path)
+    return history
+
+def compare_with_previous(record, history):
+    """
+    Compares a run with the latest earlier run of the same configuration.
+
+    Returns:
+    - changes: dict of benchmark name -> time ratio to the previous run (above 1 is slower).
+    - regressions: list of the benchmarks slower than REGRESSION_FACTOR times the previous run.
+    """
+    previous = next((run for run in reversed(history) if run is not record and run['config'] == record['config']), None)
+    if previous is None:
+        return {}, []
+    changes = {}
+    for name, result in record['results'].items():
+        before = previous['results'].get(name)
+        if before and before['seconds'] > 0:
+            changes[name] = result['seconds'] / before['seconds']
+    return changes, [name for name, ratio in changes.items() if ratio > REGRESSION_FACTOR]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the data pipeline on a synthetic herd and appends the results to a JSON history.")
+    parser.add_argument('--cows', type=int, default=300, help="number of cows (default: 300)")
+    parser.add_argument('--days', type=int, default=730, help="number of days (default: 730)")
+    parser.add_argument('--missing-rate', type=float, default=0.02, help="share of missing readings (default: 0.02)")
+    parser.add_argument('--outlier-rate', type=float, default=0.001, help="share of outlier readings (default: 0.001)")
+    parser.add_argument('--repeats', type=int, default=3, help="timing repeats, the best one is kept (default: 3)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the synthetic herd (default: 0)")
+    parser.add_argument('--history', default=BENCHMARK_HISTORY_FILE, help=f"JSON history file (default: {BENCHMARK_HISTORY_FILE})")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    config = {'cows': args.cows, 'days': args.days, 'missing_rate': args.missing_rate, 'outlier_rate': args.outlier_rate,
+              'repeats': args.repeats, 'seed': args.seed}
+    record = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'config': config,
+        'results': run_benchmarks(args.cows, args.days, args.missing_rate, args.outlier_rate, args.repeats, args.seed),
+    }
+    history = append_history(record, args.history)
+    changes, regressions = compare_with_previous(record, history)
+
+    print(f"{args.cows} cows x {args.days} days, missing {args.missing_rate:.1%}, outliers {args.outlier_rate:.2%}:")
+    for name, result in record['results'].items():
+        change = f" ({changes[name]:.2f}x previous)" if name in changes else ""
+        print(f"  {name}: {result['seconds'] * 1000:.2f}ms, peak {result['peak_bytes'] / 1e6:.1f} MB{change}")
+    if regressions:
+        print(f"Slower than {REGRESSION_FACTOR}x the previous run: {', '.join(regressions)}")
+    print(f"History: {args.history} ({len(history)} runs)")
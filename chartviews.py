@@ -0,0 +1,210 @@
+# chartviews.py
+import numpy as np
+import matplotlib.pyplot as plt
+from downsampling import LevelOfDetail
+from hovertooltip import HoverTooltip
+
+POPOUT_LIMIT = 4  # Pop-out chart windows kept open at once, the oldest one is closed beyond this
+
+# Columns, labels and colours of the cow charts, per data type
+CHART_SERIES = {
+    'activity': {
+        'value_name': 'Activity Level',
+        'value_column': 'Activity Level',
+        'group_column': 'Entire Cow Herd Activity Level',
+        'compare_column': 'Cow {} Activity Level',
+        'cow_label': 'Cow {} Activity Level',
+        'group_label': 'Entire Cow Herd Activity Level',
+        'title': 'Activity Levels of Cow ID {} vs Entire Cow Herd Activity Level',
+        'colors': ('blue', 'red', 'lime'),
+        'prediction_column': 'Predicted Activity Level',  # From the prediction store, when a forecaster is saved
+        'prediction_label': 'Cow {} Predicted Activity Level',
+    },
+    'temperature': {
+        'value_name': 'Temperature',
+        'value_column': 'Temperature',
+        'group_column': 'Group Mean',
+        'compare_column': 'Cow {} Temperature',
+        'cow_label': 'Cow {} Temperature Data',
+        'group_label': 'Entire Cow Herd Temperature Data',
+        'title': 'Temperature Levels of Cow ID {} vs Entire Cow Herd Temperature Data',
+        'colors': ('#0000FF', 'red', 'lime'),
+    },
+}
+
+_chart_views = {}
+
+class CowChartView:
+    """
+    A cow chart drawn into one of the figures embedded in the main window.
+
+    The line and marker artists are created once and only get new data when another cow is shown.
+    They are animated, i.e. left out of full redraws and blitted over a cached background of the
+    axes, grid and ticks. Switching cows therefore only redraws the lines, unless the dates or the
+    value range change. The y-axis only grows while the same dates are shown, so cows of one herd
+    share a scale.
+    """
+
+    def __init__(self, figure, canvas, data_type):
+        self.figure = figure
+        self.canvas = canvas
+        self.ax = figure.axes[0]
+        self.series = CHART_SERIES[data_type]
+        self._background = None
+        self._dates = None
+        self.detail = None
+        self.canvas.mpl_connect('draw_event', lambda event: self._on_draw())
+
+    def _create_artists(self):
+        # Done on the first cow, until then the placeholder axes of the main window stay as they are
+        self.ax.set_xlabel('Week Number', color='white')
+        self.ax.set_ylabel(self.series['value_name'], color='white')
+        self.figure.subplots_adjust(bottom=0.2)
+        self.title = self.ax.set_title('', color='white')
+
+        self.detail = LevelOfDetail(self.ax, [])
+        cow_color, group_color, compare_color = self.series['colors']
+        self.cow_line = self.detail.line([], color=cow_color)
+        self.group_line = self.detail.line([], color=group_color)
+        self.compare_line = self.detail.line([], color=compare_color)
+        self.prediction_line = self.detail.line([], color='orange', linestyle='--')
+        self.markers = [self.detail.markers([], color=color, s=20) for color in self.series['colors']]
+        self.tooltip = HoverTooltip(self.ax, [], self.series['value_name'], redraw=self.blit)
+
+        for artist in [self.title, self.cow_line, self.group_line, self.compare_line, self.prediction_line] + self.markers:
+            artist.set_animated(True)
+
+    def show(self, cow_data, cow_id, compare_with_cow_id=None):
+        """
+        Shows a cow (and optionally a second cow) against the herd, reusing the existing artists.
+
+        Parameters:
+        - cow_data: DataFrame from load_activity_series / load_temperature_series.
+        - cow_id: the cow shown.
+        - compare_with_cow_id: a second cow to show, or None.
+        """
+        if self.detail is None:
+            self._create_artists()
+        dates = cow_data['Date'].to_numpy(dtype='datetime64[ns]')
+        new_dates = self._dates is None or not np.array_equal(self._dates, dates)
+        self._dates = dates
+        self.detail.set_dates(dates)
+        self.tooltip.set_dates(dates)
+
+        cow_color, group_color, compare_color = self.series['colors']
+        shown = [
+            (self.cow_line, self.markers[0], cow_data[self.series['value_column']], self.series['cow_label'].format(cow_id), cow_color),
+            (self.group_line, self.markers[1], cow_data[self.series['group_column']], self.series['group_label'], group_color),
+        ]
+        if compare_with_cow_id:
+            shown.append((self.compare_line, self.markers[2], cow_data[self.series['compare_column'].format(compare_with_cow_id)],
+                          self.series['cow_label'].format(compare_with_cow_id), compare_color))
+        else:
+            self.detail.set_values(self.compare_line, np.full(len(dates), np.nan))
+            self.detail.set_values(self.markers[2], np.full(len(dates), np.nan))
+        self.compare_line.set_visible(bool(compare_with_cow_id))
+        self.markers[2].set_visible(bool(compare_with_cow_id))
+
+        for line, marker, values, label, color in shown:
+            self.detail.set_values(line, values)
+            self.detail.set_values(marker, values)
+            line.set_label(label)
+            self.tooltip.add_series(label, values, color)
+
+        # Forecast overlay, read from the loaded data rather than computed here
+        prediction_column = self.series.get('prediction_column')
+        has_forecast = prediction_column is not None and prediction_column in cow_data
+        self.detail.set_values(self.prediction_line, cow_data[prediction_column] if has_forecast else np.full(len(dates), np.nan))
+        self.prediction_line.set_visible(has_forecast)
+        legend_lines = [line for line, *_ in shown]
+        if has_forecast:
+            label = self.series['prediction_label'].format(cow_id)
+            self.prediction_line.set_label(label)
+            self.tooltip.add_series(label, cow_data[prediction_column], 'orange')
+            legend_lines.append(self.prediction_line)
+
+        title = self.series['title'].format(cow_id)
+        if compare_with_cow_id:
+            title += f' vs Cow ID {compare_with_cow_id}'
+        self.title.set_text(title)
+        legend = self.ax.legend(handles=legend_lines, facecolor='black', edgecolor='white', labelcolor='white', fontsize='small')
+        legend.set_animated(True)
+
+        limits_changed = self._update_limits(shown, new_dates)
+        self.detail.refresh(redraw=False)
+        if limits_changed:
+            self.canvas.draw_idle()  # New axes range, the background has to be drawn again
+        else:
+            self.blit()
+
+    def blit(self):
+        # Redraw only the animated artists over the cached background
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_animated()
+        self.canvas.blit(self.figure.bbox)
+
+    def _update_limits(self, shown, new_dates):
+        values = np.concatenate([np.asarray(values, dtype=np.float64) for _, _, values, _, _ in shown])
+        if not len(values) or np.isnan(values).all():
+            return False
+        low, high = np.nanmin(values), np.nanmax(values)
+        margin = 0.05 * (high - low) or 1.0
+        low, high = low - margin, high + margin
+        current_low, current_high = self.ax.get_ylim()
+        if not new_dates:
+            if current_low <= low and high <= current_high:
+                return False
+            low, high = min(low, current_low), max(high, current_high)
+        self.ax.set_ylim(low, high)
+        if new_dates:
+            self.ax.set_xlim(self.detail.x[0], self.detail.x[-1])
+            self.detail.week_ticks(rotation=45)
+        return True
+
+    def _on_draw(self):
+        # Full redraw: keep the static part, then put the animated artists on top
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox) if self.canvas.supports_blit else None
+        self._draw_animated()
+
+    def _draw_animated(self):
+        if self.detail is None:
+            return
+        for artist in [self.title, self.group_line, self.cow_line, self.compare_line, self.prediction_line] + self.markers + [self.ax.get_legend(), self.tooltip.annotation]:
+            if artist is not None:
+                self.ax.draw_artist(artist)
+
+class FigurePool:
+    """
+    Hands out pop-out figures, closing the least recently opened one once max_figures are open,
+    so repeated visualisations neither pile up windows nor memory.
+    """
+
+    def __init__(self, max_figures=POPOUT_LIMIT):
+        self.max_figures = max_figures
+        self._figures = []
+
+    def subplots(self, figsize=(12, 6)):
+        self._figures = [figure for figure in self._figures if plt.fignum_exists(figure.number)]
+        while len(self._figures) >= self.max_figures:
+            plt.close(self._figures.pop(0))
+        fig, ax = plt.subplots(figsize=figsize)
+        self._figures.append(fig)
+        return fig, ax
+
+POPOUT_FIGURES = FigurePool()
+
+def register_chart_view(data_type, figure, canvas):
+    """
+    Turns an embedded figure of the main window into the chart view for a data type.
+    """
+    _chart_views[data_type] = CowChartView(figure, canvas, data_type)
+    return _chart_views[data_type]
+
+def get_chart_view(data_type):
+    """
+    Returns the embedded chart view for a data type, or None when charts open in their own window.
+    """
+    return _chart_views.get(data_type)
@@ -0,0 +1,131 @@
+# cowindex.py
+import json
+import os
+import numpy as np
+import pandas as pd
+from datacache import cache_entry
+
+INDEX_FILE = 'cow_index.json'
+
+def _npy_data_offset(path):
+    # Byte offset where the array data starts, after the .npy header
+    with open(path, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            np.lib.format.read_array_header_1_0(f)
+        else:
+            np.lib.format.read_array_header_2_0(f)
+        return f.tell()
+
+def _build_index(entry_dir):
+    with open(os.path.join(entry_dir, 'meta.json'), 'r') as f:
+        meta = json.load(f)
+    num_rows = meta['num_rows']
+
+    columns = {}
+    order = []
+    for spec in meta['columns']:
+        if spec['kind'] == 'numeric':
+            file_name = f"block_{spec['block']}.npy"
+            itemsize = np.dtype(spec['block']).itemsize
+            offset = _npy_data_offset(os.path.join(entry_dir, file_name)) + spec['row'] * num_rows * itemsize
+            columns[spec['name']] = {'file': file_name, 'offset': offset, 'dtype': spec['block']}
+        elif spec['kind'] == 'datetime':
+            columns[spec['name']] = {'file': spec['file'], 'offset': _npy_data_offset(os.path.join(entry_dir, spec['file'])), 'dtype': 'datetime64[ns]'}
+        else:
+            continue  # Text columns are not herd readings and are not indexed
+        order.append(spec['name'])
+
+    date_columns = [spec['name'] for spec in meta['columns'] if spec['kind'] == 'datetime']
+    index = {
+        'num_rows': num_rows,
+        'date_column': date_columns[0] if date_columns else None,
+        'group_mean_column': meta['columns'][-1]['name'] if meta['columns'] else None,  # 'Group mean' is always the last column
+        'order': order,
+        'columns': columns,
+    }
+    tmp_path = os.path.join(entry_dir, f'{INDEX_FILE}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(entry_dir, INDEX_FILE))
+    return index
+
+class CowIndex:
+    """
+    Persistent cow ID -> column offset index over a cached herd file.
+
+    The cache stores every column contiguously (column-major), so reading one cow is a single
+    read of num_rows values at a known byte offset, independent of the number of cows in the herd.
+    """
+
+    def __init__(self, file_path):
+        self.entry_dir = cache_entry(file_path)
+        index_path = os.path.join(self.entry_dir, INDEX_FILE)
+        index = None
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, 'r') as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = None
+        self._index = index if index is not None else _build_index(self.entry_dir)
+
+    @property
+    def num_rows(self):
+        return self._index['num_rows']
+
+    @property
+    def date_column(self):
+        return self._index['date_column']
+
+    @property
+    def group_mean_column(self):
+        return self._index['group_mean_column']
+
+    @property
+    def cow_ids(self):
+        skip = {self.date_column, self.group_mean_column}
+        return [name for name in self._index['order'] if name not in skip]
+
+    def __contains__(self, column):
+        return str(column) in self._index['columns']
+
+    def read_column(self, column):
+        """
+        Reads one column (a cow ID, the group mean or the date column) as a numpy array.
+        """
+        column = str(column)
+        if column not in self._index['columns']:
+            raise KeyError(f"Column '{column}' not found in the herd data.")
+        spec = self._index['columns'][column]
+        return np.fromfile(os.path.join(self.entry_dir, spec['file']), dtype=spec['dtype'],
+                           count=self.num_rows, offset=spec['offset'])
+
+    def read(self, columns):
+        """
+        Reads the date column followed by the requested columns.
+
+        Parameters:
+        - columns: list of cow IDs and/or the group mean column name.
+
+        Returns:
+        - data: pandas DataFrame with the date column first and then the requested columns in order.
+        """
+        names = [self.date_column] + [str(col) for col in columns]
+        return pd.DataFrame({position: self.read_column(name) for position, name in enumerate(names)}).set_axis(names, axis=1)
+
+def read_cows(file_path, cow_ids, group_mean_column=None):
+    """
+    Loads the date column, the given cows and the group mean from a herd file via its cow index.
+
+    Parameters:
+    - file_path: str, path to the CSV or Excel file.
+    - cow_ids: list of cow IDs to read, None entries are skipped.
+    - group_mean_column: str, name of the group mean column (default is the last column of the file).
+
+    Returns:
+    - data: pandas DataFrame with the date column, the cows and the group mean, in that order.
+    """
+    index = CowIndex(file_path)
+    group_mean_column = group_mean_column or index.group_mean_column
+    return index.read([cow_id for cow_id in cow_ids if cow_id] + [group_mean_column])
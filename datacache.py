@@ -0,0 +1,320 @@
+# datacache.py
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import numpy as np
+import pandas as pd
+from ingest import read_herd_file
+
+CACHE_DIR = 'parsed_data_cache'
+MANIFEST_FILE = 'manifest.json'
+MAX_CACHE_BYTES = 512 * 1024 * 1024  # Evict least recently used entries above this size
+CACHE_FORMAT_VERSION = 2  # 2: float32 readings from the ingest reader
+STALE_LOCK_SECONDS = 600  # A lock file older than this was left by a process that died while parsing
+
+# The dashboard jobs and the pipeline processes can ask for the same new entry at once: _lock guards
+# _key_locks, the lock of a key serializes its creation in this process and its lock file across processes
+_lock = threading.Lock()
+_key_locks = {}
+
+def file_content_hash(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _load_manifest(cache_dir):
+    manifest_path = os.path.join(cache_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass  # A corrupt manifest only costs a re-hash
+    return {'files': {}, 'entries': {}}
+
+def _save_manifest(cache_dir, manifest):
+    # Keep what other processes (parallel pipeline stages) added since this manifest was loaded
+    on_disk = _load_manifest(cache_dir)
+    for key, entry in on_disk['entries'].items():
+        if key not in manifest['entries'] and os.path.isdir(os.path.join(cache_dir, key)):
+            manifest['entries'][key] = entry
+    for path, file_info in on_disk['files'].items():
+        manifest['files'].setdefault(path, file_info)
+
+    manifest_path = os.path.join(cache_dir, MANIFEST_FILE)
+    tmp_path = f"{manifest_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+def _entry_key(content_hash, date_column, date_format):
+    options = json.dumps([CACHE_FORMAT_VERSION, content_hash, date_column, date_format])
+    return hashlib.sha256(options.encode('utf-8')).hexdigest()[:32]
+
+def dataset_version(content_hash, date_column=None, date_format=None):
+    # The name cache_entry gives the entry of a file with this content hash, without parsing the file
+    return _entry_key(content_hash, date_column, date_format)
+
+def _directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def _has_entry(entry_dir):
+    # meta.json is written last, an entry with a readable one is complete
+    try:
+        with open(os.path.join(entry_dir, 'meta.json'), 'r') as f:
+            return json.load(f).get('version') == CACHE_FORMAT_VERSION
+    except (OSError, ValueError, AttributeError):
+        return False
+
+@contextlib.contextmanager
+def _locked_key(cache_dir, key, stale_seconds=STALE_LOCK_SECONDS):
+    with _lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    lock_path = os.path.join(cache_dir, f'{key}.lock')
+    with key_lock:
+        while True:
+            try:
+                lock_file = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > stale_seconds:
+                        os.remove(lock_path)
+                        continue
+                except OSError:
+                    continue  # Released meanwhile
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            os.close(lock_file)
+            with contextlib.suppress(OSError):
+                os.remove(lock_path)
+            with _lock:
+                _key_locks.pop(key, None)
+
+def _create_entry(abs_path, cache_dir, key, date_column, date_format):
+    # Parses the file into the entry of key unless another thread or process did so while this one waited
+    entry_dir = os.path.join(cache_dir, key)
+    with _locked_key(cache_dir, key):
+        if _has_entry(entry_dir):
+            return
+        tmp_dir = os.path.join(cache_dir, f'{key}.{uuid.uuid4().hex}.tmp')
+        os.makedirs(tmp_dir)
+        try:
+            _write_entry(read_herd_file(abs_path, date_column, date_format, verbose=True), tmp_dir, date_column, date_format)
+            if os.path.isdir(entry_dir) and not _has_entry(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)  # Damaged or left over from an older format
+            try:
+                os.replace(tmp_dir, entry_dir)
+            except OSError:
+                if not _has_entry(entry_dir):
+                    raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def _parse_dates(series, date_format):
+    try:
+        return pd.to_datetime(series, format=date_format)
+    except (ValueError, TypeError):
+        return None  # Not a date column, keep it as it is
+
+def _write_entry(data, entry_dir, date_column, date_format):
+    """
+    Stores a parsed frame column-major: one .npy block per dtype with shape (num_columns, num_rows),
+    so every column is contiguous on disk and can be memory-mapped on its own.
+    """
+    columns = [str(col) for col in data.columns]
+    if date_column is None and len(columns):
+        date_column = columns[0]
+
+    layout = []
+    blocks = {}
+    text_columns = {}
+    for position, col in enumerate(data.columns):
+        series = data.iloc[:, position]
+        if str(col) == date_column and not pd.api.types.is_datetime64_any_dtype(series):
+            parsed = _parse_dates(series, date_format)
+            if parsed is not None:
+                series = parsed
+        if pd.api.types.is_datetime64_any_dtype(series):
+            text_columns[position] = ('datetime', series.to_numpy(dtype='datetime64[ns]'))
+            layout.append({'name': str(col), 'kind': 'datetime', 'file': f'col_{position}.npy'})
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            dtype = str(series.dtype)
+            block = blocks.setdefault(dtype, [])
+            layout.append({'name': str(col), 'kind': 'numeric', 'block': dtype, 'row': len(block)})
+            block.append(series.to_numpy())
+        else:
+            values = series.astype(object)
+            text_columns[position] = ('text', (np.asarray(values.fillna('').astype(str), dtype=str), values.isna().to_numpy()))
+            layout.append({'name': str(col), 'kind': 'text', 'file': f'col_{position}.npy', 'mask': f'mask_{position}.npy'})
+
+    for dtype, block in blocks.items():
+        np.save(os.path.join(entry_dir, f'block_{dtype}.npy'), np.ascontiguousarray(np.vstack(block)))
+    for position, (kind, payload) in text_columns.items():
+        if kind == 'datetime':
+            np.save(os.path.join(entry_dir, f'col_{position}.npy'), payload)
+        else:
+            values, mask = payload
+            np.save(os.path.join(entry_dir, f'col_{position}.npy'), values)
+            np.save(os.path.join(entry_dir, f'mask_{position}.npy'), mask)
+
+    meta = {'version': CACHE_FORMAT_VERSION, 'num_rows': len(data), 'columns': layout}
+    with open(os.path.join(entry_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+def _read_entry(entry_dir, writable):
+    with open(os.path.join(entry_dir, 'meta.json'), 'r') as f:
+        meta = json.load(f)
+    mmap_mode = None if writable else 'r'
+
+    blocks = {}
+    columns = {}
+    for position, spec in enumerate(meta['columns']):
+        if spec['kind'] == 'numeric':
+            if spec['block'] not in blocks:
+                blocks[spec['block']] = np.load(os.path.join(entry_dir, f"block_{spec['block']}.npy"), mmap_mode=mmap_mode)
+            values = blocks[spec['block']][spec['row']]  # Contiguous row of the column-major block
+        elif spec['kind'] == 'datetime':
+            values = np.load(os.path.join(entry_dir, spec['file']), mmap_mode=mmap_mode)
+        else:
+            values = np.load(os.path.join(entry_dir, spec['file'])).astype(object)
+            values[np.load(os.path.join(entry_dir, spec['mask']))] = np.nan
+        columns[position] = values
+
+    # Positional keys keep duplicate column names intact, copy=False keeps the memory-mapped columns as views
+    data = pd.DataFrame(columns, index=pd.RangeIndex(meta['num_rows']), copy=False)
+    data.columns = [spec['name'] for spec in meta['columns']]
+    return data
+
+def _evict(cache_dir, manifest, max_bytes, keep):
+    total = sum(entry['nbytes'] for entry in manifest['entries'].values())
+    for key, entry in sorted(manifest['entries'].items(), key=lambda item: item[1]['last_access']):
+        if total <= max_bytes:
+            break
+        if key == keep:
+            continue
+        shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+        total -= entry['nbytes']
+        del manifest['entries'][key]
+    live = set(manifest['entries'])
+    manifest['files'] = {path: info for path, info in manifest['files'].items() if info['entry'] in live}
+
+def cache_entry(file_path, date_column=None, date_format=None, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """
+    Returns the cache entry directory of a herd file, parsing the file only if its content is new.
+
+    Entries are keyed by the file's path, size, mtime and content hash. Unchanged files are
+    served from the cache without re-hashing, touched files are re-hashed and a copy of an
+    already cached file (e.g. in saved_upload_data) reuses the existing entry. Threads and
+    processes asking for the same new entry at once parse the file only once, the others wait for it.
+
+    Parameters:
+    - file_path: str, path to the CSV or Excel file.
+    - date_column: str, column parsed to datetime once and stored parsed (default is the first column).
+    - date_format: optional str format passed to pd.to_datetime.
+    - cache_dir: str, directory holding the cache entries.
+    - max_bytes: int, size bound of the cache directory, least recently used entries are evicted above it.
+
+    Returns:
+    - entry_dir: str, directory holding meta.json and the column-major .npy blocks.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    abs_path = os.path.abspath(file_path)
+    stat = os.stat(abs_path)
+    manifest = _load_manifest(cache_dir)
+
+    file_info = manifest['files'].get(abs_path)
+    if file_info and file_info['size'] == stat.st_size and file_info['mtime_ns'] == stat.st_mtime_ns:
+        content_hash = file_info['sha256']
+    else:
+        content_hash = file_content_hash(abs_path)
+
+    key = _entry_key(content_hash, date_column, date_format)
+    entry_dir = os.path.join(cache_dir, key)
+
+    if key not in manifest['entries'] or not _has_entry(entry_dir):
+        _create_entry(abs_path, cache_dir, key, date_column, date_format)
+        manifest['entries'][key] = {'nbytes': _directory_size(entry_dir), 'last_access': time.time()}
+        _evict(cache_dir, manifest, max_bytes, keep=key)
+
+    manifest['entries'][key]['last_access'] = time.time()
+    manifest['files'][abs_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': content_hash, 'entry': key}
+    _save_manifest(cache_dir, manifest)
+    return entry_dir
+
+def load_frame(file_path, date_column=None, date_format=None, writable=False, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """
+    Loads a herd CSV/XLSX file, parsing it only the first time its content is seen (see cache_entry).
+
+    Parameters:
+    - file_path: str, path to the CSV or Excel file.
+    - date_column: str, column parsed to datetime once and stored parsed (default is the first column).
+    - date_format: optional str format passed to pd.to_datetime.
+    - writable: bool, load the columns into memory instead of memory-mapping them read-only (default is False).
+    - cache_dir: str, directory holding the cache entries.
+    - max_bytes: int, size bound of the cache directory, least recently used entries are evicted above it.
+
+    Returns:
+    - data: pandas DataFrame with the same columns as the file and the date column already parsed.
+    """
+    entry_dir = cache_entry(file_path, date_column, date_format, cache_dir, max_bytes)
+    return _read_entry(entry_dir, writable)
+
+def clear_cache(cache_dir=CACHE_DIR):
+    if os.path.exists(cache_dir):
+        shutil.rmtree(cache_dir)
+
+def check_concurrent_entries(num_threads=3, num_cows=400, num_days=200, trials=10):
+    """
+    Loads a new file from several threads at once, as the dashboard jobs do on a first load, and
+    checks that every thread gets the same frame and the cache holds one entry per file.
+
+    Returns:
+    - results: dict with the number of loads, errors and cache entries.
+    """
+    import tempfile
+    from syntheticherd import make_herd_data
+
+    results = {'loads': 0, 'errors': [], 'entries': 0}
+    for trial in range(trials):
+        with tempfile.TemporaryDirectory() as work_dir:
+            file_path = os.path.join(work_dir, 'herd.csv')
+            make_herd_data(num_cows, num_days, seed=trial).to_csv(file_path, index=False)
+            cache_dir = os.path.join(work_dir, CACHE_DIR)
+            barrier = threading.Barrier(num_threads)
+            frames = []
+
+            def load():
+                barrier.wait()
+                try:
+                    frames.append(load_frame(file_path, cache_dir=cache_dir))
+                except Exception as error:
+                    results['errors'].append(repr(error))
+
+            threads = [threading.Thread(target=load) for _ in range(num_threads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            results['loads'] += num_threads
+            results['entries'] += len([name for name in os.listdir(cache_dir) if not name.endswith(('.json', '.lock', '.tmp'))])
+            if any(not frame.equals(frames[0]) for frame in frames):
+                results['errors'].append(f"Trial {trial}: the threads got different frames.")
+            frames.clear()  # Release the memory maps before the directory is removed
+
+    if results['errors'] or results['entries'] != trials:
+        raise AssertionError(f"Concurrent cache loads failed: {results}")
+    return results
+
+if __name__ == "__main__":
+    results = check_concurrent_entries()
+    print(f"{results['loads']} concurrent loads into {results['entries']} cache entries, no errors.")
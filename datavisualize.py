@@ -1,77 +1,107 @@
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from sklearn.linear_model import LinearRegression
-
-# File path
-file_path = 'C:/Users/Jyothesh karnam/Desktop/MSc Dissertation/Datasets/Activity Levels CD1.xlsx'
-
-# Load the data
-cows_data = pd.read_excel(file_path)
-
-# Check the column names
-print(cows_data.columns)
-
-# Convert the date column to datetime (replace 'Date' with the actual column name if different)
-cows_data['Date'] = pd.to_datetime(cows_data['Date'], format='%m/%d/%Y')
-
-# Resample the data to weekly (Monday to Sunday) and calculate the mean
-cows_data.set_index('Date', inplace=True)
-weekly_data = cows_data.resample('W-SUN').mean()
-
-# Prepare data for trend analysis
-weekly_data.reset_index(inplace=True)
-weekly_data['Week_Number'] = np.arange(len(weekly_data))
-
-# Select one cow ID to plot
-cow_id = '6574'
-
-# Perform linear regression for Cow 6574
-X_cow = weekly_data[['Week_Number']]
-y_cow = weekly_data[cow_id]
-model_cow = LinearRegression().fit(X_cow, y_cow)
-trend_cow = model_cow.predict(X_cow)
-
-# Perform linear regression for Group mean
-y_group = weekly_data['Group mean']
-model_group = LinearRegression().fit(X_cow, y_group)
-trend_group = model_group.predict(X_cow)
-
-# Calculate the mean and standard deviation of Cow 6574's activity levels
-mean_activity = weekly_data[cow_id].mean()
-std_activity = weekly_data[cow_id].std()
-
-# Define the threshold levels based on statistical measures
-red_line = mean_activity - 2 * std_activity
-orange_line = mean_activity - 1 * std_activity
-green_line = mean_activity
-
-# Plot the actual data, trend lines, and threshold lines with adjusted styles
-plt.figure(figsize=(14, 7))
-
-# Plot for Cow 6574
-plt.plot(weekly_data['Date'], y_cow, label=f'Cow {cow_id}')
-plt.plot(weekly_data['Date'], trend_cow, label=f'Trend for Cow {cow_id}', linestyle='--')
-
-# Plot for Group mean
-plt.plot(weekly_data['Date'], y_group, label='Group mean', color='black')
-plt.plot(weekly_data['Date'], trend_group, label='Trend for Group mean', linestyle='--', color='grey')
-
-# Add threshold lines with increased line width
-plt.axhline(y=red_line, color='red', linestyle=':', linewidth=2, label='Red line (Not well)')
-plt.axhline(y=orange_line, color='orange', linestyle=':', linewidth=2, label='Orange line (Requires medication)')
-plt.axhline(y=green_line, color='green', linestyle=':', linewidth=2, label='Green line (Healthy)')
-
-plt.xlabel('Date')
-plt.ylabel('Activity Level')
-plt.title(f'Trend Analysis of Weekly Activity Levels for Cow {cow_id} and Group Mean with Health Indicators')
-plt.legend(loc='upper left', bbox_to_anchor=(1, 1))
-plt.xticks(rotation=45)
-plt.tight_layout()
-
-plt.show()
-
-# Print the threshold values
-print(f"Red Line (Not well): {red_line}")
-print(f"Orange Line (Requires medication): {orange_line}")
-print(f"Green Line (Healthy): {green_line}")
+from datacache import load_frame
+from ingest import reading_columns
+from trends import fit_trends, trend_table
+
+def load_weekly_data(file_path):
+    """
+    Loads an activity file and resamples it to weekly means.
+
+    Returns:
+    - cows_data: pandas DataFrame of the daily readings, indexed by date.
+    - weekly_data: pandas DataFrame of the weekly means with 'Date' and 'Week_Number' columns.
+    """
+    # Load the data, with the date column (replace 'Date' with the actual column name if different) parsed once and cached
+    cows_data = load_frame(file_path, date_column='Date', date_format='%m/%d/%Y', writable=True)
+
+    # Resample the data to weekly (Monday to Sunday) and calculate the mean
+    cows_data.set_index('Date', inplace=True)
+    weekly_data = cows_data.resample('W-SUN').mean()
+
+    # Prepare data for trend analysis
+    weekly_data.reset_index(inplace=True)
+    weekly_data['Week_Number'] = np.arange(len(weekly_data))
+    return cows_data, weekly_data
+
+def plot_cow_trend(weekly_data, cow_id):
+    """
+    Plots the weekly activity of one cow and the group mean with their trends and the alert thresholds.
+
+    Returns:
+    - red_line, orange_line, green_line: float thresholds of the cow.
+    """
+    # Linear trends for the cow and the Group mean, in one closed-form least squares fit
+    y_cow = weekly_data[cow_id]
+    y_group = weekly_data['Group mean']
+    slope, intercept, _, _ = fit_trends(weekly_data[[cow_id, 'Group mean']].to_numpy(dtype=np.float64), weekly_data['Week_Number'].to_numpy())
+    trend_cow = intercept[0] + slope[0] * weekly_data['Week_Number']
+    trend_group = intercept[1] + slope[1] * weekly_data['Week_Number']
+
+    # Calculate the mean and standard deviation of the cow's activity levels
+    mean_activity = weekly_data[cow_id].mean()
+    std_activity = weekly_data[cow_id].std()
+
+    # Define the threshold levels based on statistical measures
+    red_line = mean_activity - 2 * std_activity
+    orange_line = mean_activity - 1 * std_activity
+    green_line = mean_activity
+
+    # Plot the actual data, trend lines, and threshold lines with adjusted styles
+    plt.figure(figsize=(14, 7))
+
+    # Plot for the cow
+    plt.plot(weekly_data['Date'], y_cow, label=f'Cow {cow_id}')
+    plt.plot(weekly_data['Date'], trend_cow, label=f'Trend for Cow {cow_id}', linestyle='--')
+
+    # Plot for Group mean
+    plt.plot(weekly_data['Date'], y_group, label='Group mean', color='black')
+    plt.plot(weekly_data['Date'], trend_group, label='Trend for Group mean', linestyle='--', color='grey')
+
+    # Add threshold lines with increased line width
+    plt.axhline(y=red_line, color='red', linestyle=':', linewidth=2, label='Red line (Not well)')
+    plt.axhline(y=orange_line, color='orange', linestyle=':', linewidth=2, label='Orange line (Requires medication)')
+    plt.axhline(y=green_line, color='green', linestyle=':', linewidth=2, label='Green line (Healthy)')
+
+    plt.xlabel('Date')
+    plt.ylabel('Activity Level')
+    plt.title(f'Trend Analysis of Weekly Activity Levels for Cow {cow_id} and Group Mean with Health Indicators')
+    plt.legend(loc='upper left', bbox_to_anchor=(1, 1))
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+
+    plt.show()
+    return red_line, orange_line, green_line
+
+def save_herd_trends(cows_data, output_path='herd_trends.csv', window=8):
+    """
+    Saves the trend table of every cow, with the slope over the last window weeks, for reports.
+
+    Returns:
+    - herd_trends: pandas DataFrame from trends.trend_table.
+    """
+    herd_trends = trend_table(cows_data.reset_index(), list(reading_columns(cows_data)), window=window)
+    herd_trends.to_csv(output_path)
+    return herd_trends
+
+if __name__ == "__main__":
+    # File path
+    file_path = 'C:/Users/Jyothesh karnam/Desktop/MSc Dissertation/Datasets/Activity Levels CD1.xlsx'
+    cows_data, weekly_data = load_weekly_data(file_path)
+
+    # Check the column names
+    print(cows_data.columns)
+
+    # Select one cow ID to plot
+    cow_id = '6574'
+    red_line, orange_line, green_line = plot_cow_trend(weekly_data, cow_id)
+
+    # Print the threshold values
+    print(f"Red Line (Not well): {red_line}")
+    print(f"Orange Line (Requires medication): {orange_line}")
+    print(f"Green Line (Healthy): {green_line}")
+
+    # Trends of the whole herd, saved as a table for reports
+    herd_trends = save_herd_trends(cows_data)
+    print("Steepest declining weekly activity trends:")
+    print(herd_trends.sort_values('slope').head(10))
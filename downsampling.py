@@ -0,0 +1,211 @@
+# downsampling.py
+import numpy as np
+import matplotlib.dates as mdates
+import matplotlib.ticker as mticker
+
+DOWNSAMPLE_METHODS = ('minmax', 'lttb')
+MARKER_MAX_POINTS = 250  # Markers are only drawn when at most this many days are visible
+MAX_WEEK_TICKS = 26  # Week labels are thinned out beyond this many in view
+
+def minmax_downsample(y, num_buckets):
+    """
+    Keeps the lowest and highest reading of each of num_buckets equal slices of the series,
+    so peaks and dips survive the downsampling.
+
+    Parameters:
+    - y: numpy array of readings, NaN for missing days.
+    - num_buckets: int, number of slices, usually the pixel width of the axes.
+
+    Returns:
+    - indices: sorted int array of the kept positions, including the first and last.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    num_points = len(y)
+    if num_buckets <= 0 or num_points <= 2 * num_buckets:
+        return np.arange(num_points)
+
+    bucket_size = -(-num_points // num_buckets)
+    num_buckets = -(-num_points // bucket_size)
+    padded = np.full(num_buckets * bucket_size, np.nan)
+    padded[:num_points] = y
+    buckets = padded.reshape(num_buckets, bucket_size)
+    missing = np.isnan(buckets)
+    starts = np.arange(num_buckets) * bucket_size
+    lows = starts + np.where(missing, np.inf, buckets).argmin(axis=1)
+    highs = starts + np.where(missing, -np.inf, buckets).argmax(axis=1)
+    return np.unique(np.concatenate(([0, num_points - 1], lows, highs)))
+
+def lttb_downsample(x, y, num_points):
+    """
+    Largest-Triangle-Three-Buckets: keeps, per bucket, the point forming the largest triangle
+    with the previously kept point and the average of the next bucket.
+
+    Parameters:
+    - x: numpy array of increasing positions (matplotlib date numbers).
+    - y: numpy array of readings.
+    - num_points: int, number of points to keep.
+
+    Returns:
+    - indices: sorted int array of the kept positions, including the first and last.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    total = len(y)
+    if num_points >= total or num_points < 3:
+        return np.arange(total)
+
+    # Interior points split into num_points - 2 buckets
+    edges = np.linspace(1, total - 1, num_points - 1).astype(np.int64)
+    counts = np.diff(edges)
+    valid = ~np.isnan(y[:total - 1])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.add.reduceat(x[:total - 1], edges[:-1]) / counts
+        mean_y = np.add.reduceat(np.where(valid, y[:total - 1], 0), edges[:-1]) / np.add.reduceat(valid, edges[:-1])
+
+    indices = np.empty(num_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, total - 1
+    kept = 0
+    for bucket in range(num_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        if bucket + 1 < num_points - 2:
+            next_x, next_y = mean_x[bucket + 1], mean_y[bucket + 1]
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[kept] - next_x) * (y[start:stop] - y[kept]) - (x[kept] - x[start:stop]) * (next_y - y[kept]))
+        kept = start + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        indices[bucket + 1] = kept
+    return indices
+
+class WeekLocator(mticker.Locator):
+    """
+    Ticks on whole weeks from the first date, skipping weeks so at most max_ticks are in view.
+    """
+
+    def __init__(self, first_day, last_day, max_ticks=MAX_WEEK_TICKS):
+        self.first_day = first_day
+        self.last_day = last_day
+        self.max_ticks = max_ticks
+
+    def __call__(self):
+        return self.tick_values(*self.axis.get_view_interval())
+
+    def tick_values(self, vmin, vmax):
+        vmin, vmax = max(vmin, self.first_day), min(vmax, self.last_day)
+        if vmax < vmin:
+            return np.array([])
+        step = 7 * max(1, int(np.ceil((vmax - vmin) / 7 / self.max_ticks)))
+        first = np.ceil((vmin - self.first_day) / step)
+        last = np.floor((vmax - self.first_day) / step)
+        return self.first_day + step * np.arange(first, last + 1)
+
+class LevelOfDetail:
+    """
+    Draws the daily series of one axes downsampled to its pixel width.
+
+    The visible range is re-sampled whenever the x-limits change (zoom, pan, home) or the window
+    is resized, and the per-day markers are only drawn once few enough days are in view.
+    """
+
+    def __init__(self, ax, dates, method='minmax', marker_max_points=MARKER_MAX_POINTS):
+        if method not in DOWNSAMPLE_METHODS:
+            raise ValueError(f"Unknown downsampling method '{method}', expected one of {DOWNSAMPLE_METHODS}.")
+        self.ax = ax
+        self.x = mdates.date2num(np.asarray(dates, dtype='datetime64[ns]'))
+        self.method = method
+        self.marker_max_points = marker_max_points
+        self._lines = []
+        self._markers = []
+        self._last_view = None
+
+        ax.xaxis_date()
+        ax.callbacks.connect('xlim_changed', lambda _: self.refresh())
+        ax.figure.canvas.mpl_connect('resize_event', lambda _: self.refresh())
+
+    def line(self, values, **kwargs):
+        """
+        Plots a downsampled line of the series, kwargs are passed to ax.plot.
+        """
+        y = np.asarray(values, dtype=np.float64)
+        indices = self._downsample(y, 0, len(y))
+        line, = self.ax.plot(self.x[indices], y[indices], **kwargs)
+        self._lines.append((line, y))
+        return line
+
+    def markers(self, values, **kwargs):
+        """
+        Plots per-day markers of the series, kwargs are passed to ax.scatter.
+        """
+        y = np.asarray(values, dtype=np.float64)
+        shown = len(y) <= self.marker_max_points
+        if shown:
+            marker = self.ax.scatter(self.x, y, **kwargs)
+        else:
+            marker = self.ax.scatter(self.x[:0], y[:0], **kwargs)
+            marker.set_visible(False)
+        self._markers.append((marker, y))
+        return marker
+
+    def set_dates(self, dates):
+        """
+        Switches the axes to a new date range, the readings of every series have to be set again.
+        """
+        self.x = mdates.date2num(np.asarray(dates, dtype='datetime64[ns]'))
+        self._last_view = None
+
+    def set_values(self, artist, values):
+        """
+        Replaces the readings behind a line or markers created by this helper.
+        """
+        y = np.asarray(values, dtype=np.float64)
+        for series in (self._lines, self._markers):
+            for position, (series_artist, _) in enumerate(series):
+                if series_artist is artist:
+                    series[position] = (artist, y)
+        self._last_view = None
+
+    def week_ticks(self, rotation=45):
+        """
+        Labels the x-axis "Week 1", "Week 2", ... counted from the first date.
+        """
+        if not len(self.x):
+            return
+        first_day = self.x[0]
+        self.ax.xaxis.set_major_locator(WeekLocator(first_day, self.x[-1]))
+        self.ax.xaxis.set_major_formatter(mticker.FuncFormatter(lambda value, _: f'Week {int(round((value - first_day) / 7)) + 1}'))
+        self.ax.tick_params(axis='x', labelrotation=rotation)
+
+    def refresh(self, redraw=True):
+        # Re-sample the visible part of every series, skipped when the view did not change
+        if not len(self.x):
+            return
+        lower, upper = self.ax.get_xlim()
+        start = max(int(np.searchsorted(self.x, lower, side='left')) - 1, 0)
+        stop = min(int(np.searchsorted(self.x, upper, side='right')) + 1, len(self.x))
+        width = self._pixel_width()
+        if (start, stop, width) == self._last_view:
+            return
+        self._last_view = (start, stop, width)
+
+        for line, y in self._lines:
+            indices = self._downsample(y, start, stop)
+            line.set_data(self.x[indices], y[indices])
+
+        show_markers = stop - start <= self.marker_max_points
+        for marker, y in self._markers:
+            if show_markers:
+                marker.set_offsets(np.column_stack((self.x[start:stop], y[start:stop])))
+            else:
+                marker.set_offsets(np.empty((0, 2)))
+            marker.set_visible(show_markers)
+        if redraw:
+            self.ax.figure.canvas.draw_idle()
+
+    def _pixel_width(self):
+        return max(int(self.ax.bbox.width), 1)
+
+    def _downsample(self, y, start, stop):
+        if self.method == 'lttb':
+            indices = lttb_downsample(self.x[start:stop], y[start:stop], 2 * self._pixel_width())
+        else:
+            indices = minmax_downsample(y[start:stop], self._pixel_width())
+        return start + indices
@@ -0,0 +1,410 @@
+# forecasting.py
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from batchstream import iterate_batches
+
+FORECAST_MODELS = ('ridge', 'conv')
+FORECASTER_FILE = 'activity_forecaster.npz'
+# Where the pipeline saves the trained model and the dashboard's prediction store loads it from
+FORECASTER_PATH = os.path.join('models', FORECASTER_FILE)
+
+def cow_samples(X, y=None, group_column=-1):
+    """
+    Turns windows over the whole herd into one sample per cow, so a single model serves every cow.
+
+    Each sample holds the cow's own readings and, as a second channel, the group mean readings of
+    the same days. Its target is the cow's reading the day after the window.
+
+    Parameters:
+    - X: numpy array of shape (batch_size, sequence_length, num_features), e.g. from WindowDataset.take.
+    - y: optional numpy array of shape (batch_size, num_features) with the targets.
+    - group_column: int, column of the group mean, or None to use the cow's own readings only.
+
+    Returns:
+    - samples: numpy array of shape (batch_size * num_features, sequence_length, channels).
+    - targets: numpy array of shape (batch_size * num_features,), or None without y.
+    """
+    batch_size, sequence_length, num_features = X.shape
+    own = np.moveaxis(X, 2, 1).reshape(batch_size * num_features, sequence_length)
+    if group_column is None or num_features < 2:
+        samples = own[:, :, None]
+    else:
+        samples = np.stack([own, np.repeat(X[:, :, group_column], num_features, axis=0)], axis=2)
+    return samples, (None if y is None else np.asarray(y).reshape(batch_size * num_features))
+
+def _batches(dataset, batch_size, group_column, **options):
+    # Mini-batches of (samples, targets). A per-cow dataset already yields samples, batch_size windows'
+    # worth of them, drawn from mixed cows
+    if getattr(dataset, 'per_cow', False):
+        yield from iterate_batches(dataset, batch_size * dataset.num_cows, **options)
+        return
+    for X, y in iterate_batches(dataset, batch_size, **options):
+        yield cow_samples(X, y, group_column)
+
+def _valid(samples, targets):
+    # Samples with a gap in the window or the target are left out of training
+    valid = ~np.isnan(samples).any(axis=(1, 2))
+    return valid if targets is None else valid & ~np.isnan(targets)
+
+class RidgeForecaster:
+    """
+    Linear baseline: the next reading as a ridge regression on the window readings.
+
+    Training accumulates the normal equations one mini-batch at a time and solves them once,
+    so it needs a single pass and memory that does not grow with the data.
+    """
+
+    name = 'ridge'
+
+    def __init__(self, alpha=1.0, group_column=-1):
+        self.alpha = alpha
+        self.group_column = group_column
+        self.weights = None
+        self.sequence_length = None
+        self.fit_stats = None
+        self.scaler = None
+
+    def config(self):
+        return {'alpha': self.alpha, 'group_column': self.group_column}
+
+    def arrays(self):
+        return {'weights': self.weights}
+
+    def set_arrays(self, arrays):
+        self.weights = arrays['weights']
+
+    def _features(self, samples):
+        flat = samples.reshape(len(samples), -1).astype(np.float64)
+        return np.hstack([flat, np.ones((len(flat), 1))])
+
+    def fit(self, dataset, batch_size=64, job=None):
+        """
+        Parameters:
+        - dataset: WindowDataset or CowWindowDataset (or any object with __len__ and take) of training windows.
+        - batch_size: int, windows per mini-batch.
+        - job: optional backgroundjobs.JobContext, checked for cancellation between batches.
+        """
+        start = time.perf_counter()
+        gram, moments = None, None
+        num_samples = 0
+        for samples, targets in _batches(dataset, batch_size, self.group_column, prefetch=2):
+            if job is not None:
+                job.check()
+            valid = _valid(samples, targets)
+            features = self._features(samples[valid])
+            if gram is None:
+                gram = np.zeros((features.shape[1], features.shape[1]))
+                moments = np.zeros(features.shape[1])
+            gram += features.T @ features
+            moments += features.T @ targets[valid]
+            num_samples += int(valid.sum())
+        if gram is None:
+            raise ValueError("No training windows.")
+
+        penalty = self.alpha * np.eye(len(gram))
+        penalty[-1, -1] = 0.0  # The intercept is not shrunk
+        self.weights = np.linalg.solve(gram + penalty, moments)
+        self.sequence_length = samples.shape[1]
+        self.fit_stats = _throughput(num_samples, time.perf_counter() - start)
+        return self
+
+    def predict(self, X):
+        """
+        Parameters:
+        - X: numpy array of shape (batch_size, sequence_length, num_features).
+
+        Returns:
+        - predictions: numpy array of shape (batch_size, num_features), the next reading of every column.
+        """
+        samples, _ = cow_samples(np.asarray(X, dtype=np.float64), group_column=self.group_column)
+        return self.predict_samples(samples).reshape(len(X), -1)
+
+    def predict_samples(self, samples):
+        """
+        Parameters:
+        - samples: numpy array of shape (num_samples, sequence_length, channels), e.g. from CowWindowDataset.take.
+
+        Returns:
+        - predictions: numpy array of shape (num_samples,).
+        """
+        return self._features(np.asarray(samples, dtype=np.float64)) @ self.weights
+
+class ConvForecaster:
+    """
+    Small 1-D convolutional network: kernels of kernel_size days over the window, a ReLU and a linear
+    read-out of the change from the last reading. Trained with Adam on the mean squared error.
+
+    Inputs are taken relative to the window's last reading, so cows with different baselines share
+    the same weights. Everything runs in float32 NumPy.
+    """
+
+    name = 'conv'
+
+    def __init__(self, kernel_size=5, channels=8, learning_rate=3e-3, epochs=3, group_column=-1, seed=0):
+        self.kernel_size = kernel_size
+        self.channels = channels
+        self.learning_rate = learning_rate
+        self.epochs = epochs
+        self.group_column = group_column
+        self.seed = seed
+        self.params = None
+        self.sequence_length = None
+        self.fit_stats = None
+        self.scaler = None
+
+    def config(self):
+        return {'kernel_size': self.kernel_size, 'channels': self.channels, 'learning_rate': self.learning_rate,
+                'epochs': self.epochs, 'group_column': self.group_column, 'seed': self.seed}
+
+    def arrays(self):
+        return dict(self.params)
+
+    def set_arrays(self, arrays):
+        self.params = {key: np.asarray(value, dtype=np.float32) for key, value in arrays.items()}
+
+    def _init_params(self, sequence_length, input_channels):
+        if sequence_length < self.kernel_size:
+            raise ValueError(f"sequence_length {sequence_length} is shorter than kernel_size {self.kernel_size}.")
+        rng = np.random.default_rng(self.seed)
+        fan_in = self.kernel_size * input_channels
+        steps = sequence_length - self.kernel_size + 1
+        self.params = {
+            'kernels': (rng.normal(0, np.sqrt(2 / fan_in), (fan_in, self.channels))).astype(np.float32),
+            'kernel_bias': np.zeros(self.channels, dtype=np.float32),
+            'readout': (rng.normal(0, 0.01, steps * self.channels)).astype(np.float32),
+            'readout_bias': np.zeros(1, dtype=np.float32),
+        }
+
+    def _forward(self, samples):
+        last = samples[:, -1, 0].copy()
+        centered = (samples - samples[:, -1:, :]).astype(np.float32)
+        # (n, steps, channels, kernel_size) windows flattened to one row per position
+        patches = sliding_window_view(centered, self.kernel_size, axis=1)
+        patches = patches.reshape(len(samples), patches.shape[1], -1)
+        hidden = patches @ self.params['kernels'] + self.params['kernel_bias']
+        activations = np.maximum(hidden, 0)
+        flat = activations.reshape(len(samples), -1)
+        return last + flat @ self.params['readout'] + self.params['readout_bias'][0], (patches, hidden, flat)
+
+    def _gradients(self, cache, errors):
+        patches, hidden, flat = cache
+        d_out = (2.0 / len(errors)) * errors.astype(np.float32)
+        d_hidden = (d_out[:, None] * self.params['readout']).reshape(hidden.shape) * (hidden > 0)
+        return {
+            'kernels': patches.reshape(-1, patches.shape[2]).T @ d_hidden.reshape(-1, self.channels),
+            'kernel_bias': d_hidden.sum(axis=(0, 1)),
+            'readout': flat.T @ d_out,
+            'readout_bias': d_out.sum(keepdims=True),
+        }
+
+    def fit(self, dataset, batch_size=16, job=None, seed=None):
+        """
+        Parameters:
+        - dataset: WindowDataset or CowWindowDataset (or any object with __len__ and take) of training windows.
+        - batch_size: int, windows per mini-batch, each gives one sample per cow.
+        - job: optional backgroundjobs.JobContext, checked for cancellation between batches.
+        - seed: optional int for the shuffle order (default is the model seed).
+        """
+        start = time.perf_counter()
+        first_moment, second_moment, step = {}, {}, 0
+        num_samples = 0
+        losses = []
+        for epoch in range(self.epochs):
+            epoch_loss, epoch_samples = 0.0, 0
+            batches = _batches(dataset, batch_size, self.group_column, shuffle=True, seed=(self.seed if seed is None else seed) + epoch, prefetch=2)
+            for samples, targets in batches:
+                if job is not None:
+                    job.check()
+                valid = _valid(samples, targets)
+                samples, targets = samples[valid], targets[valid]
+                if not len(samples):
+                    continue
+                if self.params is None:
+                    self._init_params(samples.shape[1], samples.shape[2])
+                    self.sequence_length = samples.shape[1]
+
+                predictions, cache = self._forward(samples)
+                errors = predictions - targets
+                gradients = self._gradients(cache, errors)
+
+                # Adam update
+                step += 1
+                for key, gradient in gradients.items():
+                    first_moment[key] = 0.9 * first_moment.get(key, 0) + 0.1 * gradient
+                    second_moment[key] = 0.999 * second_moment.get(key, 0) + 0.001 * gradient * gradient
+                    corrected = first_moment[key] / (1 - 0.9 ** step)
+                    scale = np.sqrt(second_moment[key] / (1 - 0.999 ** step)) + 1e-8
+                    self.params[key] -= (self.learning_rate * corrected / scale).astype(np.float32)
+
+                epoch_loss += float(np.dot(errors, errors))
+                epoch_samples += len(samples)
+            num_samples += epoch_samples
+            losses.append(epoch_loss / max(epoch_samples, 1))
+        if self.params is None:
+            raise ValueError("No training windows.")
+        self.fit_stats = dict(_throughput(num_samples, time.perf_counter() - start), epoch_losses=losses)
+        return self
+
+    def predict(self, X):
+        """
+        Parameters:
+        - X: numpy array of shape (batch_size, sequence_length, num_features).
+
+        Returns:
+        - predictions: numpy array of shape (batch_size, num_features), the next reading of every column.
+        """
+        samples, _ = cow_samples(np.asarray(X, dtype=np.float32), group_column=self.group_column)
+        return self.predict_samples(samples).reshape(len(X), -1)
+
+    def predict_samples(self, samples):
+        """
+        Parameters:
+        - samples: numpy array of shape (num_samples, sequence_length, channels), e.g. from CowWindowDataset.take.
+
+        Returns:
+        - predictions: numpy array of shape (num_samples,).
+        """
+        predictions, _ = self._forward(np.asarray(samples, dtype=np.float32))
+        return predictions
+
+def make_forecaster(name, **options):
+    if name == 'ridge':
+        return RidgeForecaster(**options)
+    if name == 'conv':
+        return ConvForecaster(**options)
+    raise ValueError(f"Unknown model '{name}', expected one of {FORECAST_MODELS}.")
+
+def model_version(model):
+    """
+    Content hash of a fitted model: its type, settings, weights and scaler. Refitting to the same
+    weights gives the same version, any other change a new one.
+    """
+    digest = hashlib.sha256(json.dumps([model.name, model.config()], sort_keys=True).encode('utf-8'))
+    for key, value in sorted(model.arrays().items()):
+        digest.update(key.encode('utf-8'))
+        digest.update(np.ascontiguousarray(value).tobytes())
+    if model.scaler is not None:
+        digest.update(json.dumps(model.scaler, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def save_forecaster(model, path=FORECASTER_PATH):
+    """
+    Saves a fitted model as one .npz file (no pickle), with its settings and optional scaler.
+
+    model.scaler, when set, is a dict with the reading 'columns' the model was trained on and their
+    'min' and 'max', so raw readings can be scaled like the preprocessed training data.
+    """
+    header = {'name': model.name, 'config': model.config(), 'sequence_length': model.sequence_length,
+              'scaler': model.scaler, 'version': model_version(model)}
+    arrays = {f'array_{key}': value for key, value in model.arrays().items()}
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, header=np.array(json.dumps(header)), **arrays)
+    os.replace(tmp_path, path)
+    return header['version']
+
+def load_forecaster(path=FORECASTER_PATH):
+    """
+    Returns:
+    - model: the fitted model saved by save_forecaster, its version in model.version.
+    """
+    with np.load(path, allow_pickle=False) as saved:
+        header = json.loads(str(saved['header']))
+        arrays = {key[len('array_'):]: saved[key] for key in saved.files if key.startswith('array_')}
+    model = make_forecaster(header['name'], **header['config'])
+    model.set_arrays(arrays)
+    model.sequence_length = header['sequence_length']
+    model.scaler = header['scaler']
+    model.version = header['version']
+    return model
+
+def _throughput(num_samples, seconds):
+    return {'samples': num_samples, 'seconds': seconds, 'samples_per_sec': num_samples / seconds if seconds > 0 else float('inf')}
+
+def forecast_next_day(model, matrix, sequence_length):
+    """
+    Predicts the next day of every cow from the latest window, in a single forward pass.
+
+    Parameters:
+    - model: a fitted RidgeForecaster or ConvForecaster.
+    - matrix: numpy array (or memmap) of shape (num_rows, num_features), the latest rows last.
+    - sequence_length: int, the window length the model was trained on.
+
+    Returns:
+    - predictions: numpy array of shape (num_features,).
+    - stats: dict with the number of cows, the seconds and cows_per_sec.
+    """
+    start = time.perf_counter()
+    predictions = model.predict(np.asarray(matrix[-sequence_length:])[None])[0]
+    seconds = time.perf_counter() - start
+    return predictions, {'cows': len(predictions), 'seconds': seconds, 'cows_per_sec': len(predictions) / seconds if seconds > 0 else float('inf')}
+
+def evaluate_forecaster(model, dataset, batch_size=256):
+    """
+    Mean absolute and root mean squared error on a dataset, next to repeating the last reading.
+
+    Returns:
+    - metrics: dict with mae, rmse, persistence_mae, samples and cows_per_sec of batched inference.
+    """
+    per_cow = getattr(dataset, 'per_cow', False)
+    abs_errors, squared_errors, persistence_errors = 0.0, 0.0, 0.0
+    num_samples, predicted, seconds = 0, 0, 0.0
+    for X, y in iterate_batches(dataset, batch_size * dataset.num_cows if per_cow else batch_size):
+        start = time.perf_counter()
+        predictions = model.predict_samples(X) if per_cow else model.predict(X)
+        seconds += time.perf_counter() - start
+        predicted += predictions.size
+        errors = (predictions - y).ravel()
+        persistence = ((X[:, -1, 0] if per_cow else X[:, -1, :]) - y).ravel()
+        valid = ~np.isnan(errors) & ~np.isnan(persistence)
+        abs_errors += float(np.abs(errors[valid]).sum())
+        squared_errors += float((errors[valid] ** 2).sum())
+        persistence_errors += float(np.abs(persistence[valid]).sum())
+        num_samples += int(valid.sum())
+    count = max(num_samples, 1)
+    return {'mae': abs_errors / count, 'rmse': np.sqrt(squared_errors / count), 'persistence_mae': persistence_errors / count,
+            'samples': num_samples, 'cows_per_sec': predicted / seconds if seconds > 0 else float('inf')}
+
+def benchmark_forecasting(num_cows=300, num_days=730, sequence_length=30, epochs=3, seed=0):
+    """
+    Trains and evaluates both models on a synthetic herd, scaled to [0, 1] like the preprocessed data.
+
+    Returns:
+    - results: dict of model name -> training samples/sec, inference cows/sec and test errors.
+    """
+    from gapfill import fill_gaps
+    from syntheticherd import make_herd_data
+    from traincode import train_test_datasets_temporal
+
+    values = make_herd_data(num_cows, num_days, seed=seed).iloc[:, 1:].to_numpy(dtype=np.float64)
+    values, _ = fill_gaps(values, 'linear')
+    value_range = np.nanmax(values, axis=0) - np.nanmin(values, axis=0)
+    matrix = np.ascontiguousarray((values - np.nanmin(values, axis=0)) / np.where(value_range > 0, value_range, 1.0), dtype=np.float32)
+    train_dataset, test_dataset = train_test_datasets_temporal(matrix, sequence_length)
+
+    results = {}
+    for name in FORECAST_MODELS:
+        model = make_forecaster(name, **({'epochs': epochs, 'seed': seed} if name == 'conv' else {}))
+        model.fit(train_dataset)
+        _, inference = forecast_next_day(model, matrix, sequence_length)
+        metrics = evaluate_forecaster(model, test_dataset)
+        results[name] = {
+            'train_samples': model.fit_stats['samples'],
+            'train_seconds': model.fit_stats['seconds'],
+            'train_samples_per_sec': model.fit_stats['samples_per_sec'],
+            'next_day_cows_per_sec': inference['cows_per_sec'],
+            'test_cows_per_sec': metrics['cows_per_sec'],
+            'test_mae': metrics['mae'],
+            'persistence_mae': metrics['persistence_mae'],
+        }
+    return results
+
+if __name__ == "__main__":
+    for name, result in benchmark_forecasting().items():
+        print(f"{name}: trained on {result['train_samples']} cow-windows in {result['train_seconds']:.2f}s "
+              f"({result['train_samples_per_sec']:,.0f} samples/sec), next-day inference {result['next_day_cows_per_sec']:,.0f} cows/sec, "
+              f"test MAE {result['test_mae']:.4f} (repeating the last day: {result['persistence_mae']:.4f})")
@@ -0,0 +1,281 @@
+# herdalerts.py
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from datacache import CACHE_DIR, dataset_version, load_frame
+from ingest import read_herd_tail, reading_columns
+from runningstats import RunningStats
+
+ALERT_LEVELS = ('Red Alert', 'Orange Alert', 'Green Alert')
+NO_DATA = -1  # Level of cows without a reading in the latest week
+ALERT_STATE_FILE = 'herd_alerts.json'
+ALERT_STATE_VERSION = 1
+
+_alerts_by_file = {}  # Absolute path -> ((size, mtime_ns), version, result) of the latest version only
+
+def week_numbers(dates):
+    """
+    Monday-to-Sunday week of each date, the weeks pandas resample('W-SUN') groups by.
+
+    Returns:
+    - weeks: int array, consecutive weeks have consecutive numbers.
+    """
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    return (days - 4) // 7  # 1970-01-05, day 4, was a Monday
+
+def weekly_sums(dates, values):
+    """
+    Per-week sums and reading counts of a days x cows matrix sorted by date, in one reduceat pass.
+
+    Returns:
+    - weeks: int array of the week numbers present.
+    - sums: numpy array of shape (num_weeks, num_cows).
+    - counts: int array of shape (num_weeks, num_cows).
+    """
+    weeks = week_numbers(dates)
+    valid = ~np.isnan(values)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(weeks)) + 1))
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=0)
+    counts = np.add.reduceat(valid.astype(np.int64), starts, axis=0)
+    return weeks[starts], sums, counts
+
+def _means(sums, counts):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+class HerdAlertEngine:
+    """
+    Classifies every cow of the herd from its weekly mean activity, like datavisualize.py does for
+    one cow: below mean - 2 std of its weekly means is a red alert, below mean - std an orange alert,
+    anything else green.
+
+    Completed weeks are folded into running statistics and only the current week is kept as sums,
+    so new days are added without going over the history again.
+    """
+
+    def __init__(self, cow_ids):
+        self.cow_ids = [str(cow_id) for cow_id in cow_ids]
+        self.weekly_stats = RunningStats(len(self.cow_ids))
+        self.week = None
+        self.week_sum = np.zeros(len(self.cow_ids))
+        self.week_count = np.zeros(len(self.cow_ids), dtype=np.int64)
+        self.last_date = None
+        self.rows_seen = 0
+
+    def update(self, dates, values):
+        """
+        Adds days of readings, dated after everything added before.
+
+        Parameters:
+        - dates: datetime64 array sorted in time.
+        - values: numpy array of shape (num_days, num_cows).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return self
+        weeks, sums, counts = weekly_sums(dates, values)
+        if self.week is not None and weeks[0] == self.week:
+            self.week_sum += sums[0]
+            self.week_count += counts[0]
+            weeks, sums, counts = weeks[1:], sums[1:], counts[1:]
+
+        if len(weeks):
+            # The current week is complete, and so is every new week but the last one
+            completed = [_means(self.week_sum, self.week_count)[None]] if self.week is not None else []
+            completed.append(_means(sums[:-1], counts[:-1]))
+            self.weekly_stats.update(np.concatenate(completed))
+            self.week, self.week_sum, self.week_count = int(weeks[-1]), sums[-1].copy(), counts[-1].copy()
+
+        self.last_date = pd.Timestamp(np.asarray(dates)[-1]).isoformat()
+        self.rows_seen += len(values)
+        return self
+
+    def latest(self):
+        # Mean of the latest (possibly unfinished) week
+        return _means(self.week_sum, self.week_count)
+
+    def thresholds(self):
+        """
+        Returns:
+        - red_line, orange_line, green_line: numpy arrays with one threshold per cow.
+        """
+        stats = RunningStats.from_dict(self.weekly_stats.to_dict()).update(self.latest()[None])
+        return stats.mean - 2 * stats.std, stats.mean - stats.std, stats.mean
+
+    def levels(self):
+        """
+        Returns:
+        - levels: int array, index into ALERT_LEVELS per cow, NO_DATA without a reading this week.
+        """
+        latest = self.latest()
+        red_line, orange_line, _ = self.thresholds()
+        levels = np.where(latest < red_line, 0, np.where(latest < orange_line, 1, 2))
+        return np.where(np.isnan(latest), NO_DATA, levels)
+
+    def table(self):
+        """
+        Returns:
+        - table: DataFrame indexed by cow ID with the latest weekly mean, the thresholds and the alert.
+        """
+        red_line, orange_line, green_line = self.thresholds()
+        levels = self.levels()
+        return pd.DataFrame({
+            'latest_week_mean': self.latest(),
+            'red_line': red_line,
+            'orange_line': orange_line,
+            'green_line': green_line,
+            'alert': [ALERT_LEVELS[level] if level != NO_DATA else 'No Data' for level in levels],
+        }, index=pd.Index(self.cow_ids, name='cow_id'))
+
+    def summary(self):
+        """
+        Returns:
+        - summary: dict with the number and IDs of cows per alert level, ready for the results panel.
+        """
+        levels = self.levels()
+        return {
+            'levels': list(ALERT_LEVELS),
+            'counts': [int((levels == level).sum()) for level in range(len(ALERT_LEVELS))],
+            'no_data': int((levels == NO_DATA).sum()),
+            'cows': {name: [self.cow_ids[i] for i in np.flatnonzero(levels == level)] for level, name in enumerate(ALERT_LEVELS)},
+            'last_date': self.last_date,
+        }
+
+    def to_dict(self):
+        return {'version': ALERT_STATE_VERSION, 'cow_ids': self.cow_ids, 'weekly_stats': self.weekly_stats.to_dict(),
+                'week': self.week, 'week_sum': self.week_sum.tolist(), 'week_count': self.week_count.tolist(),
+                'last_date': self.last_date, 'rows_seen': self.rows_seen}
+
+    @classmethod
+    def from_dict(cls, state):
+        engine = cls(state['cow_ids'])
+        engine.weekly_stats = RunningStats.from_dict(state['weekly_stats'])
+        engine.week = state['week']
+        engine.week_sum = np.asarray(state['week_sum'], dtype=np.float64)
+        engine.week_count = np.asarray(state['week_count'], dtype=np.int64)
+        engine.last_date = state['last_date']
+        engine.rows_seen = state['rows_seen']
+        return engine
+
+def _load_states(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, ALERT_STATE_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_states(cache_dir, states):
+    state_path = os.path.join(cache_dir, ALERT_STATE_FILE)
+    with open(state_path + '.tmp', 'w') as f:
+        json.dump(states, f)
+    os.replace(state_path + '.tmp', state_path)
+
+def _prefix_and_content_hash(file_path, prefix_bytes, block_size=1 << 20):
+    """
+    Hashes a file in one pass, noting the hash of its first prefix_bytes on the way.
+
+    Returns:
+    - prefix_hash: str sha256 of the first prefix_bytes, None when the file is shorter.
+    - content_hash: str sha256 of the whole file, as datacache.file_content_hash.
+    """
+    digest = hashlib.sha256()
+    prefix_hash = digest.hexdigest() if prefix_bytes == 0 else None
+    position = 0
+    with open(file_path, 'rb') as f:
+        while True:
+            block = f.read(min(block_size, prefix_bytes - position) if position < prefix_bytes else block_size)
+            if not block:
+                break
+            digest.update(block)
+            position += len(block)
+            if position == prefix_bytes:
+                prefix_hash = digest.hexdigest()
+    return prefix_hash, digest.hexdigest()
+
+def _cow_columns(data):
+    return [column for column in reading_columns(data) if str(column).strip().lower() != 'group mean']
+
+def _append_tail(engine, file_path, offset, end_offset, date_column, date_format):
+    # Adds the rows after offset to the engine, False when they are not plain new days of the same cows
+    tail, _ = read_herd_tail(file_path, offset, end_offset=end_offset, date_column=date_column, date_format=date_format)
+    if tail is None:
+        return False
+    dates = tail[date_column or tail.columns[0]]
+    cow_columns = _cow_columns(tail)
+    if [str(column) for column in cow_columns] != engine.cow_ids or not pd.api.types.is_datetime64_any_dtype(dates):
+        return False
+    days = dates.to_numpy()
+    if len(days) and (np.isnat(days).any() or np.any(np.diff(days) < np.timedelta64(0)) or days[0] <= np.datetime64(engine.last_date)):
+        return False
+    engine.update(days, tail[cow_columns].to_numpy(dtype=np.float64))
+    return True
+
+def herd_alerts(file_path, date_column=None, date_format=None, cache_dir=CACHE_DIR, job=None):
+    """
+    Classifies the whole herd of an activity file, cached per dataset version.
+
+    The version is the name of the file's parsed-data cache entry, so an unchanged file is answered
+    from memory, where only the latest version of each file is kept. When days were appended to a
+    CSV file since the last run, only the bytes after the saved offset are parsed and added to the
+    saved state; the file is still hashed once to check that the earlier bytes did not change.
+    Anything else (edited history, new cows, Excel files) parses the whole file and recomputes.
+
+    Parameters:
+    - file_path: str, path to the activity CSV or Excel file.
+    - date_column: str, name of the date column (default is the first column).
+    - date_format: optional str format passed to pd.to_datetime.
+    - cache_dir: str, directory of the parsed-data cache, the alert state is kept there too.
+    - job: optional backgroundjobs.JobContext, checked for cancellation between steps.
+
+    Returns:
+    - summary: dict from HerdAlertEngine.summary() with the dataset version added.
+    - engine: the HerdAlertEngine, e.g. for its per-cow table().
+    """
+    state_key = os.path.abspath(file_path)
+    stat = os.stat(state_key)
+    file_id = (stat.st_size, stat.st_mtime_ns)
+    cached = _alerts_by_file.get(state_key)
+    if cached is not None and cached[0] == file_id:
+        return cached[2]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    states = _load_states(cache_dir)
+    state = states.get(state_key)
+    if not (state and state.get('version') == ALERT_STATE_VERSION):
+        state = None
+    offset = state.get('byte_offset') if state else None
+    prefix_hash, content_hash = _prefix_and_content_hash(state_key, offset or 0)
+    version = dataset_version(content_hash, date_column, date_format)
+    if cached is not None and cached[1] == version:
+        # Touched but not changed
+        _alerts_by_file[state_key] = (file_id, version, cached[2])
+        return cached[2]
+    if job is not None:
+        job.check()
+
+    engine = None
+    if offset is not None and prefix_hash == state.get('prefix_hash'):
+        engine = HerdAlertEngine.from_dict(state)
+        if not _append_tail(engine, state_key, offset, stat.st_size, date_column, date_format):
+            engine = None
+    if engine is None:
+        data = load_frame(file_path, date_column, date_format, cache_dir=cache_dir)
+        dates = data[date_column or data.columns[0]]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            raise ValueError(f"The date column of {file_path} could not be parsed as dates.")
+        cow_columns = _cow_columns(data)
+        order = np.argsort(dates.to_numpy(), kind='stable')
+        order = order[~np.isnat(dates.to_numpy()[order])]
+        engine = HerdAlertEngine(cow_columns)
+        engine.update(dates.to_numpy()[order], data[cow_columns].to_numpy(dtype=np.float64)[order])
+        engine.rows_seen = len(data)
+
+    # The next run parses from the current end of the file, if it is still a prefix then
+    is_excel = os.path.splitext(file_path)[1].lower() in ('.xlsx', '.xls')
+    states[state_key] = dict(engine.to_dict(), byte_offset=None if is_excel else stat.st_size, prefix_hash=content_hash)
+    _save_states(cache_dir, states)
+    result = (dict(engine.summary(), version=version), engine)
+    _alerts_by_file[state_key] = (file_id, version, result)
+    return result
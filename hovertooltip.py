@@ -0,0 +1,118 @@
+# hovertooltip.py
+import numpy as np
+import matplotlib.dates as mdates
+
+HOVER_RADIUS_PX = 10  # How close the mouse has to be to a reading to show its tooltip
+
+class HoverTooltip:
+    """
+    Shows a tooltip for the reading under the mouse on one axes.
+
+    Every series shares one sorted array of dates, so the nearest day is found with a binary search
+    and only the few readings around it are compared in pixels. A single annotation is reused and
+    redrawn with blitting, so the cost of a mouse move does not grow with the length of the series.
+    Charts that already blit their own animated artists pass a redraw function instead, and draw
+    the annotation together with them.
+    """
+
+    def __init__(self, ax, dates, value_name, radius=HOVER_RADIUS_PX, redraw=None):
+        self.ax = ax
+        self.canvas = ax.figure.canvas
+        self.x = mdates.date2num(np.asarray(dates, dtype='datetime64[ns]'))
+        self.value_name = value_name
+        self.radius = radius
+        self._series = []
+        self._background = None
+        self._shown = None
+        self._redraw = redraw
+
+        self.annotation = ax.annotate(
+            '', xy=(0, 0), xytext=(15, 15), textcoords='offset points', animated=True, visible=False,
+            bbox=dict(boxstyle="round,pad=0.3", facecolor='black', alpha=1),
+            arrowprops=dict(arrowstyle='-|>', color='white'),
+        )
+        if redraw is None:
+            self.canvas.mpl_connect('draw_event', lambda event: self._on_draw())
+        self.canvas.mpl_connect('motion_notify_event', lambda event: self._on_move(event))
+        self.canvas.mpl_connect('figure_leave_event', lambda event: self._show(None))
+
+    def add_series(self, label, values, color):
+        """
+        Registers a series drawn on the axes.
+
+        Parameters:
+        - label: str, name shown on the first line of the tooltip.
+        - values: array of readings, one per date.
+        - color: edge colour of the tooltip box, usually the colour of the line.
+        """
+        self._series.append((label, np.asarray(values, dtype=np.float64), color))
+
+    def set_dates(self, dates):
+        # New date range, the series have to be added again
+        self.x = mdates.date2num(np.asarray(dates, dtype='datetime64[ns]'))
+        self._series = []
+        self._shown = None
+        self.annotation.set_visible(False)
+
+    def nearest(self, x_pixel, y_pixel, x_data):
+        """
+        Finds the reading closest to the mouse, within the hover radius.
+
+        Returns:
+        - (series_number, row) of the reading, or None.
+        """
+        if not self._series or not len(self.x):
+            return None
+        right = int(np.searchsorted(self.x, x_data))
+        rows = [row for row in (right - 1, right) if 0 <= row < len(self.x)]
+        candidates = [(number, row) for number in range(len(self._series)) for row in rows]
+        points = np.array([(self.x[row], self._series[number][1][row]) for number, row in candidates])
+        pixels = self.ax.transData.transform(points)
+        distances = np.hypot(pixels[:, 0] - x_pixel, pixels[:, 1] - y_pixel)
+        if np.isnan(distances).all():
+            return None
+        best = int(np.nanargmin(distances))
+        return candidates[best] if distances[best] <= self.radius else None
+
+    def _on_draw(self):
+        # A full redraw (zoom, pan, resize) invalidates the saved background
+        self._background = self.canvas.copy_from_bbox(self.ax.figure.bbox) if self.canvas.supports_blit else None
+        if self.annotation.get_visible():
+            self.ax.draw_artist(self.annotation)
+
+    def _on_move(self, event):
+        if event.inaxes is not self.ax or event.xdata is None:
+            self._show(None)
+        else:
+            self._show(self.nearest(event.x, event.y, event.xdata))
+
+    def _show(self, hit):
+        if hit == self._shown:
+            return
+        self._shown = hit
+        if hit is None:
+            self.annotation.set_visible(False)
+        else:
+            number, row = hit
+            label, values, color = self._series[number]
+            date = mdates.num2date(self.x[row]).strftime("%Y-%m-%d")
+            self.annotation.xy = (self.x[row], values[row])
+            self.annotation.set_text(f'{label}:\nDate: {date}\n{self.value_name}: {values[row]:.2f}')
+            self.annotation.get_bbox_patch().set_edgecolor(color)
+            # Keep the box inside the axes near the right edge
+            on_right = self.ax.transAxes.inverted().transform(self.ax.transData.transform(self.annotation.xy))[0] > 0.7
+            self.annotation.set_position((-15, 15) if on_right else (15, 15))
+            self.annotation.set_horizontalalignment('right' if on_right else 'left')
+            self.annotation.set_visible(True)
+        self._blit()
+
+    def _blit(self):
+        if self._redraw is not None:
+            self._redraw()
+            return
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self.ax.draw_artist(self.annotation)
+        self.canvas.blit(self.ax.figure.bbox)
@@ -0,0 +1,218 @@
+# ingest.py
+import codecs
+import csv
+import io
+import os
+import time
+import numpy as np
+import pandas as pd
+
+SNIFF_BYTES = 64 * 1024
+READING_DTYPE = 'float32'  # Sensor readings do not need float64 precision
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+def sniff_encoding(sample):
+    """
+    Picks the file encoding from its first bytes: a byte order mark if there is one,
+    UTF-8 if the sample decodes cleanly and ISO-8859-1 otherwise.
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith(codecs.BOM_UTF16_LE) or sample.startswith(codecs.BOM_UTF16_BE):
+        return 'utf-16'
+    try:
+        sample.decode('utf-8')
+    except UnicodeDecodeError as error:
+        # A multi-byte character cut off at the end of the sample is still valid UTF-8
+        if error.start < len(sample) - 3:
+            return 'ISO-8859-1'
+    return 'utf-8'
+
+def sniff_delimiter(text):
+    try:
+        return csv.Sniffer().sniff(text, delimiters=',;\t|').delimiter
+    except csv.Error:
+        return ','
+
+def _header_names(text, delimiter):
+    # Column names as pandas reports them, blank headers become 'Unnamed: <position>'
+    header = next(csv.reader(io.StringIO(text), delimiter=delimiter), [])
+    return [name if name.strip() else f'Unnamed: {position}' for position, name in enumerate(header)]
+
+def _to_readings(data, date_column):
+    # Downcast numeric-looking reading columns after a read without dtype hints
+    for col in data.columns:
+        if col == date_column:
+            continue
+        converted = pd.to_numeric(data[col], errors='coerce')
+        if converted.notna().sum() == data[col].notna().sum():
+            data[col] = converted.astype(READING_DTYPE)
+    return data
+
+def _parse_date_column(data, date_column, date_format):
+    if date_column in data.columns and not pd.api.types.is_datetime64_any_dtype(data[date_column]):
+        try:
+            data[date_column] = pd.to_datetime(data[date_column], format=date_format)
+        except (ValueError, TypeError):
+            pass  # Leave a column that is not made of dates as it is
+    return data
+
+def sniff_csv(file_path):
+    """
+    Sniffs the encoding, delimiter and column names of a CSV file from its first bytes.
+
+    Returns:
+    - encoding: str, the sniffed encoding.
+    - delimiter: str, the sniffed delimiter.
+    - names: list of column names as pandas will report them.
+    """
+    with open(file_path, 'rb') as f:
+        sample = f.read(SNIFF_BYTES)
+    encoding = sniff_encoding(sample)
+    text = sample.decode(encoding, errors='ignore')
+    delimiter = sniff_delimiter(text)
+    return encoding, delimiter, _header_names(text, delimiter)
+
+def read_herd_file(file_path, date_column=None, date_format=None, verbose=False):
+    """
+    Reads a herd CSV/XLSX file in one pass with explicit dtypes.
+
+    For CSV files the encoding and delimiter are sniffed from the first bytes, the readings
+    are read as float32 and the date column is parsed to datetime.
+
+    Parameters:
+    - file_path: str, path to the CSV or Excel file.
+    - date_column: str, name of the date column (default is the first column).
+    - date_format: optional str format passed to pd.to_datetime.
+    - verbose: bool, print the ingest rate (default is False).
+
+    Returns:
+    - data: pandas DataFrame, data.attrs['ingest'] holds the encoding, delimiter, rows and rows/sec.
+    """
+    start = time.perf_counter()
+    stats = {'file_path': file_path, 'encoding': None, 'delimiter': None, 'engine': None}
+
+    if os.path.splitext(file_path)[1].lower() in ('.xlsx', '.xls'):
+        data = pd.read_excel(file_path)
+        date_column = date_column or (data.columns[0] if len(data.columns) else None)
+        data = _to_readings(data, date_column)
+        stats['engine'] = 'excel'
+    else:
+        encoding, delimiter, names = sniff_csv(file_path)
+        date_column = date_column or (names[0] if names else None)
+        dtype = {name: READING_DTYPE for name in names if name != date_column}
+        stats.update(encoding=encoding, delimiter=delimiter, engine=CSV_ENGINE)
+
+        try:
+            data = pd.read_csv(file_path, encoding=encoding, sep=delimiter, dtype=dtype, engine=CSV_ENGINE)
+        except UnicodeDecodeError:
+            # Non UTF-8 bytes past the sniffed sample, the only case that reads the file again
+            stats['encoding'] = 'ISO-8859-1'
+            data = pd.read_csv(file_path, encoding='ISO-8859-1', sep=delimiter, dtype=dtype, engine=CSV_ENGINE)
+        except (ValueError, TypeError):
+            # A reading column holds text, read it untyped and downcast what is numeric
+            data = _to_readings(pd.read_csv(file_path, encoding=encoding, sep=delimiter), date_column)
+
+    data = _parse_date_column(data, date_column, date_format)
+
+    seconds = time.perf_counter() - start
+    stats.update(rows=len(data), columns=data.shape[1], seconds=seconds,
+                 rows_per_sec=len(data) / seconds if seconds > 0 else float('inf'))
+    data.attrs['ingest'] = stats
+    if verbose:
+        print(f"Ingested {stats['rows']} rows x {stats['columns']} columns from {file_path} "
+              f"in {seconds:.3f}s ({stats['rows_per_sec']:,.0f} rows/sec, encoding={stats['encoding']}, delimiter={stats['delimiter']!r}).")
+    return data
+
+def reading_columns(data):
+    # Numeric reading columns of any width (float32 from ingest, float64 after arithmetic)
+    return data.select_dtypes(include=[np.number]).columns
+
+def iter_herd_chunks(file_path, chunksize=10000, date_column=None, date_format=None):
+    """
+    Reads a herd CSV file in chunks of rows with the same sniffing and dtypes as read_herd_file.
+
+    Parameters:
+    - file_path: str, path to the CSV file (Excel files cannot be read in chunks).
+    - chunksize: int, number of rows per chunk.
+    - date_column: str, name of the date column (default is the first column).
+    - date_format: optional str format passed to pd.to_datetime.
+
+    Yields:
+    - chunk: pandas DataFrame with float32 readings and the date column parsed.
+    """
+    if os.path.splitext(file_path)[1].lower() in ('.xlsx', '.xls'):
+        raise ValueError("Excel files cannot be read in chunks, convert the file to CSV first.")
+    encoding, delimiter, names = sniff_csv(file_path)
+    date_column = date_column or (names[0] if names else None)
+    dtype = {name: READING_DTYPE for name in names if name != date_column}
+    # The pyarrow engine has no chunked reader, the C engine streams the file
+    for chunk in pd.read_csv(file_path, encoding=encoding, sep=delimiter, dtype=dtype, engine='c', chunksize=chunksize):
+        yield _parse_date_column(chunk, date_column, date_format)
+
+TAIL_BLOCK_BYTES = 64 * 1024
+
+def read_herd_tail(file_path, offset, context_rows=0, end_offset=None, date_column=None, date_format=None):
+    """
+    Reads only the rows of a herd CSV file that start at or after a byte offset, plus up to
+    context_rows rows just before it, with the same sniffing and dtypes as read_herd_file.
+
+    The offset must be the start of a line, e.g. the file size recorded after an earlier read.
+    Only the header, the context rows and the new bytes are read, whatever the length of the history.
+
+    Parameters:
+    - file_path: str, path to the CSV file.
+    - offset: int, byte offset where the new rows start.
+    - context_rows: int, number of rows before the offset to read as well.
+    - end_offset: int, byte offset to stop at (default is the end of the file).
+    - date_column: str, name of the date column (default is the first column).
+    - date_format: optional str format passed to pd.to_datetime.
+
+    Returns:
+    - data: pandas DataFrame with the context rows first, or None when the file cannot be tailed
+      (Excel, a multi-byte line ending encoding or an offset that is not at the start of a line).
+    - num_context: int, number of context rows at the top of data.
+    """
+    if os.path.splitext(file_path)[1].lower() in ('.xlsx', '.xls'):
+        return None, 0
+    encoding, delimiter, names = sniff_csv(file_path)
+    if encoding == 'utf-16':
+        return None, 0
+    date_column = date_column or (names[0] if names else None)
+    end_offset = os.path.getsize(file_path) if end_offset is None else end_offset
+
+    with open(file_path, 'rb') as f:
+        header_end = len(f.readline())
+        if not header_end <= offset <= end_offset:
+            return None, 0
+        if offset > header_end:
+            f.seek(offset - 1)
+            if f.read(1) != b'\n':
+                return None, 0
+
+        # Look back over a doubling window until it holds context_rows line starts before the offset
+        start, window = offset, TAIL_BLOCK_BYTES
+        while context_rows and start > header_end:
+            block_start = max(offset - window, header_end)
+            f.seek(block_start)
+            block = np.frombuffer(f.read(offset - block_start), dtype=np.uint8)
+            # A newline starts a row unless it is the one ending the row just before the offset
+            line_starts = block_start + 1 + np.flatnonzero(block[:-1] == ord('\n'))
+            if block_start == header_end:
+                line_starts = np.concatenate([[header_end], line_starts])
+            if len(line_starts) >= context_rows or block_start == header_end:
+                start = int(line_starts[-context_rows]) if len(line_starts) >= context_rows else header_end
+                break
+            window *= 2
+        f.seek(start)
+        tail = f.read(end_offset - start)
+        num_context = tail[:offset - start].count(b'\n')
+
+    dtype = {name: READING_DTYPE for name in names if name != date_column}
+    data = pd.read_csv(io.BytesIO(tail), header=None, names=names, encoding=encoding, sep=delimiter, dtype=dtype, engine='c')
+    return _parse_date_column(data, date_column, date_format), num_context
@@ -6,6 +6,7 @@ import os
 import shutil
 from visualizebutton import open_visualize_data
 from utils import custom_error_messagebox, custom_visualize_messagebox
+from backgroundjobs import get_background_jobs
 
 CONFIG_FILE = 'upload_config.json'
 SAVE_DIR = 'saved_upload_data'
@@ -33,6 +34,7 @@ class UploadDataApp:
         self.root.configure(bg='black')  # Set the window background to black
 
         self.config = load_config()
+        self.jobs = get_background_jobs(self.root)
 
         self.activity_levels_file_path = self.config.get('activity_levels_file_path')
         self.temperature_analysis_file_path = self.config.get('temperature_analysis_file_path')
@@ -121,20 +123,38 @@ class UploadDataApp:
             self.view_temperature_button.config(state=tk.NORMAL)
 
     def save_data(self):
-        os.makedirs(SAVE_DIR, exist_ok=True)
-
-        if self.activity_levels_file_path:
-            shutil.copy(self.activity_levels_file_path, os.path.join(SAVE_DIR, 'activity_levels' + os.path.splitext(self.activity_levels_file_path)[1]))
-
-        if self.temperature_analysis_file_path:
-            shutil.copy(self.temperature_analysis_file_path, os.path.join(SAVE_DIR, 'temperature_data' + os.path.splitext(self.temperature_analysis_file_path)[1]))
-
+        # Copy and pre-parse the files in the background, the window stays responsive meanwhile
+        self.save_button.config(state=tk.DISABLED, text="Saving...")
+        self.jobs.submit("upload", save_uploaded_files, self.activity_levels_file_path, self.temperature_analysis_file_path,
+                         on_done=self.on_data_saved, on_error=self.on_save_error)
+
+    def on_data_saved(self, _):
+        self.save_button.config(state=tk.NORMAL, text="Save")
+        from results import refresh_results
+        refresh_results()  # The alert pie follows the newly uploaded activity data
         if self.activity_levels_file_path and self.temperature_analysis_file_path:
             custom_visualize_messagebox("Save", "Data saved successfully!", self.root)
             self.root.destroy()  # Close the window after saving
         else:
             custom_visualize_messagebox("Save", "Data saved successfully! Please upload both data files before closing.", self.root)
 
+    def on_save_error(self, error):
+        self.save_button.config(state=tk.NORMAL, text="Save")
+        custom_error_messagebox("Error", f"Could not save the data: {error}", self.root)
+
+def save_uploaded_files(activity_levels_file_path, temperature_analysis_file_path, job=None):
+    from datacache import cache_entry  # pandas is only needed once data is uploaded
+    os.makedirs(SAVE_DIR, exist_ok=True)
+
+    for file_path, saved_name in [(activity_levels_file_path, 'activity_levels'), (temperature_analysis_file_path, 'temperature_data')]:
+        if not file_path:
+            continue
+        if job is not None:
+            job.check()
+        shutil.copy(file_path, os.path.join(SAVE_DIR, saved_name + os.path.splitext(file_path)[1]))
+        # Parse the file into the cache now, so the first chart opens without a full read
+        cache_entry(file_path)
+
 def create_buttons(parent_frame):
     # Create a frame for the buttons
     button_frame = tk.Frame(parent_frame, bg='black')  # Set the frame background to black
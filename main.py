@@ -1,18 +1,18 @@
 # main.py
+import time
+STARTUP_START = time.perf_counter()  # Before the imports, so they are part of the startup measurement
+import json
+import sys
 import tkinter as tk
-from PIL import Image, ImageTk, ImageOps, ImageDraw
 import os
 import shutil
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt  # Import matplotlib.pyplot here
-from leftgraphmain import create_plot
-from rightgraphmain import create_right_plot
-from results import create_results
 from leftbuttons import create_buttons as create_left_buttons
 from rightbuttons import create_buttons as create_right_buttons
 
 CONFIG_FILE = 'upload_config.json'
 SAVE_DIR = 'saved_upload_data'
+STARTUP_TIMING_FLAG = '--startup-timing'  # python main.py --startup-timing [log file]: time the startup, then exit
+HEAVY_MODULES = ('PIL', 'matplotlib', 'pandas', 'numpy', 'mplcursors')
 
 def delete_files():
     if os.path.exists(CONFIG_FILE):
@@ -45,18 +45,121 @@ def create_rounded_rectangle(canvas, x1, y1, x2, y2, radius=25, **kwargs):
               x1, y2-radius, x1, y1+radius, x1, y1+radius, x1, y1]
     return canvas.create_polygon(points, **kwargs, smooth=True)
 
-# Disable interactive mode
-plt.ioff()
+def create_header_image(parent_frame):
+    # Load and round the image, PIL is only imported once the window is on screen
+    from PIL import Image, ImageTk, ImageOps, ImageDraw
+
+    image_path = os.path.abspath('photo/cowmain.png')  # Ensure you have the image file in the specified path
+    if not os.path.exists(image_path):
+        print(f"Image not found at path: {image_path}")
+        return
+
+    image = Image.open(image_path).convert("RGBA")
+    image = image.resize((50, 50), Image.LANCZOS)  # Resize the image
+
+    # Create a circular mask
+    mask = Image.new('L', (50, 50), 0)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse((0, 0, 50, 50), fill=255)
+
+    # Apply the mask to the image
+    output = ImageOps.fit(image, (50, 50), centering=(0.5, 0.5))
+    output.putalpha(mask)
+
+    # Ensure transparency is handled correctly
+    bg = Image.new("RGBA", output.size, (0, 0, 0, 0))
+    bg.paste(output, mask=output)
+
+    # Create a label for the image without borders, keeping a reference to the image
+    image_label = tk.Label(parent_frame, bg='black')
+    image_label.image = ImageTk.PhotoImage(bg)
+    image_label.config(image=image_label.image)
+    image_label.grid(row=0, column=0, padx=(0, 10))
+
+def create_plot_panels():
+    # The embedded plots need matplotlib's TkAgg backend, imported after the first paint
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    from leftgraphmain import create_plot
+    from rightgraphmain import create_right_plot
+    from chartviews import register_chart_view
+
+    # Disable interactive mode
+    plt.ioff()
+
+    # Create the left plot and embed it in the Tkinter GUI
+    fig_left = create_plot()
+    canvas_left = FigureCanvasTkAgg(fig_left, master=left_plot_frame)
+    canvas_left.draw()
+    canvas_left.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+
+    # Create the right plot and embed it in the Tkinter GUI
+    fig_right = create_right_plot()
+    canvas_right = FigureCanvasTkAgg(fig_right, master=right_plot_frame)
+    canvas_right.draw()
+    canvas_right.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+
+    # Cow charts are drawn into these two plots: activity on the left, temperature on the right
+    register_chart_view('activity', fig_left, canvas_left)
+    register_chart_view('temperature', fig_right, canvas_right)
+
+def create_results_panel():
+    # Create results and embed them in the Tkinter GUI
+    from results import create_results
+    create_results(center_result_frame)
+
+def build_panels(root, panels, timings, on_finished=None):
+    """
+    Builds the panels one per event loop turn, so the window paints between them and stays responsive.
+
+    Parameters:
+    - root: the main Tk window.
+    - panels: list of (name, function) pairs, built in this order.
+    - timings: dict, the seconds since start-up at which each panel was on screen are added to it.
+    - on_finished: optional function called once every panel is built.
+    """
+    if not panels:
+        if on_finished is not None:
+            on_finished()
+        return
+    name, create_panel = panels[0]
+    try:
+        create_panel()
+    except Exception as error:
+        print(f"Could not create the {name} panel: {error}")
+    root.update_idletasks()
+    timings[name] = round(time.perf_counter() - STARTUP_START, 4)
+    root.after(1, build_panels, root, panels[1:], timings, on_finished)
+
+def report_startup(root, timings, log_path=None):
+    # Startup timing mode: print the timings as one JSON line, optionally append them to a log, and exit
+    report = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seconds': timings,
+        'heavy_modules_at_first_paint': timings.pop('heavy_modules_at_first_paint'),
+    }
+    print(json.dumps(report))
+    if log_path:
+        with open(log_path, 'a') as f:
+            f.write(json.dumps(report) + "\n")
+    root.destroy()
+
+timing_startup = STARTUP_TIMING_FLAG in sys.argv
+startup_log = None
+if timing_startup:
+    flag_position = sys.argv.index(STARTUP_TIMING_FLAG)
+    startup_log = sys.argv[flag_position + 1] if len(sys.argv) > flag_position + 1 else None
+startup_timings = {'imports': round(time.perf_counter() - STARTUP_START, 4)}
 
 # Create the main window
 root = tk.Tk()
 root.title("Time-series Neural Network Software Suite & App Development For Dairy Herd Monitoring")
 
-# Set the window icon using an image
+# Set the window icon using an image, Tk reads PNG files itself
 icon_image_path = os.path.abspath('photo/cowmain.png')  # Replace with the actual path to your image
 
 if os.path.exists(icon_image_path):
-    icon_image = ImageTk.PhotoImage(file=icon_image_path)
+    icon_image = tk.PhotoImage(file=icon_image_path)
     root.iconphoto(True, icon_image)
 else:
     print(f"Icon image not found at path: {icon_image_path}")
@@ -68,34 +171,6 @@ root.configure(bg='black')
 top_frame = tk.Frame(root, bg='black')
 top_frame.pack(side=tk.TOP, fill=tk.X, pady=(10, 10), padx=(10, 10))
 
-# Load and round the image
-image_path = os.path.abspath('photo/cowmain.png')  # Ensure you have the image file in the specified path
-
-if os.path.exists(image_path):
-    image = Image.open(image_path).convert("RGBA")
-    image = image.resize((50, 50), Image.LANCZOS)  # Resize the image
-    
-    # Create a circular mask
-    mask = Image.new('L', (50, 50), 0)
-    draw = ImageDraw.Draw(mask)
-    draw.ellipse((0, 0, 50, 50), fill=255)
-    
-    # Apply the mask to the image
-    output = ImageOps.fit(image, (50, 50), centering=(0.5, 0.5))
-    output.putalpha(mask)
-    
-    # Ensure transparency is handled correctly
-    bg = Image.new("RGBA", output.size, (0, 0, 0, 0))
-    bg.paste(output, mask=output)
-
-    image_tk = ImageTk.PhotoImage(bg)
-
-    # Create a label for the image without borders
-    image_label = tk.Label(top_frame, image=image_tk, bg='black')
-    image_label.grid(row=0, column=0, padx=(0, 10))
-else:
-    print(f"Image not found at path: {image_path}")
-
 # Create a label for the text "Dairy Herd Monitoring" without borders
 text_label = tk.Label(top_frame, text="Dairy Herd Monitoring", bg='black', fg='white', font=("Helvetica", 16))
 text_label.grid(row=0, column=1, pady=(6, 0))
@@ -121,18 +196,6 @@ left_plot_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(5, 1))  # Ad
 right_plot_frame = tk.Frame(plot_frame, bg='black')
 right_plot_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=(1, 5))  # Adjusted padding to increase width
 
-# Create the left plot and embed it in the Tkinter GUI
-fig_left = create_plot()
-canvas_left = FigureCanvasTkAgg(fig_left, master=left_plot_frame)
-canvas_left.draw()
-canvas_left.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-
-# Create the right plot and embed it in the Tkinter GUI
-fig_right = create_right_plot()
-canvas_right = FigureCanvasTkAgg(fig_right, master=right_plot_frame)
-canvas_right.draw()
-canvas_right.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-
 # Get screen width for setting bottom_frame width
 screen_width, screen_height = center_window(root)
 
@@ -145,9 +208,6 @@ bottom_frame.grid_columnconfigure(1, weight=1)
 center_result_frame = tk.Frame(bottom_frame, bg='black')
 center_result_frame.grid(row=0, column=1, padx=(5, 5), pady=(0, 0))
 
-# Create results and embed them in the Tkinter GUI
-create_results(center_result_frame)
-
 # Create the left buttons and embed them in the Tkinter GUI without borders
 left_button_frame = tk.Frame(bottom_frame, bg='black', width=300)
 left_button_frame.grid(row=0, column=0, padx=(10, 0), pady=(0, 0), sticky='e')
@@ -163,10 +223,18 @@ create_right_buttons(right_button_frame)
 center_window(root)
 
 # Set the window to maximized state
-root.state('zoomed')
+if root.tk.call('tk', 'windowingsystem') == 'win32':
+    root.state('zoomed')
 
 # Bind the delete_files function to the root window's close event
 root.protocol("WM_DELETE_WINDOW", lambda: [delete_files(), root.destroy()])
 
+# Paint the window with its buttons first, then fill in the header image, the plots and the results one by one
+root.update()
+startup_timings['first_paint'] = round(time.perf_counter() - STARTUP_START, 4)
+startup_timings['heavy_modules_at_first_paint'] = [name for name in HEAVY_MODULES if name in sys.modules]
+panels = [('header_image', lambda: create_header_image(top_frame)), ('plots', create_plot_panels), ('results', create_results_panel)]
+build_panels(root, panels, startup_timings, on_finished=(lambda: report_startup(root, startup_timings, startup_log)) if timing_startup else None)
+
 # Run the application
 root.mainloop()
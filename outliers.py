@@ -0,0 +1,98 @@
+# outliers.py
+import warnings
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+OUTLIER_METHODS = ('global_z', 'rolling_mad')
+MAD_TO_STD = 1.4826  # Scales the median absolute deviation to a standard deviation for normal data
+BLOCK_CELLS = 8_000_000  # Upper bound on window cells held in memory at once
+
+def global_z_outliers(values, threshold=3):
+    """
+    The original rule: one z-score per column over the whole history, outliers replaced by the column median.
+
+    Returns:
+    - mask: boolean array, True for outliers.
+    - replacement: numpy array with the value each outlier is replaced by.
+    """
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN columns from sensor dropouts
+        z_scores = (values - np.nanmean(values, axis=0)) / np.nanstd(values, axis=0, ddof=1)
+        medians = np.nanmedian(values, axis=0)
+    mask = np.abs(z_scores) > threshold
+    return mask, np.broadcast_to(medians, values.shape)
+
+def rolling_baseline(values, window=29):
+    """
+    Rolling median and median absolute deviation of every column over a centred window,
+    computed on strided window views a block of rows at a time.
+
+    Parameters:
+    - values: numpy array of shape (num_rows, num_columns).
+    - window: int, odd number of rows in the window.
+
+    Returns:
+    - median: numpy array of shape (num_rows, num_columns).
+    - mad: numpy array of shape (num_rows, num_columns).
+    """
+    if window < 3 or window % 2 == 0:
+        raise ValueError("window must be an odd number of at least 3 rows.")
+    num_rows, num_columns = values.shape
+    half = window // 2
+    padded = np.pad(values.astype(np.float64), ((half, half), (0, 0)), constant_values=np.nan)
+    windows = sliding_window_view(padded, window, axis=0)  # (num_rows, num_columns, window), no copy
+
+    median = np.empty((num_rows, num_columns))
+    mad = np.empty((num_rows, num_columns))
+    block_rows = max(1, BLOCK_CELLS // max(num_columns * window, 1))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN windows from sensor dropouts
+        for start in range(0, num_rows, block_rows):
+            block = windows[start:start + block_rows]
+            block_median = np.nanmedian(block, axis=-1)
+            median[start:start + block_rows] = block_median
+            mad[start:start + block_rows] = np.nanmedian(np.abs(block - block_median[..., None]), axis=-1)
+    return median, mad
+
+def rolling_mad_outliers(values, threshold=3.5, window=29):
+    """
+    Flags readings far from the cow's own recent baseline, so slow changes such as the lactation
+    stage are not treated as outliers. Outliers are replaced by the rolling median.
+
+    Returns:
+    - mask: boolean array, True for outliers.
+    - replacement: numpy array with the value each outlier is replaced by.
+    """
+    median, mad = rolling_baseline(values, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        robust_z = (values - median) / (MAD_TO_STD * mad)
+    mask = (mad > 0) & (np.abs(robust_z) > threshold)
+    return mask, median
+
+def detect_outliers(values, method='global_z', threshold=None, window=29):
+    """
+    Detects outliers over the whole days x cows matrix in one shot.
+
+    Parameters:
+    - values: numpy array of shape (num_rows, num_columns).
+    - method: str, 'global_z' (the original per-column z-score) or 'rolling_mad' (rolling median/MAD baseline).
+    - threshold: float, cut-off on the (robust) z-score (default is 3 for global_z and 3.5 for rolling_mad).
+    - window: int, odd window length in rows for rolling_mad.
+
+    Returns:
+    - mask: boolean array of shape (num_rows, num_columns), True for outliers.
+    - replacement: numpy array of shape (num_rows, num_columns) with the replacement values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if method == 'global_z':
+        return global_z_outliers(values, 3 if threshold is None else threshold)
+    if method == 'rolling_mad':
+        return rolling_mad_outliers(values, 3.5 if threshold is None else threshold, window)
+    raise ValueError(f"Unknown outlier method '{method}', expected one of {OUTLIER_METHODS}.")
+
+def replace_outliers(values, method='global_z', threshold=None, window=29):
+    """
+    Returns the matrix with its outliers replaced, and the outlier mask.
+    """
+    mask, replacement = detect_outliers(values, method, threshold, window)
+    return np.where(mask, replacement, values), mask
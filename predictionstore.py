@@ -0,0 +1,268 @@
+# predictionstore.py
+import json
+import os
+import shutil
+import threading
+import uuid
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from datacache import CACHE_DIR, cache_entry, load_frame
+from forecasting import FORECASTER_PATH, load_forecaster, model_version
+from gapfill import fill_gaps
+
+PREDICTION_DIR = os.path.join(CACHE_DIR, 'predictions')
+PREDICTION_INDEX_FILE = 'index.json'
+PREDICTION_FORMAT_VERSION = 1
+INFERENCE_BATCH_SIZE = 256  # Windows per forward pass
+GAP_CONTEXT_ROWS = 30  # Rows before the windows used to interpolate their gaps
+SHORTFALL_COWS = 5  # Cows listed with the largest shortfall against their forecast
+
+_predictions_by_key = {}
+_models_by_path = {}
+# Prediction store locks only: _lock guards the dicts and the index file, the lock of a key is held while
+# that entry is computed and written. Parsing the data file is serialized by datacache's own per-entry lock.
+_lock = threading.Lock()
+_key_locks = {}
+
+class HerdPredictions:
+    """
+    Next-day predictions and residuals (actual - predicted) of every cow, one row per date.
+
+    Row i holds the prediction for dates[i] made from the days before it. The last row is the
+    forecast for the day after the data, its residuals are NaN until that day is in the file.
+    """
+
+    def __init__(self, dates, columns, predictions, residuals, dataset_version, model_version):
+        self.dates = dates
+        self.columns = list(columns)
+        self.predictions = predictions
+        self.residuals = residuals
+        self.dataset_version = dataset_version
+        self.model_version = model_version
+        self._positions = {column: position for position, column in enumerate(self.columns)}
+
+    def __contains__(self, cow_id):
+        return str(cow_id) in self._positions
+
+    def for_cow(self, cow_id):
+        """
+        Returns:
+        - predictions: DataFrame with 'Date', 'Predicted' and 'Residual' of one cow, or None if it has no forecasts.
+        """
+        position = self._positions.get(str(cow_id))
+        if position is None:
+            return None
+        return pd.DataFrame({'Date': self.dates, 'Predicted': self.predictions[:, position], 'Residual': self.residuals[:, position]})
+
+    def on_dates(self, cow_id, dates):
+        # Predictions of one cow aligned to the given dates, NaN where there is none
+        aligned = np.full(len(dates), np.nan)
+        position = self._positions.get(str(cow_id))
+        if position is None or not len(self.dates):
+            return aligned
+        days = np.asarray(dates, dtype='datetime64[D]')
+        rows = np.clip(np.searchsorted(self.dates, days), 0, len(self.dates) - 1)
+        found = self.dates[rows] == days
+        aligned[found] = self.predictions[rows[found], position]
+        return aligned
+
+    def summary(self, group_column='Group mean', num_cows=SHORTFALL_COWS):
+        """
+        Returns:
+        - summary: dict with the latest day with residuals, the cows furthest below their forecast on it,
+          and the date of the next-day forecast. Ready for the results panel.
+        """
+        cow_positions = [position for column, position in self._positions.items() if column.strip().lower() != group_column.lower()]
+        latest = len(self.dates) - 2  # The last row is the forecast, not yet observed
+        if latest < 0 or not cow_positions:
+            return {'date': None, 'next_date': str(self.dates[-1]) if len(self.dates) else None, 'shortfalls': []}
+        residuals = self.residuals[latest, cow_positions]
+        order = [i for i in np.argsort(residuals) if residuals[i] < 0][:num_cows]
+        return {
+            'date': str(self.dates[latest]),
+            'next_date': str(self.dates[-1]),
+            'shortfalls': [(self.columns[cow_positions[i]], float(residuals[i])) for i in order],
+        }
+
+def _load_index(store_dir):
+    try:
+        with open(os.path.join(store_dir, PREDICTION_INDEX_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_index(store_dir, index):
+    index_path = os.path.join(store_dir, PREDICTION_INDEX_FILE)
+    tmp_path = f"{index_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+
+def _read_entry(entry_dir, dataset_version, model_version):
+    with open(os.path.join(entry_dir, 'meta.json'), 'r') as f:
+        meta = json.load(f)
+    if meta['version'] != PREDICTION_FORMAT_VERSION:
+        return None, meta
+    dates, predictions, residuals = [np.load(os.path.join(entry_dir, f'{name}.npy'), mmap_mode='r') for name in ('dates', 'predictions', 'residuals')]
+    return HerdPredictions(dates, meta['columns'], predictions, residuals, dataset_version, model_version), meta
+
+def _write_entry(entry_dir, predictions, meta):
+    tmp_dir = f"{entry_dir}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(tmp_dir)
+    try:
+        np.save(os.path.join(tmp_dir, 'dates.npy'), predictions.dates)
+        np.save(os.path.join(tmp_dir, 'predictions.npy'), predictions.predictions)
+        np.save(os.path.join(tmp_dir, 'residuals.npy'), predictions.residuals)
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        if os.path.isdir(entry_dir):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def _scaled_matrix(data, model, columns):
+    values = data[columns].to_numpy(dtype=np.float64)
+    if model.scaler is None:
+        return values, np.zeros(len(columns)), np.ones(len(columns))
+    scale_min = np.asarray(model.scaler['min'], dtype=np.float64)
+    scale_range = np.asarray(model.scaler['max'], dtype=np.float64) - scale_min
+    scale_range[~(scale_range > 0)] = 1.0
+    return (values - scale_min) / scale_range, scale_min, scale_range
+
+def predict_days(model, matrix, sequence_length, first_day):
+    """
+    Batched next-day inference for every day from first_day on, plus the day after the matrix.
+
+    Parameters:
+    - model: a fitted forecaster.
+    - matrix: numpy array of shape (num_rows, num_features), gaps already filled.
+    - sequence_length: int, the window length of the model.
+    - first_day: int, first row to predict, at least sequence_length.
+
+    Returns:
+    - predictions: numpy array of shape (num_rows - first_day + 1, num_features).
+    """
+    # (num_windows, sequence_length, num_features) views, window j ends the day before row first_day + j
+    windows = np.moveaxis(sliding_window_view(matrix[first_day - sequence_length:], sequence_length, axis=0), 2, 1)
+    return np.concatenate([model.predict(windows[start:start + INFERENCE_BATCH_SIZE])
+                           for start in range(0, len(windows), INFERENCE_BATCH_SIZE)])
+
+def herd_predictions(file_path, model_path=FORECASTER_PATH, store_dir=PREDICTION_DIR, job=None):
+    """
+    Next-day predictions and residuals of every cow, computed once per dataset and model version.
+
+    Entries are keyed by (dataset version, model version) and hold one row per date. When a file
+    only gained days since the last entry of the same model, only those days are predicted and the
+    earlier rows are carried over. Arrays are stored as float32 .npy files and memory-mapped on read.
+
+    Parameters:
+    - file_path: str, path to the raw activity CSV or Excel file.
+    - model_path: str, forecaster saved by forecasting.save_forecaster.
+    - store_dir: str, directory of the prediction store.
+    - job: optional backgroundjobs.JobContext, checked for cancellation between steps.
+
+    Returns:
+    - predictions: HerdPredictions, or None when there is no saved model.
+    """
+    if not os.path.exists(model_path):
+        return None
+    model_stat = os.stat(model_path)
+    with _lock:
+        cached_model = _models_by_path.get(os.path.abspath(model_path))
+        if cached_model is None or cached_model[0] != (model_stat.st_size, model_stat.st_mtime_ns):
+            model = load_forecaster(model_path)
+            _models_by_path[os.path.abspath(model_path)] = ((model_stat.st_size, model_stat.st_mtime_ns), model)
+        else:
+            model = cached_model[1]
+    version_of_model = getattr(model, 'version', None) or model_version(model)
+
+    # May race with the alerts and visualize jobs on a new file, datacache lets one of them parse it
+    dataset_version = os.path.basename(cache_entry(file_path))
+    key = f"{dataset_version}_{version_of_model}"
+    with _lock:
+        if key in _predictions_by_key:
+            return _predictions_by_key[key]
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    try:
+        with key_lock:
+            # Another thread may have finished this key while we waited
+            with _lock:
+                if key in _predictions_by_key:
+                    return _predictions_by_key[key]
+            return _compute_predictions(file_path, model, version_of_model, dataset_version, key, store_dir, job)
+    finally:
+        with _lock:
+            _key_locks.pop(key, None)
+
+def _compute_predictions(file_path, model, version_of_model, dataset_version, key, store_dir, job):
+    os.makedirs(store_dir, exist_ok=True)
+    entry_dir = os.path.join(store_dir, key)
+    if os.path.exists(os.path.join(entry_dir, 'meta.json')):
+        predictions, _ = _read_entry(entry_dir, dataset_version, version_of_model)
+        if predictions is not None:
+            with _lock:
+                _predictions_by_key[key] = predictions
+            return predictions
+    if job is not None:
+        job.check()
+
+    data = load_frame(file_path)
+    dates = data.iloc[:, 0].to_numpy(dtype='datetime64[D]')
+    columns = model.scaler['columns'] if model.scaler is not None else [str(column) for column in data.columns[1:]]
+    missing = [column for column in columns if column not in data.columns]
+    if missing:
+        raise KeyError(f"The forecaster was trained on columns missing from {file_path}: {missing[:5]}")
+    sequence_length = model.sequence_length
+    if len(data) < sequence_length:
+        raise ValueError(f"{file_path} has {len(data)} days, the forecaster needs {sequence_length}.")
+    matrix, scale_min, scale_range = _scaled_matrix(data, model, columns)
+
+    # Carry over the rows of the previous entry of this file and model when days were only appended
+    state_key = f"{os.path.abspath(file_path)}|{version_of_model}"
+    with _lock:
+        previous = _load_index(store_dir).get(state_key)
+    first_day = sequence_length
+    kept = None
+    if previous and previous['key'] != key and os.path.isdir(os.path.join(store_dir, previous['key'])):
+        old, meta = _read_entry(os.path.join(store_dir, previous['key']), previous['dataset_version'], version_of_model)
+        old_rows = meta['rows']
+        if old is not None and meta['columns'] == columns and sequence_length < old_rows <= len(dates) \
+                and dates[old_rows - 1] == np.datetime64(meta['last_date']):
+            first_day = old_rows
+            kept = old
+
+    # Only the rows the new windows read are gap-filled, with some history for the interpolation
+    context_start = max(first_day - sequence_length - GAP_CONTEXT_ROWS, 0)
+    filled, _ = fill_gaps(matrix[context_start:], 'linear')
+    scaled_predictions = predict_days(model, filled, sequence_length, first_day - context_start)
+    if job is not None:
+        job.check()
+
+    new_predictions = (scaled_predictions * scale_range + scale_min).astype(np.float32)
+    actuals = data[columns].to_numpy(dtype=np.float32)[first_day:]
+    new_residuals = np.vstack([actuals - new_predictions[:-1], np.full((1, len(columns)), np.nan, dtype=np.float32)])
+    new_dates = np.append(dates[first_day:], dates[-1] + np.timedelta64(1, 'D'))
+    if kept is not None:
+        # The old next-day forecast row is now an observed day and was predicted again above
+        new_dates = np.concatenate([kept.dates[:-1], new_dates])
+        new_predictions = np.vstack([kept.predictions[:-1], new_predictions])
+        new_residuals = np.vstack([kept.residuals[:-1], new_residuals])
+
+    predictions = HerdPredictions(new_dates, columns, new_predictions, new_residuals, dataset_version, version_of_model)
+    meta = {'version': PREDICTION_FORMAT_VERSION, 'columns': columns, 'rows': len(dates), 'last_date': str(dates[-1]),
+            'sequence_length': sequence_length, 'model': model.name}
+    _write_entry(entry_dir, predictions, meta)
+
+    # Only the latest entry per file and model is kept on disk
+    with _lock:
+        index = _load_index(store_dir)
+        replaced = index.get(state_key)
+        if replaced and replaced['key'] != key:
+            shutil.rmtree(os.path.join(store_dir, replaced['key']), ignore_errors=True)
+            _predictions_by_key.pop(replaced['key'], None)
+        index[state_key] = {'key': key, 'dataset_version': dataset_version}
+        _save_index(store_dir, index)
+        _predictions_by_key[key] = predictions
+    return predictions
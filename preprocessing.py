@@ -0,0 +1,584 @@
+# preprocessing.py
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from datacache import load_frame
+from gapfill import fill_frame_gaps, fill_gaps
+from ingest import iter_herd_chunks, read_herd_tail, reading_columns
+from outliers import replace_outliers
+from runningstats import ReservoirSample, RunningStats
+from stagemetrics import StageMetrics
+
+# Settings that differ between the sensor types, everything else is shared
+SENSOR_TYPES = {
+    'activity': {'label': 'activity', 'output_filename': 'preprocessed_activity_data.csv'},
+    'temperature': {'label': 'temperature', 'output_filename': 'preprocessed_temperature_data.csv'},
+}
+
+OUTLIER_Z_THRESHOLD = 3
+OUTLIER_METHOD = 'global_z'  # 'rolling_mad' follows each cow's own baseline, see outliers.py
+OUTLIER_WINDOW = 29  # Rows in the rolling median/MAD window
+MISSING_WARNING_PERCENT = 30
+GAP_FILL_METHOD = 'spline'  # One of gapfill.GAP_FILL_METHODS
+GROUP_MEAN_COLUMN = 'Group mean'  # Reference series for the 'herd_mean' gap fill
+DRIFT_THRESHOLD = 0.1  # Relative change in the fitted statistics that triggers a full refit
+MISSING_CONTEXT_ROWS = 30  # History rows used to interpolate gaps in newly appended rows
+STATE_VERSION = 1
+
+def default_output_dir():
+    desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
+    return os.path.join(desktop_path, "preprocessed_data")
+
+# Common functions
+def load_data(file_path):
+    data = load_frame(file_path, writable=True)
+    print(f"\nStep 1: Data Collection and Integration - Loaded data from {file_path}.\n")
+    return data
+
+def handle_missing_values(df, method=GAP_FILL_METHOD, max_gap=None):
+    actions_taken = []
+    numeric_cols = reading_columns(df)
+    missing = df.isnull().to_numpy()
+    if not missing.any():
+        actions_taken.append(f"No missing values found. No need for {method} interpolation.")
+    else:
+        missing_percentage = missing.mean(axis=0) * 100
+        if missing_percentage.max() > MISSING_WARNING_PERCENT:
+            actions_taken.append(f"Columns with more than {MISSING_WARNING_PERCENT}% missing values found. Consider removing these columns.")
+        # All gaps of all columns are filled in one batched pass
+        df, filled_counts = fill_frame_gaps(df, numeric_cols, method, max_gap, reference_column=GROUP_MEAN_COLUMN)
+        for col in filled_counts.index[filled_counts.to_numpy() > 0]:
+            actions_taken.append(f"Interpolated {filled_counts[col]} missing values in column '{col}' ({method}).")
+    return df, actions_taken
+
+def remove_duplicates(df):
+    initial_row_count = df.shape[0]
+    df.drop_duplicates(inplace=True)
+    final_row_count = df.shape[0]
+    return df, initial_row_count - final_row_count
+
+def identify_and_handle_outliers(df, threshold=None, method=OUTLIER_METHOD, window=OUTLIER_WINDOW):
+    actions_taken = []
+    numeric_cols = reading_columns(df)
+    if len(numeric_cols) == 0:
+        return df, actions_taken
+
+    # One pass over the whole cows x days matrix, no per-column loop
+    values = df[numeric_cols].to_numpy(dtype=np.float64)
+    if threshold is None and method == 'global_z':
+        threshold = OUTLIER_Z_THRESHOLD
+    values, outliers = replace_outliers(values, method, threshold, window)
+
+    dtypes = df[numeric_cols].dtypes
+    df[numeric_cols] = pd.DataFrame(values, index=df.index, columns=numeric_cols).astype(dtypes.to_dict())
+
+    replaced_with = "median value" if method == 'global_z' else f"rolling {window}-row median"
+    num_outliers = outliers.sum(axis=0)
+    for position in np.flatnonzero(num_outliers):
+        actions_taken.append(f"Capped {num_outliers[position]} outliers in column '{numeric_cols[position]}' to {replaced_with}.")
+    return df, actions_taken
+
+def apply_normalization(df):
+    numeric_cols = reading_columns(df)
+    values = df[numeric_cols].to_numpy(dtype=np.float64)
+
+    # Same result as sklearn's MinMaxScaler: NaNs are ignored and constant columns map to 0
+    data_min = np.nanmin(values, axis=0) if len(values) else np.zeros(len(numeric_cols))
+    data_range = (np.nanmax(values, axis=0) if len(values) else np.zeros(len(numeric_cols))) - data_min
+    data_range[data_range == 0] = 1.0
+    df[numeric_cols] = (values - data_min) / data_range
+
+    scaling_action = "Applied min-max normalization (MinMaxScaler) over all columns at once."
+    return df, scaling_action
+
+def label_date_column(data):
+    # Ensure the first cell of the first column is labeled 'date'
+    if data.columns[0] == '' or pd.isna(data.columns[0]):
+        data.columns = ['date'] + data.columns[1:].tolist()
+    else:
+        data.columns = ['date'] + data.columns[1:].tolist() if data.columns[0] != 'date' else data.columns
+
+    # Ensure column names are stripped of leading/trailing spaces
+    data.columns = data.columns.str.strip()
+    return data
+
+def state_path_for(output_path):
+    return os.path.splitext(output_path)[0] + '.state.json'
+
+def load_state(output_path):
+    state_path = state_path_for(output_path)
+    if not os.path.exists(state_path):
+        return None
+    try:
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if state.get('version') == STATE_VERSION else None
+
+def save_state(output_path, state):
+    state_path = state_path_for(output_path)
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+def _last_date(dates):
+    if pd.api.types.is_datetime64_any_dtype(dates) and len(dates):
+        return pd.Timestamp(dates.max()).isoformat()
+    return None
+
+def fit_cleaning_state(data, raw_values, cleaned_values, numeric_cols, sensor_type, rows_seen):
+    """
+    Collects the statistics a full run used, so later runs can clean and scale new rows the same way.
+
+    Parameters:
+    - data: pandas DataFrame after duplicate removal, with the 'date' column.
+    - raw_values: numpy array of the reading columns before outlier handling.
+    - cleaned_values: numpy array of the reading columns after outlier handling, before scaling.
+    - numeric_cols: list of the reading column names.
+    - sensor_type: str, one of SENSOR_TYPES.
+    - rows_seen: int, number of rows read from the file, before duplicate removal.
+
+    Returns:
+    - state: dict with the fitted z-score and scaler statistics, running statistics and the last seen date.
+    """
+    fitted_scale = RunningStats(len(numeric_cols)).update(cleaned_values)
+    with np.errstate(invalid='ignore'):
+        fitted = {
+            'mean': np.nanmean(raw_values, axis=0).tolist() if len(raw_values) else [],
+            'std': np.nanstd(raw_values, axis=0, ddof=1).tolist() if len(raw_values) else [],
+            'median': np.nanmedian(raw_values, axis=0).tolist() if len(raw_values) else [],
+            'min': fitted_scale.min.tolist(),
+            'max': fitted_scale.max.tolist(),
+        }
+    return {
+        'version': STATE_VERSION,
+        'sensor_type': sensor_type,
+        'columns': [str(col) for col in numeric_cols],
+        'fitted': fitted,
+        'raw_stats': RunningStats(len(numeric_cols)).update(raw_values).to_dict(),
+        'scale_stats': fitted_scale.to_dict(),
+        'last_date': _last_date(data['date']),
+        'rows_seen': int(rows_seen),
+    }
+
+def detect_drift(state, threshold=DRIFT_THRESHOLD):
+    """
+    Compares the running statistics with the ones the output was fitted on.
+
+    A column has drifted when its mean moved by more than threshold standard deviations, its
+    standard deviation changed by more than threshold (relative), or its cleaned values left the
+    fitted min/max range by more than threshold of that range.
+
+    Returns:
+    - drifted: boolean numpy array, one entry per reading column.
+    """
+    fitted = {key: np.asarray(value, dtype=np.float64) for key, value in state['fitted'].items()}
+    raw_stats = RunningStats.from_dict(state['raw_stats'])
+    scale_stats = RunningStats.from_dict(state['scale_stats'])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fitted_range = np.where(fitted['max'] - fitted['min'] > 0, fitted['max'] - fitted['min'], 1.0)
+        mean_shift = np.abs(raw_stats.mean - fitted['mean']) / fitted['std']
+        std_change = np.abs(raw_stats.std / fitted['std'] - 1)
+        range_growth = np.maximum(scale_stats.max - fitted['max'], fitted['min'] - scale_stats.min) / fitted_range
+    return (np.nan_to_num(mean_shift) > threshold) | (np.nan_to_num(std_change) > threshold) | (np.nan_to_num(range_growth) > threshold)
+
+def _csv_offset(file_path, file_size):
+    # Where the next incremental run starts reading, None for files that can only be read whole
+    return None if os.path.splitext(file_path)[1].lower() in ('.xlsx', '.xls') else int(file_size)
+
+def append_new_rows(file_path, state, output_path, drift_threshold=DRIFT_THRESHOLD):
+    """
+    Cleans and scales only the rows added since the last run, using the persisted statistics,
+    and appends them to the existing output file.
+
+    For CSV files only the bytes after the offset stored in the state are parsed, with
+    MISSING_CONTEXT_ROWS rows before them for the gap filling, so a daily run does not re-parse
+    the history. Other files, or a file that was rewritten rather than appended to, are loaded whole.
+
+    Returns:
+    - appended: int number of rows appended, or None when a full refit is needed instead.
+    """
+    file_size = os.path.getsize(file_path)
+    data = None
+    if state.get('byte_offset') is not None:
+        data, num_context = read_herd_tail(file_path, state['byte_offset'], MISSING_CONTEXT_ROWS, end_offset=file_size)
+    if data is not None:
+        data = label_date_column(data)
+        rows_before = state['rows_seen'] - num_context  # File rows that precede the first row of data
+    else:
+        data = label_date_column(load_data(file_path))
+        rows_before = 0
+    numeric_cols = list(reading_columns(data))
+    if [str(col) for col in numeric_cols] != state['columns']:
+        print("The columns changed since the last run, a full refit is needed.")
+        return None
+
+    if state['last_date'] is not None and pd.api.types.is_datetime64_any_dtype(data['date']):
+        new_positions = np.flatnonzero((data['date'] > pd.Timestamp(state['last_date'])).to_numpy())
+    else:
+        new_positions = np.arange(state['rows_seen'] - rows_before, len(data))
+    if len(new_positions) == 0:
+        print("No new rows since the last run.")
+        return 0
+    if new_positions[0] != len(data) - len(new_positions):
+        print("New rows are not appended at the end of the file, a full refit is needed.")
+        return None
+
+    # Step 2: Data Cleaning, with a little history so the gaps at the start of the new rows can be interpolated
+    context_start = max(new_positions[0] - MISSING_CONTEXT_ROWS, 0)
+    window, _ = handle_missing_values(data.iloc[context_start:].copy())
+    new_rows, _ = remove_duplicates(window.iloc[new_positions[0] - context_start:].copy())
+
+    fitted = {key: np.asarray(value, dtype=np.float64) for key, value in state['fitted'].items()}
+    raw_values = new_rows[numeric_cols].to_numpy(dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        outliers = np.abs((raw_values - fitted['mean']) / fitted['std']) > OUTLIER_Z_THRESHOLD
+    cleaned_values = np.where(outliers, fitted['median'], raw_values)
+
+    updated = dict(state)
+    updated['raw_stats'] = RunningStats.from_dict(state['raw_stats']).update(raw_values).to_dict()
+    updated['scale_stats'] = RunningStats.from_dict(state['scale_stats']).update(cleaned_values).to_dict()
+    drifted = detect_drift(updated, drift_threshold)
+    if drifted.any():
+        print(f"Statistics drifted beyond {drift_threshold} in {int(drifted.sum())} columns, a full refit is needed.")
+        return None
+
+    # Step 3: Data Transformation with the fitted scaler
+    data_range = fitted['max'] - fitted['min']
+    data_range[~(data_range > 0)] = 1.0
+    new_rows[numeric_cols] = (cleaned_values - fitted['min']) / data_range
+    new_rows.to_csv(output_path, mode='a', header=False, index=False)
+
+    updated['last_date'] = _last_date(data['date'])
+    updated['rows_seen'] = int(rows_before + len(data))
+    updated['byte_offset'] = _csv_offset(file_path, file_size)
+    save_state(output_path, updated)
+    print(f"Appended {len(new_rows)} new rows to {output_path} ({int(outliers.sum())} outliers capped).")
+    return len(new_rows)
+
+def frame_preview(data, num_columns=6, num_rows=5):
+    # First and last columns of the first rows, with '...' in between
+    df_preview = data[data.columns[:num_columns]].head(num_rows).copy()
+    df_preview["..."] = "..."
+    for col in data.columns[-num_columns:]:
+        df_preview[col] = data[col].head(num_rows)
+    return df_preview.to_string(index=False)
+
+def _changed_cells(before, after):
+    # Cells whose value differs, a NaN that stays NaN is unchanged
+    return int((~((before == after) | (np.isnan(before) & np.isnan(after)))).sum())
+
+def process_sensor_data(file_path, sensor_type='activity', output_dir=None, incremental=False, drift_threshold=DRIFT_THRESHOLD,
+                        metrics=None, preview=False):
+    """
+    Loads, cleans, normalises and saves one herd file.
+
+    In incremental mode only the rows newer than the last run are processed with the persisted
+    statistics and appended to the output. The whole history is refitted when there is no previous
+    state or when the statistics drift more than drift_threshold.
+
+    Parameters:
+    - file_path: str, path to the raw CSV or Excel file.
+    - sensor_type: str, one of SENSOR_TYPES ('activity' or 'temperature').
+    - output_dir: str, folder for the preprocessed file (default is Desktop/preprocessed_data).
+    - incremental: bool, append only the new rows when possible (default is False).
+    - drift_threshold: float, drift that triggers a full refit in incremental mode.
+    - metrics: optional stagemetrics.StageMetrics receiving one event per stage.
+    - preview: bool, print the first rows of the final DataFrame (default is False).
+
+    Returns:
+    - output_path: str, path of the saved preprocessed file.
+    """
+    if sensor_type not in SENSOR_TYPES:
+        raise ValueError(f"Unknown sensor type '{sensor_type}', expected one of {sorted(SENSOR_TYPES)}.")
+    sensor = SENSOR_TYPES[sensor_type]
+    folder_path = output_dir or default_output_dir()
+    output_path = os.path.join(folder_path, sensor['output_filename'])
+    metrics = metrics if metrics is not None else StageMetrics()
+    run_start = time.perf_counter()
+
+    if incremental:
+        state = load_state(output_path)
+        if state is not None and state['sensor_type'] == sensor_type and os.path.exists(output_path):
+            with metrics.stage('append_new_rows') as stage:
+                appended = append_new_rows(file_path, state, output_path, drift_threshold)
+                stage['rows_out'] = appended
+            if appended is not None:
+                metrics.emit({'event': 'run', 'stage': 'process_sensor_data', 'mode': 'incremental',
+                              'seconds': time.perf_counter() - run_start, 'output_path': output_path})
+                print("\n\n" + "-"*50 + "\n\n")
+                return output_path
+        print("Running a full refit of the whole history.")
+
+    # Step 1: Load Data
+    file_size = os.path.getsize(file_path)  # Taken first, so rows appended during the run are read again next time
+    with metrics.stage('load') as stage:
+        data = load_data(file_path)
+        data = label_date_column(data)
+        rows_read = len(data)
+        stage['rows_out'], stage['columns_out'] = data.shape
+
+    print("\n")
+
+    # Step 2: Data Cleaning
+    # Handle missing values
+    with metrics.stage('missing_values', data) as stage:
+        missing_before = int(data.isnull().to_numpy().sum())
+        data, missing_actions = handle_missing_values(data)
+        stage['rows_out'], stage['columns_out'] = data.shape
+        stage['cells_changed'] = missing_before - int(data.isnull().to_numpy().sum())
+    print("Step 2: Data Cleaning - Missing Values")
+    for action in missing_actions:
+        print(action)
+
+    print("\n")
+
+    # Remove duplicates
+    with metrics.stage('duplicates', data) as stage:
+        data, num_duplicates_removed = remove_duplicates(data)
+        stage['rows_out'], stage['columns_out'] = data.shape
+        stage['cells_changed'] = num_duplicates_removed * data.shape[1]
+    print(f"Removed {num_duplicates_removed} duplicate rows.")
+
+    print("\n")
+
+    # Identify and handle outliers
+    with metrics.stage('outliers', data) as stage:
+        numeric_cols = reading_columns(data)
+        raw_values = data[numeric_cols].to_numpy(dtype=np.float64)
+        data, outlier_actions = identify_and_handle_outliers(data)
+        cleaned_values = data[numeric_cols].to_numpy(dtype=np.float64)
+        stage['rows_out'], stage['columns_out'] = data.shape
+        stage['cells_changed'] = _changed_cells(raw_values, cleaned_values)
+    print("Step 2: Data Cleaning - Outliers")
+    for action in outlier_actions:
+        print(action)
+
+    print("\n\n")
+
+    # Keep the fitted statistics for incremental runs
+    with metrics.stage('fit_state', data):
+        state = fit_cleaning_state(data, raw_values, cleaned_values, numeric_cols, sensor_type, rows_read)
+        state['byte_offset'] = _csv_offset(file_path, file_size)
+
+    # Step 3: Data Transformation
+    with metrics.stage('normalization', data) as stage:
+        data_transformed, scaling_action = apply_normalization(data)
+        stage['rows_out'], stage['columns_out'] = data_transformed.shape
+        stage['cells_changed'] = _changed_cells(cleaned_values, data_transformed[numeric_cols].to_numpy(dtype=np.float64))
+    print("Step 3: Data Transformation")
+    print(scaling_action)
+
+    print("\n\n")
+
+    # Display final DataFrame, only built when asked for
+    if preview:
+        print("Final DataFrame preview:")
+        print(frame_preview(data_transformed))
+
+        print("\n\n")
+
+    # Save the cleaned and transformed data
+    with metrics.stage('save', data_transformed) as stage:
+        if not os.path.exists(folder_path):
+            os.makedirs(folder_path, exist_ok=True)
+            print(f"Created folder: {folder_path}")
+
+        if os.path.exists(output_path):
+            os.remove(output_path)
+            print(f"Deleted existing file: {output_path}")
+        data_transformed.to_csv(output_path, index=False)
+        save_state(output_path, state)
+        stage['bytes_written'] = os.path.getsize(output_path)
+    print(f"Processed file saved at: {output_path}")
+
+    metrics.emit({'event': 'run', 'stage': 'process_sensor_data', 'mode': 'full', 'seconds': time.perf_counter() - run_start,
+                  'rows_in': rows_read, 'rows_out': len(data_transformed), 'output_path': output_path})
+    print("\n\n" + "-"*50 + "\n\n")
+    return output_path
+
+def _fill_chunk(values, carry):
+    """
+    Fills gaps in a chunk of readings by linear interpolation, using the last filled row of the
+    previous chunk as the left anchor. Gaps still open at the end of the chunk hold the last value,
+    because the next reading is not known yet.
+    """
+    if not np.isnan(values).any():
+        return values
+    filled, _ = fill_gaps(values if carry is None else np.vstack([carry, values]), 'linear')
+    return filled if carry is None else filled[1:]
+
+def _first_new_rows(row_hashes, seen_hashes):
+    """
+    Marks the first occurrence of every row hash that is not in seen_hashes yet.
+
+    Returns:
+    - keep: boolean array, True for the rows to keep.
+    - seen_hashes: sorted uint64 array of every hash seen so far.
+    """
+    unique_hashes, first_positions = np.unique(row_hashes, return_index=True)
+    slots = np.searchsorted(seen_hashes, unique_hashes)
+    is_new = slots == len(seen_hashes)
+    is_new[~is_new] = seen_hashes[slots[~is_new]] != unique_hashes[~is_new]
+    keep = np.zeros(len(row_hashes), dtype=bool)
+    keep[first_positions[is_new]] = True
+    seen_hashes = np.concatenate([seen_hashes, unique_hashes[is_new]])
+    seen_hashes.sort(kind='stable')  # Two sorted runs, merged in about linear time
+    return keep, seen_hashes
+
+def _clean_chunks(file_path, chunksize, keep_masks):
+    # Yields (chunk, reading column names, filled reading values, rows read) with duplicate rows removed.
+    # The first pass hashes the rows and appends one bit-packed keep mask per chunk to keep_masks,
+    # later passes reuse the masks instead of hashing again
+    first_pass = not keep_masks
+    seen_hashes = np.empty(0, dtype=np.uint64)
+    carry = None
+    for position, chunk in enumerate(iter_herd_chunks(file_path, chunksize)):
+        chunk = label_date_column(chunk)
+        numeric_cols = reading_columns(chunk)
+        values = _fill_chunk(chunk[numeric_cols].to_numpy(dtype=np.float64), carry)
+        if len(values):
+            carry = values[-1:]
+        chunk[numeric_cols] = values
+
+        # Drop rows identical to any earlier row, like drop_duplicates over the whole file
+        if first_pass:
+            row_hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy(dtype=np.uint64)
+            keep, seen_hashes = _first_new_rows(row_hashes, seen_hashes)
+            keep_masks.append(np.packbits(keep))
+        else:
+            keep = np.unpackbits(keep_masks[position], count=len(chunk)).astype(bool)
+        yield chunk[keep], numeric_cols, values[keep], len(keep)
+
+def process_sensor_data_chunked(file_path, sensor_type='activity', output_dir=None, chunksize=10000, sample_size=10000, metrics=None):
+    """
+    Preprocesses a herd CSV file that does not fit in memory, chunksize rows at a time.
+
+    Pass 1 streams the file into running mean/variance (Welford) and a reservoir sample for the
+    approximate median. Pass 2 applies the outlier rule to get the min/max the scaler needs, and
+    pass 3 cleans, scales and writes each chunk as it goes. Apart from chunksize and sample_size,
+    memory grows only with the duplicate check: pass 1 keeps 8 bytes per distinct row (a sorted
+    uint64 hash array, O(rows x 8 bytes)) and all passes keep one bit per row for the keep masks.
+    The saved state can drive later incremental runs.
+
+    Parameters:
+    - file_path: str, path to the raw CSV file.
+    - sensor_type: str, one of SENSOR_TYPES ('activity' or 'temperature').
+    - output_dir: str, folder for the preprocessed file (default is Desktop/preprocessed_data).
+    - chunksize: int, number of rows read per chunk.
+    - sample_size: int, rows kept in the reservoir sample for the median.
+    - metrics: optional stagemetrics.StageMetrics receiving one event per pass.
+
+    Returns:
+    - output_path: str, path of the saved preprocessed file.
+    """
+    if sensor_type not in SENSOR_TYPES:
+        raise ValueError(f"Unknown sensor type '{sensor_type}', expected one of {sorted(SENSOR_TYPES)}.")
+    folder_path = output_dir or default_output_dir()
+    output_path = os.path.join(folder_path, SENSOR_TYPES[sensor_type]['output_filename'])
+    os.makedirs(folder_path, exist_ok=True)
+    metrics = metrics if metrics is not None else StageMetrics()
+    run_start = time.perf_counter()
+
+    # Pass 1: global statistics with online algorithms
+    raw_stats = None
+    sample = None
+    total_rows = 0
+    keep_masks = []  # Duplicate rows found in pass 1, reused by passes 2 and 3
+    file_size = os.path.getsize(file_path)
+    with metrics.stage('statistics_pass') as stage:
+        for chunk, numeric_cols, values, rows_read in _clean_chunks(file_path, chunksize, keep_masks):
+            if raw_stats is None:
+                raw_stats = RunningStats(len(numeric_cols))
+                sample = ReservoirSample(len(numeric_cols), sample_size)
+            raw_stats.update(values)
+            sample.update(values)
+            total_rows += rows_read
+        stage['rows_in'] = total_rows
+    if raw_stats is None:
+        raise ValueError(f"No rows found in {file_path}.")
+    mean, std, median = raw_stats.mean, raw_stats.std, sample.median()
+    print(f"Pass 1: Streamed {total_rows} rows for mean/std and the approximate median.")
+
+    def capped(values):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            outliers = np.abs((values - mean) / std) > OUTLIER_Z_THRESHOLD
+        return np.where(outliers, median, values), outliers
+
+    # Pass 2: min/max of the cleaned readings for the scaler
+    scale_stats = RunningStats(len(raw_stats.count))
+    with metrics.stage('scaler_pass') as stage:
+        for chunk, numeric_cols, values, _ in _clean_chunks(file_path, chunksize, keep_masks):
+            scale_stats.update(capped(values)[0])
+        stage['rows_in'] = total_rows
+    data_range = scale_stats.max - scale_stats.min
+    data_range[~(data_range > 0)] = 1.0
+    print("Pass 2: Computed the min/max of the cleaned readings.")
+
+    # Pass 3: clean, scale and write chunk by chunk
+    tmp_path = output_path + '.tmp'
+    num_outliers = 0
+    last_chunk = None
+    rows_written = 0
+    with metrics.stage('write_pass') as stage, open(tmp_path, 'w', newline='') as f:
+        for position, (chunk, numeric_cols, values, _) in enumerate(_clean_chunks(file_path, chunksize, keep_masks)):
+            cleaned, outliers = capped(values)
+            num_outliers += int(outliers.sum())
+            chunk[numeric_cols] = (cleaned - scale_stats.min) / data_range
+            chunk.to_csv(f, header=(position == 0), index=False)
+            last_chunk = chunk
+            rows_written += len(chunk)
+        stage.update(rows_in=total_rows, rows_out=rows_written, cells_changed=num_outliers)
+    os.replace(tmp_path, output_path)
+    print(f"Pass 3: Capped {num_outliers} outliers and saved the processed file at: {output_path}")
+
+    state = {
+        'version': STATE_VERSION,
+        'sensor_type': sensor_type,
+        'columns': [str(col) for col in numeric_cols],
+        'fitted': {'mean': mean.tolist(), 'std': std.tolist(), 'median': median.tolist(),
+                   'min': scale_stats.min.tolist(), 'max': scale_stats.max.tolist()},
+        'raw_stats': raw_stats.to_dict(),
+        'scale_stats': scale_stats.to_dict(),
+        'last_date': _last_date(last_chunk['date']) if last_chunk is not None else None,
+        'rows_seen': total_rows,
+        'byte_offset': _csv_offset(file_path, file_size),
+    }
+    save_state(output_path, state)
+    metrics.emit({'event': 'run', 'stage': 'process_sensor_data_chunked', 'mode': 'chunked', 'seconds': time.perf_counter() - run_start,
+                  'rows_in': total_rows, 'rows_out': rows_written, 'output_path': output_path})
+    return output_path
+
+def _process_job(job):
+    file_path, sensor_type, output_dir, incremental = job
+    return process_sensor_data(file_path, sensor_type, output_dir, incremental)
+
+def process_herd_files(jobs, max_workers=None, incremental=False):
+    """
+    Preprocesses several files concurrently, one process per file.
+
+    Parameters:
+    - jobs: list of (file_path, sensor_type) or (file_path, sensor_type, output_dir) tuples.
+    - max_workers: int, size of the process pool (default is the number of CPU cores).
+    - incremental: bool, append only new rows where a previous run's state exists (default is False).
+
+    Returns:
+    - output_paths: list of saved file paths, in the order of the jobs.
+    """
+    jobs = [tuple(job) + (None,) * (3 - len(job)) + (incremental,) for job in jobs]
+    if len(jobs) <= 1 or max_workers == 1:
+        return [_process_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_process_job, jobs))
+
+# Example usage
+if __name__ == "__main__":
+    process_herd_files([
+        ('C:/Users/Jyothesh karnam/Desktop/Trail/TrailActivity.csv', 'activity'),
+        ('C:/Users/Jyothesh karnam/Desktop/Trail/TrailTemp.csv', 'temperature'),
+    ])
@@ -1,23 +1,38 @@
+import os
 import tkinter as tk
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.pyplot as plt
 import numpy as np
+from backgroundjobs import get_background_jobs
+from herdalerts import ALERT_LEVELS, herd_alerts
+from predictionstore import herd_predictions
+from visualizebutton import get_data_file_path
 
-def create_results(parent_frame):
-    # Data to plot
-    labels = ['Red Alert', 'Orange Alert', 'Green Alert']
-    sizes = [1/3, 1/3, 1/3]  # Equal sizes
-    colors = ['black', 'black', 'black']
-    explode = (0, 0, 0)  # explode a slice if required
+ALERT_COLORS = ['red', 'orange', 'green']
+ALERT_POPUP_MAX_IDS = 12  # Cow IDs listed per alert level in the Alert Metrics popup
 
-    # Custom autopct to display 0% instead of the actual percentage
-    def custom_autopct(pct):
-        return '0%' if pct > 0 else ''
+_refresh_callbacks = []
 
-    # Create the pie chart
-    fig, ax = plt.subplots(figsize=(3, 3))  # Increased the size of the figure
-    fig.patch.set_facecolor('black')  # Set the background color to black
+def draw_alert_pie(ax, counts=None):
+    # Equal black slices at 0% until the herd has been classified
+    ax.clear()
     ax.set_facecolor('black')  # Set the axes background color to black
+    labels = list(ALERT_LEVELS)
+    if counts is None or sum(counts) == 0:
+        sizes = [1/3, 1/3, 1/3]  # Equal sizes
+        colors = ['black', 'black', 'black']
+
+        # Custom autopct to display 0% instead of the actual percentage
+        def custom_autopct(pct):
+            return '0%' if pct > 0 else ''
+    else:
+        sizes = counts
+        colors = ALERT_COLORS
+        labels = [label if count else '' for label, count in zip(labels, counts)]
+
+        def custom_autopct(pct):
+            return f'{pct:.0f}%' if pct > 0 else ''
+    explode = (0, 0, 0)  # explode a slice if required
 
     # Pie chart, where the slices will be ordered and plotted counter-clockwise:
     wedges, texts, autotexts = ax.pie(sizes, explode=explode, labels=labels, colors=colors, autopct=custom_autopct,
@@ -35,13 +50,6 @@ def create_results(parent_frame):
         y = [center[1], center[1] + r * np.sin(np.radians(theta2))]
         ax.plot(x, y, color='white', linewidth=1.5)
 
-    # Draw the dividing lines
-    for i in range(3):
-        angle = 90 + i * 120
-        x = [0, r * np.cos(np.radians(angle))]
-        y = [0, r * np.sin(np.radians(angle))]
-        ax.plot(x, y, color='white', linewidth=1.5)
-
     # Draw the outer circle of the pie chart
     outer_circle = plt.Circle((0, 0), r, color='white', fill=False, linewidth=2)
     ax.add_artist(outer_circle)
@@ -49,6 +57,47 @@ def create_results(parent_frame):
     # Equal aspect ratio ensures that pie is drawn as a circle
     ax.axis('equal')
 
+def forecast_message(forecast):
+    # Cows furthest below their next-day forecast on the latest day
+    if not forecast or not forecast['date']:
+        return ""
+    lines = [f"Furthest below forecast on {forecast['date'][:10]}:"]
+    lines += [f"    Cow {cow_id}: {residual:+.1f}" for cow_id, residual in forecast['shortfalls']] or ["    none"]
+    return "\n".join(lines)
+
+def alert_message(summary, forecast=None):
+    # Text of the Alert Metrics popup
+    if not summary:
+        return "No activity data has been analysed yet."
+    total = sum(summary['counts'])  # Same base as the pie, cows without data are listed apart
+    lines = []
+    for level, count in zip(summary['levels'], summary['counts']):
+        percent = 100 * count / total if total else 0
+        lines.append(f"{level}: {count} cows ({percent:.0f}%)")
+        if level != 'Green Alert' and count:
+            cow_ids = summary['cows'][level]
+            lines.append("    " + ", ".join(cow_ids[:ALERT_POPUP_MAX_IDS]) + (", ..." if len(cow_ids) > ALERT_POPUP_MAX_IDS else ""))
+    if summary['no_data']:
+        lines.append(f"No data this week: {summary['no_data']} cows")
+    if summary['last_date']:
+        lines.append(f"Data up to {summary['last_date'][:10]}")
+    if forecast_message(forecast):
+        lines.append(forecast_message(forecast))
+    return "\n".join(lines)
+
+def refresh_results():
+    """
+    Recomputes the herd alerts shown in the results panel, e.g. after new data was uploaded.
+    """
+    for refresh in _refresh_callbacks:
+        refresh()
+
+def create_results(parent_frame):
+    # Create the pie chart
+    fig, ax = plt.subplots(figsize=(3, 3))  # Increased the size of the figure
+    fig.patch.set_facecolor('black')  # Set the background color to black
+    draw_alert_pie(ax)
+
     # Create a frame for the chart and button
     result_frame = tk.Frame(parent_frame, bg='black')
     result_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
@@ -60,13 +109,44 @@ def create_results(parent_frame):
     canvas.draw()
     canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
+    # Classify the herd in the background, the pie keeps its placeholder until the result is in
+    jobs = get_background_jobs(parent_frame)
+    alert_summary = {}
+    forecast_summary = {}
+
+    def show_alerts(result):
+        summary, _ = result
+        alert_summary.clear()
+        alert_summary.update(summary)
+        draw_alert_pie(ax, summary['counts'])
+        canvas.draw_idle()
+
+    def show_forecast(predictions):
+        forecast_summary.clear()
+        if predictions is not None:
+            forecast_summary.update(predictions.summary())
+
+    def refresh_alerts():
+        file_path = get_data_file_path('activity')
+        if not os.path.exists(file_path):
+            return
+        jobs.submit("alerts", herd_alerts, file_path, on_done=show_alerts,
+                    on_error=lambda error: print(f"Could not compute the herd alerts: {error}"))
+        # Next-day predictions are read from the prediction store, inferred only once per new dataset
+        jobs.submit("forecast", herd_predictions, file_path, on_done=show_forecast,
+                    on_error=lambda error: print(f"Could not load the activity forecasts: {error}"))
+
+    _refresh_callbacks.append(refresh_alerts)
+    refresh_alerts()
+
     # Function to show a popup message
     def show_alert_message():
         alert_button.config(highlightbackground='black')
         alert_window = tk.Toplevel(parent_frame)
         alert_window.title("Alert")
         alert_window.configure(bg='black')
-        alert_window.geometry("200x100")
+        if not alert_summary:
+            alert_window.geometry("200x100")
 
         # Center the popup window in the main window
         parent_frame.update_idletasks()
@@ -74,8 +154,8 @@ def create_results(parent_frame):
         y = parent_frame.winfo_y() + (parent_frame.winfo_height() // 2) - (alert_window.winfo_reqheight() // 2)
         alert_window.geometry(f'+{x}+{y}')
 
-        message_label = tk.Label(alert_window, text="Default Message", bg='black', fg='white', font=("Helvetica", 12))
-        message_label.pack(expand=True)
+        message_label = tk.Label(alert_window, text=alert_message(alert_summary, forecast_summary), bg='black', fg='white', font=("Helvetica", 12), justify=tk.LEFT)
+        message_label.pack(expand=True, padx=20, pady=20)
 
     # Create a frame for the buttons
     button_frame = tk.Frame(result_frame, bg='black')
@@ -0,0 +1,110 @@
+# runningstats.py
+import numpy as np
+
+class RunningStats:
+    """
+    Per-column running count, mean, variance (Welford/Chan) and min/max, updated one block of rows at a time.
+
+    NaNs are skipped, so each column keeps its own count.
+    """
+
+    def __init__(self, num_columns):
+        self.count = np.zeros(num_columns, dtype=np.int64)
+        self.mean = np.zeros(num_columns)
+        self.m2 = np.zeros(num_columns)
+        self.min = np.full(num_columns, np.inf)
+        self.max = np.full(num_columns, -np.inf)
+
+    def update(self, values):
+        """
+        Merges a block of rows into the statistics.
+
+        Parameters:
+        - values: numpy array of shape (num_rows, num_columns).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return self
+        valid = ~np.isnan(values)
+        block_count = valid.sum(axis=0)
+        has_values = block_count > 0
+        safe_count = np.maximum(block_count, 1)
+        block_mean = np.where(valid, values, 0.0).sum(axis=0) / safe_count
+        block_m2 = np.where(valid, (values - block_mean) ** 2, 0.0).sum(axis=0)
+
+        total = self.count + block_count
+        delta = block_mean - self.mean
+        safe_total = np.maximum(total, 1)
+        self.mean = np.where(has_values, self.mean + delta * block_count / safe_total, self.mean)
+        self.m2 = np.where(has_values, self.m2 + block_m2 + delta ** 2 * self.count * block_count / safe_total, self.m2)
+        self.count = total
+
+        with np.errstate(invalid='ignore'):
+            self.min = np.fmin(self.min, np.where(valid, values, np.inf).min(axis=0))
+            self.max = np.fmax(self.max, np.where(valid, values, -np.inf).max(axis=0))
+        return self
+
+    @property
+    def std(self):
+        # Sample standard deviation (ddof=1), like pandas
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, np.sqrt(self.m2 / np.maximum(self.count - 1, 1)), np.nan)
+
+    def to_dict(self):
+        return {'count': self.count.tolist(), 'mean': self.mean.tolist(), 'm2': self.m2.tolist(),
+                'min': self.min.tolist(), 'max': self.max.tolist()}
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls(len(state['count']))
+        stats.count = np.asarray(state['count'], dtype=np.int64)
+        stats.mean = np.asarray(state['mean'], dtype=np.float64)
+        stats.m2 = np.asarray(state['m2'], dtype=np.float64)
+        stats.min = np.asarray(state['min'], dtype=np.float64)
+        stats.max = np.asarray(state['max'], dtype=np.float64)
+        return stats
+
+class ReservoirSample:
+    """
+    Fixed-size uniform sample of rows (reservoir sampling) for approximate per-column medians and quantiles.
+
+    Memory is sample_size x num_columns no matter how many rows are streamed through it.
+    """
+
+    def __init__(self, num_columns, sample_size=10000, seed=0):
+        self.sample = np.empty((sample_size, num_columns))
+        self.sample_size = sample_size
+        self.rows_seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        num_rows = len(values)
+        if num_rows == 0:
+            return self
+
+        # Fill the reservoir first
+        filled = min(self.rows_seen, self.sample_size)
+        take = min(self.sample_size - filled, num_rows)
+        self.sample[filled:filled + take] = values[:take]
+
+        # Then row t replaces a random slot with probability sample_size / (t + 1)
+        rest = values[take:]
+        if len(rest):
+            positions = self.rows_seen + take + np.arange(len(rest))
+            slots = (self._rng.random(len(rest)) * (positions + 1)).astype(np.int64)
+            keep = slots < self.sample_size
+            self.sample[slots[keep]] = rest[keep]
+
+        self.rows_seen += num_rows
+        return self
+
+    def quantile(self, q):
+        filled = min(self.rows_seen, self.sample_size)
+        if filled == 0:
+            return np.full(self.sample.shape[1], np.nan)
+        with np.errstate(invalid='ignore'):
+            return np.nanquantile(self.sample[:filled], q, axis=0)
+
+    def median(self):
+        return self.quantile(0.5)
@@ -0,0 +1,151 @@
+# runpipeline.py
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datacache import cache_entry
+from forecasting import FORECAST_MODELS, FORECASTER_PATH
+from herdalerts import herd_alerts
+from preprocessing import SENSOR_TYPES, process_sensor_data, process_sensor_data_chunked
+from stagemetrics import metrics_from_path
+from timeseriesformatting import format_activity_data
+from traincode import split_windowed_data, train_forecaster
+
+PIPELINE_STAGES = ('ingest', 'clean', 'window', 'split', 'train', 'alerts')
+DEFAULT_OUTPUT_DIR = 'pipeline_output'
+
+def ingest_stage(file_path):
+    # Parses the file into the parsed-data cache, later stages read it from there
+    return {'file': file_path, 'cache_entry': os.path.basename(cache_entry(file_path))}
+
+def clean_stage(file_path, sensor_type, output_dir, incremental=False, chunksize=None, metrics_path=None):
+    metrics = metrics_from_path(metrics_path, file=file_path, sensor_type=sensor_type) if metrics_path else None
+    if chunksize:
+        output_path = process_sensor_data_chunked(file_path, sensor_type, output_dir, chunksize=chunksize, metrics=metrics)
+    else:
+        output_path = process_sensor_data(file_path, sensor_type, output_dir, incremental=incremental, metrics=metrics)
+    return {'output_path': output_path, 'stage_seconds': metrics.summary() if metrics else None}
+
+def window_stage(preprocessed_path, output_dir, sequence_length=None):
+    return format_activity_data(preprocessed_path, output_dir, sequence_length)
+
+def split_stage(output_dir, test_size):
+    return split_windowed_data(output_dir, test_size)
+
+def train_stage(output_dir, test_size, model='ridge'):
+    # Saved where the dashboard's prediction store loads it from
+    _, result = train_forecaster(output_dir, model, test_size, save_path=FORECASTER_PATH)
+    return dict(result, model_path=FORECASTER_PATH)
+
+def alerts_stage(file_path):
+    summary, _ = herd_alerts(file_path)
+    return {key: summary[key] for key in ('version', 'levels', 'counts', 'no_data', 'last_date')}
+
+def build_stages(activity_path, temperature_path=None, output_dir=DEFAULT_OUTPUT_DIR, stages=PIPELINE_STAGES,
+                 sequence_length=None, test_size=0.2, incremental=False, chunksize=None, metrics_path=None, model='ridge'):
+    """
+    Lays out the pipeline as named steps with their dependencies.
+
+    The activity and temperature files are ingested and cleaned independently, the alerts only need the
+    ingested activity file, and windowing, the split and training follow the cleaned activity data.
+    Dependencies on stages that were not selected are dropped, so e.g. 'window,split' reruns on earlier outputs.
+
+    Returns:
+    - steps: dict of step name -> (function, args, names of the steps it waits for).
+    """
+    unknown = set(stages) - set(PIPELINE_STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages {sorted(unknown)}, expected some of {PIPELINE_STAGES}.")
+    sensor_files = {'activity': activity_path}
+    if temperature_path:
+        sensor_files['temperature'] = temperature_path
+    preprocessed_path = os.path.join(output_dir, SENSOR_TYPES['activity']['output_filename'])
+
+    steps = {}
+    for sensor_type, file_path in sensor_files.items():
+        steps[f'ingest:{sensor_type}'] = (ingest_stage, (file_path,), [])
+        steps[f'clean:{sensor_type}'] = (clean_stage, (file_path, sensor_type, output_dir, incremental, chunksize, metrics_path), [f'ingest:{sensor_type}'])
+    steps['window'] = (window_stage, (preprocessed_path, output_dir, sequence_length), ['clean:activity'])
+    steps['split'] = (split_stage, (output_dir, test_size), ['window'])
+    steps['train'] = (train_stage, (output_dir, test_size, model), ['window'])
+    steps['alerts'] = (alerts_stage, (activity_path,), ['ingest:activity'])
+
+    selected = {name: step for name, step in steps.items() if name.split(':')[0] in stages}
+    return {name: (func, args, [dep for dep in deps if dep in selected]) for name, (func, args, deps) in selected.items()}
+
+def _quiet_worker():
+    # Stage progress goes to stderr, stdout only carries the timing report
+    sys.stdout = sys.stderr
+
+def _timed(func, args):
+    started = time.time()
+    start = time.perf_counter()
+    result = func(*args)
+    return result, started, time.perf_counter() - start
+
+def run_pipeline(steps, max_workers=None):
+    """
+    Runs the steps in worker processes, each as soon as the steps it waits for have finished.
+
+    Returns:
+    - report: dict with status, start time, seconds and result of every step, and the total wall time.
+    """
+    report = {}
+    pending = dict(steps)
+    running = {}
+    pipeline_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_quiet_worker) as executor:
+        while pending or running:
+            for name, (func, args, deps) in list(pending.items()):
+                if any(report.get(dep, {}).get('status') in ('failed', 'skipped') for dep in deps):
+                    report[name] = {'status': 'skipped', 'waiting_for': deps}
+                    del pending[name]
+                elif all(dep in report for dep in deps):
+                    running[executor.submit(_timed, func, args)] = name
+                    del pending[name]
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result, started, seconds = future.result()
+                    report[name] = {'status': 'ok', 'started': started, 'seconds': round(seconds, 4), 'result': result}
+                except Exception as error:
+                    report[name] = {'status': 'failed', 'error': f'{type(error).__name__}: {error}'}
+    return {'stages': report, 'total_seconds': round(time.perf_counter() - pipeline_start, 4), 'workers': max_workers or os.cpu_count()}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the dairy herd pipeline (ingest, clean, window, split, train, alerts) without the GUI "
+                                                 "and prints a JSON timing report on stdout.")
+    parser.add_argument('--activity', required=True, help="activity levels file (CSV or Excel)")
+    parser.add_argument('--temperature', help="temperature file (CSV or Excel), cleaned alongside the activity data")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help=f"directory for every output but the model (default: {DEFAULT_OUTPUT_DIR})")
+    parser.add_argument('--stages', default=','.join(PIPELINE_STAGES), help=f"comma-separated subset of {','.join(PIPELINE_STAGES)}")
+    parser.add_argument('--sequence-length', type=int, help="fixed window length (default: chosen from the data size)")
+    parser.add_argument('--test-size', type=float, default=0.2, help="share of the windows kept for testing (default: 0.2)")
+    parser.add_argument('--model', default='ridge', choices=FORECAST_MODELS, help=f"forecaster fitted by the train stage and saved to {FORECASTER_PATH} for the dashboard (default: ridge)")
+    parser.add_argument('--incremental', action='store_true', help="only clean rows appended since the last run")
+    parser.add_argument('--chunksize', type=int, help="clean out of core in chunks of this many rows")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--timings', help="also write the JSON report to this file")
+    parser.add_argument('--metrics', help="append the cleaning stage metrics to this file (.jsonl for JSON lines, else a log)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.output_dir, exist_ok=True)
+    steps = build_stages(args.activity, args.temperature, args.output_dir, [stage.strip() for stage in args.stages.split(',') if stage.strip()],
+                         args.sequence_length, args.test_size, args.incremental, args.chunksize, args.metrics, args.model)
+    report = run_pipeline(steps, args.workers)
+
+    print(json.dumps(report, default=str))
+    if args.timings:
+        with open(args.timings, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+    return 0 if all(stage['status'] == 'ok' for stage in report['stages'].values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
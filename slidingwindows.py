@@ -0,0 +1,140 @@
+# slidingwindows.py
+import time
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+def to_float_matrix(data, dtype=np.float64):
+    """
+    Converts the feature columns into one contiguous float matrix that all windows are taken from.
+
+    Parameters:
+    - data: pandas DataFrame or numpy array of shape (num_rows, num_features), without the date column.
+    - dtype: numpy float dtype of the matrix (default is float64).
+
+    Returns:
+    - matrix: C-contiguous numpy array of shape (num_rows, num_features).
+    """
+    values = data.to_numpy(dtype=dtype) if hasattr(data, 'to_numpy') else np.asarray(data, dtype=dtype)
+    return np.ascontiguousarray(values)
+
+def sliding_windows(matrix, sequence_length, copy=False):
+    """
+    Creates overlapping sequences and their next-row targets as views over one matrix.
+
+    Window i covers rows i .. i + sequence_length - 1 and its target is row i + sequence_length,
+    the same layout the loop in create_activity_sequences produced.
+
+    Parameters:
+    - matrix: numpy array of shape (num_rows, num_features).
+    - sequence_length: int, the length of each sequence.
+    - copy: bool, return writable copies instead of read-only views (default is False).
+
+    Returns:
+    - X: numpy array of shape (num_rows - sequence_length, sequence_length, num_features).
+    - y: numpy array of shape (num_rows - sequence_length, num_features).
+    """
+    matrix = np.asarray(matrix)
+    if matrix.ndim != 2:
+        raise ValueError(f"Expected a 2D matrix, got shape {matrix.shape}.")
+    if sequence_length < 1:
+        raise ValueError("sequence_length must be at least 1.")
+
+    num_rows, num_features = matrix.shape
+    num_sequences = max(num_rows - sequence_length, 0)
+    row_stride, col_stride = matrix.strides
+
+    X = as_strided(matrix, shape=(num_sequences, sequence_length, num_features),
+                   strides=(row_stride, row_stride, col_stride), writeable=False)
+    y = matrix[sequence_length:sequence_length + num_sequences]
+
+    if copy:
+        return np.array(X), np.array(y)
+
+    y = y.view()
+    y.flags.writeable = False
+    return X, y
+
+def column_windows(matrix, sequence_length, first_column=0, num_columns=None, column_step=1):
+    """
+    Windows of single columns as read-only views: entry [c, w] covers rows w .. w + sequence_length - 1
+    of column first_column + c * column_step.
+
+    Parameters:
+    - matrix: numpy array (or memmap) of shape (num_rows, num_features).
+    - sequence_length: int, the length of each sequence.
+    - first_column: int, the first column.
+    - num_columns: int, number of columns (default is every column from first_column on).
+    - column_step: int, columns between two entries, 0 repeats first_column num_columns times, e.g. the
+      group mean next to every cow.
+
+    Returns:
+    - X: numpy array of shape (num_columns, num_rows - sequence_length, sequence_length).
+    """
+    matrix = np.asarray(matrix)
+    if matrix.ndim != 2:
+        raise ValueError(f"Expected a 2D matrix, got shape {matrix.shape}.")
+    first_column = first_column % matrix.shape[1]
+    if num_columns is None:
+        num_columns = matrix.shape[1] - first_column
+    if num_columns < 1 or first_column + (num_columns - 1) * column_step >= matrix.shape[1]:
+        raise IndexError(f"{num_columns} columns from column {first_column} fall outside the matrix.")
+
+    num_sequences = max(len(matrix) - sequence_length, 0)
+    row_stride, col_stride = matrix.strides
+    return as_strided(matrix[:, first_column:], shape=(num_columns, num_sequences, sequence_length),
+                      strides=(col_stride * column_step, row_stride, row_stride), writeable=False)
+
+def loop_windows(matrix, sequence_length):
+    # Reference implementation matching the original list-and-stack loop
+    X, y = [], []
+    for i in range(len(matrix) - sequence_length):
+        X.append(matrix[i:i + sequence_length, :])
+        y.append(matrix[i + sequence_length, :])
+    return np.array(X), np.array(y)
+
+def measure_windowing(num_rows=1500, num_features=300, sequence_length=30, repeats=3):
+    """
+    Measures the time and memory of the strided windows against the list-and-stack loop.
+
+    Parameters:
+    - num_rows: int, number of days in the synthetic matrix.
+    - num_features: int, number of columns (cows plus group mean).
+    - sequence_length: int, the length of each sequence.
+    - repeats: int, number of timing repeats, the best one is kept.
+
+    Returns:
+    - results: dict with timings in seconds, bytes allocated and the speedup.
+    """
+    matrix = np.random.default_rng(0).random((num_rows, num_features))
+
+    def best_time(func):
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            output = func()
+            best = min(best, time.perf_counter() - start)
+        return best, output
+
+    loop_seconds, (X_loop, y_loop) = best_time(lambda: loop_windows(matrix, sequence_length))
+    view_seconds, (X_view, y_view) = best_time(lambda: sliding_windows(matrix, sequence_length))
+
+    if not (np.array_equal(X_loop, X_view) and np.array_equal(y_loop, y_view)):
+        raise AssertionError("Strided windows do not match the loop output.")
+
+    results = {
+        'shape': list(X_view.shape),
+        'loop_seconds': loop_seconds,
+        'view_seconds': view_seconds,
+        'speedup': loop_seconds / view_seconds if view_seconds > 0 else float('inf'),
+        'loop_bytes': X_loop.nbytes + y_loop.nbytes,
+        # The views own no data, the only allocation is the base matrix itself
+        'view_bytes': matrix.nbytes,
+    }
+    return results
+
+if __name__ == "__main__":
+    results = measure_windowing()
+    print(f"Sequences: {tuple(results['shape'])}")
+    print(f"Loop: {results['loop_seconds']:.4f}s, {results['loop_bytes'] / 1e6:.1f} MB")
+    print(f"Strided views: {results['view_seconds']:.6f}s, {results['view_bytes'] / 1e6:.1f} MB")
+    print(f"Speedup: {results['speedup']:.0f}x")
@@ -0,0 +1,114 @@
+# stagemetrics.py
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+
+class JsonLinesSink:
+    """
+    Appends every event as one JSON line, e.g. for loading into pandas with read_json(lines=True).
+    Each event is a single write in append mode, so several processes can share the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, event):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(event, default=str) + "\n")
+
+class LogFileSink:
+    """
+    Appends every event as a readable key=value line.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, event):
+        fields = " ".join(f"{key}={value}" for key, value in event.items() if key not in ('time', 'event', 'stage'))
+        with open(self.path, 'a') as f:
+            f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(event['time']))} {event['event']} {event['stage']} {fields}\n")
+
+class StageMetrics:
+    """
+    Times the stages of a pipeline run and sends one structured event per stage to its sinks.
+
+    A sink is any callable taking the event dict: JsonLinesSink, LogFileSink or an in-process callback
+    such as list.append. Every event holds the stage name, its seconds, the rows and columns going in
+    and out, the cells the stage changed and, with trace_memory, the peak memory the stage allocated.
+    Tracing memory slows the stages down, so it is off by default.
+    """
+
+    def __init__(self, sinks=(), trace_memory=False, **context):
+        self.sinks = list(sinks)
+        self.trace_memory = trace_memory
+        self.context = context  # Added to every event, e.g. file and sensor type
+        self.events = []
+
+    def emit(self, event):
+        event = dict(self.context, time=time.time(), **event)
+        self.events.append(event)
+        for sink in self.sinks:
+            sink(event)
+        return event
+
+    @contextlib.contextmanager
+    def stage(self, name, data=None):
+        """
+        Times the body of a with block as one stage.
+
+        Parameters:
+        - name: str, name of the stage.
+        - data: optional DataFrame or array going into the stage, for rows_in and columns_in.
+
+        Yields:
+        - record: dict the stage fills in, e.g. record.update(rows_out=..., cells_changed=...).
+        """
+        record = {'event': 'stage', 'stage': name, 'status': 'ok'}
+        if data is not None:
+            record['rows_in'], record['columns_in'] = _shape(data)
+        started_tracing = False
+        if self.trace_memory:
+            # A tracer that is already running (e.g. in benchmarksuite.py) only has its peak reset
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            else:
+                tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as error:
+            record.update(status='failed', error=f'{type(error).__name__}: {error}')
+            raise
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            if self.trace_memory:
+                record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+            self.emit(record)
+
+    def summary(self):
+        """
+        Returns:
+        - summary: dict of stage name -> total seconds, in the order the stages first ran.
+        """
+        totals = {}
+        for event in self.events:
+            if event['event'] == 'stage':
+                totals[event['stage']] = totals.get(event['stage'], 0.0) + event['seconds']
+        return totals
+
+def _shape(data):
+    shape = getattr(data, 'shape', (len(data),))
+    return int(shape[0]), int(shape[1]) if len(shape) > 1 else 1
+
+def metrics_from_path(path, trace_memory=False, **context):
+    """
+    StageMetrics writing to a file picked by its extension: .jsonl/.json get JSON lines, anything else readable lines.
+    """
+    sink = JsonLinesSink(path) if os.path.splitext(path)[1].lower() in ('.jsonl', '.json') else LogFileSink(path)
+    return StageMetrics([sink], trace_memory, **context)
@@ -0,0 +1,79 @@
+# syntheticherd.py
+import os
+import numpy as np
+import pandas as pd
+
+DATE_COLUMN = 'Unnamed: 0'  # Header of the unnamed date column of the exported herd files
+FIRST_COW_ID = 6500
+
+# Readings per sensor type: herd level, spread of the cow baselines, seasonal swing and daily noise
+SENSOR_PROFILES = {
+    'activity': {'level': 50.0, 'cow_spread': 8.0, 'season': 6.0, 'noise': 4.0, 'outlier_scale': 4.0, 'decimals': 2},
+    'temperature': {'level': 38.6, 'cow_spread': 0.2, 'season': 0.15, 'noise': 0.25, 'outlier_scale': 3.0, 'decimals': 2},
+}
+
+def make_herd_data(num_cows=300, num_days=730, sensor_type='activity', missing_rate=0.02, outlier_rate=0.001,
+                   start_date='2021-01-01', date_format='%Y-%m-%d', seed=0):
+    """
+    Generates a herd file shaped like the real exports: the unnamed date column, one column per
+    numeric cow ID and the 'Group mean' column last.
+
+    Parameters:
+    - num_cows: int, number of cow columns.
+    - num_days: int, number of daily rows.
+    - sensor_type: str, 'activity' or 'temperature' (see SENSOR_PROFILES).
+    - missing_rate: float, share of cow readings left empty.
+    - outlier_rate: float, share of cow readings replaced by a spike or a drop.
+    - start_date: str, date of the first row.
+    - date_format: str, format the dates are written in (None keeps datetime values).
+    - seed: int, seed of the random generator, the same seed gives the same herd.
+
+    Returns:
+    - data: pandas DataFrame with num_days rows and num_cows + 2 columns.
+    """
+    profile = SENSOR_PROFILES[sensor_type]
+    rng = np.random.default_rng(seed)
+    days = np.arange(num_days)[:, None]
+
+    baselines = profile['level'] + rng.normal(0, profile['cow_spread'], num_cows)
+    phases = rng.uniform(0, 2 * np.pi, num_cows)
+    values = baselines + profile['season'] * np.sin(2 * np.pi * days / 365 + phases) + rng.normal(0, profile['noise'], (num_days, num_cows))
+
+    # Spikes and drops several noise levels away, then sensor dropouts
+    outliers = rng.random((num_days, num_cows)) < outlier_rate
+    values[outliers] += rng.choice([-1.0, 1.0], outliers.sum()) * profile['outlier_scale'] * profile['cow_spread']
+    values[rng.random((num_days, num_cows)) < missing_rate] = np.nan
+    values = np.round(values, profile['decimals'])
+
+    dates = pd.date_range(start_date, periods=num_days, freq='D')
+    data = pd.DataFrame(values, columns=[str(FIRST_COW_ID + cow) for cow in range(num_cows)])
+    # Mean of the cows with a reading that day, like the collar system reports it
+    counts = (~np.isnan(values)).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        data['Group mean'] = np.round(np.nansum(values, axis=1) / counts, profile['decimals'] + 2)
+    data.insert(0, DATE_COLUMN, dates.strftime(date_format) if date_format else dates)
+    return data
+
+def write_herd_files(output_dir, num_cows=300, num_days=730, missing_rate=0.02, outlier_rate=0.001, file_format='csv', seed=0):
+    """
+    Writes a synthetic activity file and a matching temperature file for the same cows and days.
+
+    Returns:
+    - file_paths: dict of sensor type -> path of the written file.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    file_paths = {}
+    for offset, sensor_type in enumerate(SENSOR_PROFILES):
+        data = make_herd_data(num_cows, num_days, sensor_type, missing_rate, outlier_rate, seed=seed + offset)
+        file_path = os.path.join(output_dir, f'synthetic_{sensor_type}_{num_cows}x{num_days}.{file_format}')
+        if file_format == 'xlsx':
+            data.to_excel(file_path, index=False)
+        else:
+            data.to_csv(file_path, index=False)
+        file_paths[sensor_type] = file_path
+    return file_paths
+
+if __name__ == "__main__":
+    file_paths = write_herd_files('synthetic_data')
+    for sensor_type, file_path in file_paths.items():
+        print(f"Wrote synthetic {sensor_type} data to {file_path}")
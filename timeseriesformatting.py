@@ -1,27 +1,90 @@
+import json
+import os
 import numpy as np
 import pandas as pd
+from batchstream import CowWindowDataset
+from slidingwindows import to_float_matrix, sliding_windows
 
-# Load the data
-activity_data = pd.read_csv('C:/Users/Jyothesh karnam/Desktop/preprocessed_data/preprocessed_activity_data.csv')
+MATRIX_FILE = 'activity_matrix.npy'
+DAYS_FILE = 'activity_days.npy'
+WINDOWS_FILE = 'activity_windows.json'
 
-# Ensure column names are stripped of leading/trailing spaces
-activity_data.columns = activity_data.columns.str.strip()
+class SequenceDates:
+    """
+    The dates of every window, kept as one day array for the whole series.
+
+    Window i starts at row i and covers days[i:i + sequence_length], its target is days[i + sequence_length].
+    Indexing returns a view of the day array, so sequence_dates[i][0] is still the first day of window i,
+    and the dates of any window or split are found without building a list per window.
+    """
+
+    def __init__(self, days, sequence_length):
+        self.days = days
+        self.sequence_length = sequence_length
+
+    def __len__(self):
+        return max(len(self.days) - self.sequence_length, 0)
+
+    def _start(self, window):
+        start = window + len(self) if window < 0 else window
+        if not 0 <= start < len(self):
+            raise IndexError(f"Window {window} out of range for {len(self)} windows.")
+        return start
+
+    def __getitem__(self, window):
+        start = self._start(window)
+        return self.days[start:start + self.sequence_length]
+
+    def window_range(self, window):
+        """
+        Returns:
+        - first_day, last_day: the first and last input day of the window.
+        """
+        start = self._start(window)
+        return self.days[start], self.days[start + self.sequence_length - 1]
+
+    def target_day(self, window):
+        return self.days[self._start(window) + self.sequence_length]
+
+    def split_range(self, start, stop):
+        """
+        Returns:
+        - first_day, last_day: the first days of windows start and stop - 1, or None for an empty split.
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        if start >= stop:
+            return None
+        return self.days[start], self.days[stop - 1]
+
+def to_days(dates):
+    """
+    Converts the row dates into a datetime64 day array (row numbers and other numbers are kept as they are).
+    """
+    values = np.asarray(dates)
+    if values.dtype.kind in 'iuf':
+        return values
+    return pd.to_datetime(values).values.astype('datetime64[D]')
 
-# Print the column names to check for 'date'
-print("Column names in the dataset:", activity_data.columns.tolist())
+def load_preprocessed_activity(file_path):
+    """
+    Loads a preprocessed activity file and separates the date column.
 
-# Store header row (metadata)
-metadata = activity_data.columns.tolist()  # ['date', '6774', '6775', ..., '6829', 'Group mean']
+    Returns:
+    - activity_data: pandas DataFrame with every column except the date.
+    - dates: list of the dates.
+    - metadata: list of the column names, e.g. ['date', '6774', '6775', ..., 'Group mean'].
+    """
+    activity_data = pd.read_csv(file_path)
 
-# Store dates column
-dates = activity_data['date'].tolist()
+    # Ensure column names are stripped of leading/trailing spaces
+    activity_data.columns = activity_data.columns.str.strip()
 
-# Exclude the date column for training data
-activity_data = activity_data.drop(columns=['date'])
+    # Store header row (metadata) and the dates column
+    metadata = activity_data.columns.tolist()
+    dates = activity_data['date'].tolist()
 
-# Print the number of rows and columns
-num_rows, num_columns = activity_data.shape
-print(f"Number of rows: {num_rows}, Number of columns: {num_columns}")
+    # Exclude the date column for training data
+    return activity_data.drop(columns=['date']), dates, metadata
 
 def determine_dynamic_sequence_length(data, min_proportion=0.1, max_proportion=0.5, min_length=5, max_length=30):
     """
@@ -50,60 +113,153 @@ def determine_dynamic_sequence_length(data, min_proportion=0.1, max_proportion=0
     
     return sequence_length
 
-def create_activity_sequences(activity_data, sequence_length):
+def create_activity_sequences(activity_data, sequence_length, copy=False, dates=None):
     """
     Creates overlapping sequences and corresponding targets from the activity data.
 
+    The sequences and targets are strided read-only views over one contiguous float matrix,
+    so no sample is copied sequence_length times. Pass copy=True when a writable array is needed.
+
     Parameters:
     - activity_data: pandas DataFrame containing the preprocessed activity data.
     - sequence_length: int, the length of each sequence.
+    - copy: bool, return writable copies instead of read-only views (default is False).
+    - dates: list or array of the row dates (default is the row numbers).
 
     Returns:
     - X_activity: numpy array of shape (num_sequences, sequence_length, num_features) containing the sequences.
     - y_activity: numpy array of shape (num_sequences, num_features) containing the targets.
-    - sequence_dates: list of lists containing dates for each sequence
+    - sequence_dates: SequenceDates, the dates of each sequence over one day array.
     """
-    X_activity = []
-    y_activity = []
-    sequence_dates = []
-    
-    for i in range(len(activity_data) - sequence_length):
-        seq = activity_data.iloc[i:i + sequence_length, :].values  # Include all columns except the date
-        target = activity_data.iloc[i + sequence_length, :].values  # Include all columns except the date
-        dates_seq = dates[i:i + sequence_length]  # Extract dates corresponding to the sequence
-        X_activity.append(seq)
-        y_activity.append(target)
-        sequence_dates.append(dates_seq)
-        
-    return np.array(X_activity), np.array(y_activity), sequence_dates
-
-# Determine sequence length dynamically
-sequence_length = determine_dynamic_sequence_length(activity_data)  
-print(f"Determined sequence length for activity data: {sequence_length}")
-
-# Create input sequences and target variables
-X_activity, y_activity, sequence_dates = create_activity_sequences(activity_data, sequence_length)
-
-# Display the final shapes and the steps taken
-print(f"Activity data sequences: {X_activity.shape}, Targets: {y_activity.shape}")
-
-# Print the columns included in the sequences to verify only the date column is excluded
-print("\nColumns included in sequences:")
-print(activity_data.columns.tolist())  # Exclude only 'date' column
-
-# Print the steps and decisions taken
-print("\nSteps and decisions taken:")
-print("1. Loaded the preprocessed activity data.")
-print("2. Stripped leading/trailing spaces from column names.")
-print("3. Stored metadata (column names) and dates separately.")
-print("4. Excluded the date column for training data.")
-print(f"5. Determined sequence length dynamically based on data size: {num_rows} rows.")
-print(f"6. Calculated sequence length using square root heuristic: {int(np.sqrt(num_rows))}.")
-print(f"7. Applied dynamic bounds: min_length={max(5, int(num_rows * 0.1))}, max_length={min(30, int(num_rows * 0.5))}.")
-print(f"8. Final sequence length after applying bounds: {sequence_length}.")
-print("9. Created overlapping sequences and corresponding targets.")
-print(f"   - Number of sequences created: {X_activity.shape[0]}")
-print(f"   - Sequence length: {sequence_length}")
-print(f"   - Number of features in each sequence: {X_activity.shape[2]}")
-print(f"   - Example of the first sequence (showing first row of the first sequence): {X_activity[0][0]}")
-print(f"   - Example of the first target (showing the target values for the first sequence): {y_activity[0]}")
+    activity_matrix = to_float_matrix(activity_data)  # Include all columns except the date
+    X_activity, y_activity = sliding_windows(activity_matrix, sequence_length, copy=copy)
+    days = np.arange(len(activity_matrix)) if dates is None else to_days(dates)
+    sequence_dates = SequenceDates(days, sequence_length)
+
+    return X_activity, y_activity, sequence_dates
+
+def create_cow_sequences(activity_data, sequence_length, temperature_data=None, dates=None, group_column='Group mean'):
+    """
+    Per-cow windowing: one (sequence_length, channels) sample per cow and window instead of one window
+    over the whole herd, so the model input does not grow with the herd and works for new cows.
+
+    The channels are the cow's activity, the group mean and, with temperature_data, the cow's temperature.
+    They are strided views over the cows x days matrix, mini-batches mixing cows are gathered by index.
+
+    Parameters:
+    - activity_data: pandas DataFrame containing the preprocessed activity data, without the date.
+    - sequence_length: int, the length of each sequence.
+    - temperature_data: optional pandas DataFrame of temperatures with the same rows, matched to the cows by column name.
+    - dates: list or array of the row dates (default is the row numbers).
+    - group_column: str, name of the group mean column, or None for no group mean channel.
+
+    Returns:
+    - dataset: CowWindowDataset with num_cows * num_windows samples.
+    - cow_ids: list of the cow column names, in the order of the samples.
+    - sequence_dates: SequenceDates, the dates of each window, shared by every cow.
+    """
+    columns = [str(column).strip() for column in activity_data.columns]
+    group_columns = [column for column in columns if group_column is not None and column.lower() == group_column.lower()]
+    cow_ids = [column for column in columns if column not in group_columns]
+    activity_data = activity_data.set_axis(columns, axis=1)
+
+    # Cow columns first, then the group mean, as CowWindowDataset expects
+    activity_matrix = to_float_matrix(activity_data[cow_ids + group_columns[:1]])
+    temperature_matrix = None
+    if temperature_data is not None:
+        if len(temperature_data) != len(activity_data):
+            raise ValueError(f"Expected {len(activity_data)} temperature rows, got {len(temperature_data)}.")
+        temperature_data = temperature_data.set_axis([str(column).strip() for column in temperature_data.columns], axis=1)
+        # Cows without a temperature column get an all-NaN channel, their samples are skipped in training
+        temperature_matrix = to_float_matrix(temperature_data.reindex(columns=cow_ids))
+
+    dataset = CowWindowDataset(activity_matrix, sequence_length, len(cow_ids), -1 if group_columns else None, temperature_matrix)
+    days = np.arange(len(activity_matrix)) if dates is None else to_days(dates)
+    return dataset, cow_ids, SequenceDates(days, sequence_length)
+
+def save_windowed_data(activity_data, sequence_dates, output_dir='.'):
+    """
+    Saves the base matrix and the day array for traincode.py, which streams mini-batches from them.
+    Neither file needs pickle, both can be memory-mapped. The sequence length goes to activity_windows.json.
+
+    Returns:
+    - matrix_path, dates_path: str paths of the saved matrix and day array.
+    """
+    matrix_path = os.path.join(output_dir, MATRIX_FILE)
+    dates_path = os.path.join(output_dir, DAYS_FILE)
+    np.save(matrix_path, to_float_matrix(activity_data))
+    np.save(dates_path, np.asarray(sequence_dates.days), allow_pickle=False)
+    with open(os.path.join(output_dir, WINDOWS_FILE), 'w') as f:
+        json.dump({'sequence_length': sequence_dates.sequence_length, 'num_sequences': len(sequence_dates)}, f)
+    return matrix_path, dates_path
+
+def format_activity_data(file_path, output_dir='.', sequence_length=None):
+    """
+    The windowing stage: loads the preprocessed activity file, picks the sequence length and saves
+    the base matrix and the day array.
+
+    Parameters:
+    - file_path: str, path to the preprocessed activity CSV.
+    - output_dir: str, directory for activity_matrix.npy, activity_days.npy and activity_windows.json.
+    - sequence_length: int, fixed sequence length (default is determine_dynamic_sequence_length).
+
+    Returns:
+    - result: dict with the sequence length, the number of sequences and features and the saved paths.
+    """
+    activity_data, dates, _ = load_preprocessed_activity(file_path)
+    if sequence_length is None:
+        sequence_length = determine_dynamic_sequence_length(activity_data)
+    X_activity, _, sequence_dates = create_activity_sequences(activity_data, sequence_length, dates=dates)
+    matrix_path, dates_path = save_windowed_data(activity_data, sequence_dates, output_dir)
+    return {'sequence_length': sequence_length, 'num_sequences': int(X_activity.shape[0]), 'num_features': int(X_activity.shape[2]),
+            'matrix_path': matrix_path, 'dates_path': dates_path}
+
+if __name__ == "__main__":
+    # Load the data
+    activity_data, dates, metadata = load_preprocessed_activity('C:/Users/Jyothesh karnam/Desktop/preprocessed_data/preprocessed_activity_data.csv')
+
+    # Print the column names to check for 'date'
+    print("Column names in the dataset:", metadata)
+
+    # Print the number of rows and columns
+    num_rows, num_columns = activity_data.shape
+    print(f"Number of rows: {num_rows}, Number of columns: {num_columns}")
+
+    # Determine sequence length dynamically
+    sequence_length = determine_dynamic_sequence_length(activity_data)  
+    print(f"Determined sequence length for activity data: {sequence_length}")
+
+    # Create input sequences and target variables
+    X_activity, y_activity, sequence_dates = create_activity_sequences(activity_data, sequence_length, dates=dates)
+
+    # Display the final shapes and the steps taken
+    print(f"Activity data sequences: {X_activity.shape}, Targets: {y_activity.shape}")
+
+    # Print the columns included in the sequences to verify only the date column is excluded
+    print("\nColumns included in sequences:")
+    print(activity_data.columns.tolist())  # Exclude only 'date' column
+
+    # Print the steps and decisions taken
+    print("\nSteps and decisions taken:")
+    print("1. Loaded the preprocessed activity data.")
+    print("2. Stripped leading/trailing spaces from column names.")
+    print("3. Stored metadata (column names) and dates separately.")
+    print("4. Excluded the date column for training data.")
+    print(f"5. Determined sequence length dynamically based on data size: {num_rows} rows.")
+    print(f"6. Calculated sequence length using square root heuristic: {int(np.sqrt(num_rows))}.")
+    print(f"7. Applied dynamic bounds: min_length={max(5, int(num_rows * 0.1))}, max_length={min(30, int(num_rows * 0.5))}.")
+    print(f"8. Final sequence length after applying bounds: {sequence_length}.")
+    print("9. Created overlapping sequences and corresponding targets as strided views over one float matrix.")
+    print(f"   - Number of sequences created: {X_activity.shape[0]}")
+    print(f"   - Sequence length: {sequence_length}")
+    print(f"   - Number of features in each sequence: {X_activity.shape[2]}")
+    print(f"   - Example of the first sequence (showing first row of the first sequence): {X_activity[0][0]}")
+    print(f"   - Example of the first target (showing the target values for the first sequence): {y_activity[0]}")
+
+    # The same windows as per-cow samples, for a model shared by every cow
+    cow_dataset, cow_ids, _ = create_cow_sequences(activity_data, sequence_length)
+    print(f"   - Per-cow samples: {len(cow_dataset)} of shape ({sequence_length}, {cow_dataset.num_channels}) from {len(cow_ids)} cows")
+
+    # Save the base matrix and dates for traincode.py, which streams mini-batches from them
+    save_windowed_data(activity_data, sequence_dates)
+    print("10. Saved the base matrix to activity_matrix.npy and the dates to activity_days.npy, one day per row.")
@@ -1,9 +1,23 @@
+import json
+import os
 import numpy as np
+from batchstream import CowWindowDataset, WindowDataset, iterate_batches
+from timeseriesformatting import DAYS_FILE, MATRIX_FILE, WINDOWS_FILE, SequenceDates
 
-# Load the saved sequences, targets, and dates
-X_activity = np.load('X_activity.npy')
-y_activity = np.load('y_activity.npy')
-sequence_dates = np.load('sequence_dates.npy', allow_pickle=True)
+def load_windowed_data(data_dir='.'):
+    """
+    Loads the base matrix and the day array saved by timeseriesformatting.py, both memory-mapped.
+
+    Returns:
+    - activity_matrix: numpy memmap of shape (num_rows, num_features).
+    - sequence_dates: SequenceDates, the dates of each sequence.
+    - sequence_length: int, the length of each sequence.
+    """
+    activity_matrix = np.load(os.path.join(data_dir, MATRIX_FILE), mmap_mode='r')
+    days = np.load(os.path.join(data_dir, DAYS_FILE), mmap_mode='r', allow_pickle=False)
+    with open(os.path.join(data_dir, WINDOWS_FILE), 'r') as f:
+        sequence_length = json.load(f)['sequence_length']
+    return activity_matrix, SequenceDates(days, sequence_length), sequence_length
 
 # Step 5: Train-Test Split
 
@@ -27,18 +41,140 @@ def train_test_split_temporal(X, y, test_size=0.2):
     y_train, y_test = y[:split_index], y[split_index:]
     return X_train, X_test, y_train, y_test
 
-# Determine split ratio (e.g., 80% training, 20% testing)
-test_size = 0.2
+def train_test_datasets_temporal(matrix, sequence_length, test_size=0.2):
+    """
+    Splits the sequence windows over a base matrix into streaming training and test datasets.
+
+    Parameters:
+    - matrix: numpy array (or memmap) of shape (num_rows, num_features).
+    - sequence_length: int, the length of each sequence.
+    - test_size: float, proportion of the dataset to include in the test split (default is 0.2).
+
+    Returns:
+    - train_dataset: WindowDataset over the training windows.
+    - test_dataset: WindowDataset over the test windows.
+    """
+    window_indices = WindowDataset(matrix, sequence_length).indices
+    train_indices, test_indices, _, _ = train_test_split_temporal(window_indices, window_indices, test_size)
+    return WindowDataset(matrix, sequence_length, train_indices), WindowDataset(matrix, sequence_length, test_indices)
+
+def train_test_cow_datasets_temporal(matrix, sequence_length, test_size=0.2, **options):
+    """
+    Splits the per-cow samples over a base matrix in time: every cow's test samples come after all training windows.
+
+    Parameters:
+    - matrix: numpy array (or memmap) of shape (num_rows, num_features), the cow columns first.
+    - sequence_length: int, the length of each sequence.
+    - test_size: float, proportion of the windows to include in the test split (default is 0.2).
+    - options: passed to CowWindowDataset, e.g. temperature.
+
+    Returns:
+    - train_dataset: CowWindowDataset over the samples of the training windows.
+    - test_dataset: CowWindowDataset over the samples of the test windows.
+    """
+    dataset = CowWindowDataset(matrix, sequence_length, **options)
+    split_window = int(dataset.num_windows * (1 - test_size))
+    return (dataset.subset(dataset.window_samples(0, split_window)),
+            dataset.subset(dataset.window_samples(split_window, dataset.num_windows)))
+
+def _date_range(sequence_dates, start, stop):
+    days = sequence_dates.split_range(start, stop)
+    return [str(day) for day in days] if days is not None else None
+
+def split_windowed_data(data_dir='.', test_size=0.2):
+    """
+    The split stage: splits the saved windows in time and reports the two sets.
+
+    Returns:
+    - result: dict with the number of training and test sequences and their date ranges.
+    """
+    activity_matrix, sequence_dates, sequence_length = load_windowed_data(data_dir)
+    train_dataset, test_dataset = train_test_datasets_temporal(activity_matrix, sequence_length, test_size)
+    return {
+        'sequence_length': sequence_length,
+        'num_features': train_dataset.num_features,
+        'train_sequences': len(train_dataset),
+        'test_sequences': len(test_dataset),
+        'train_dates': _date_range(sequence_dates, 0, len(train_dataset)),
+        'test_dates': _date_range(sequence_dates, len(train_dataset), len(sequence_dates)),
+    }
+
+def train_forecaster(data_dir='.', model='ridge', test_size=0.2, save_path=None, per_cow=False, **options):
+    """
+    The training stage: fits a forecaster on the training windows and scores it on the test windows.
+
+    Parameters:
+    - data_dir: str, directory holding the files saved by timeseriesformatting.py.
+    - model: str, one of forecasting.FORECAST_MODELS.
+    - test_size: float, proportion of the windows kept for testing.
+    - save_path: optional str, save the fitted model there (see forecasting.save_forecaster), e.g. for the prediction store.
+    - per_cow: bool, train on per-cow samples drawn in mixed-cow mini-batches (see CowWindowDataset).
+    - options: passed to the model, e.g. epochs for 'conv'.
+
+    Returns:
+    - forecaster: the fitted model.
+    - result: dict with the training samples/sec, the test errors and the next-day inference cows/sec.
+    """
+    from forecasting import evaluate_forecaster, forecast_next_day, make_forecaster, save_forecaster
+    from preprocessing import SENSOR_TYPES, load_state
+
+    activity_matrix, _, sequence_length = load_windowed_data(data_dir)
+    if per_cow:
+        train_dataset, test_dataset = train_test_cow_datasets_temporal(activity_matrix, sequence_length, test_size)
+    else:
+        train_dataset, test_dataset = train_test_datasets_temporal(activity_matrix, sequence_length, test_size)
+    forecaster = make_forecaster(model, **options).fit(train_dataset)
+    metrics = evaluate_forecaster(forecaster, test_dataset) if len(test_dataset) else {}
+    _, inference = forecast_next_day(forecaster, activity_matrix, sequence_length)
+
+    # The preprocessing statistics let the model be applied to raw readings, scaled the same way
+    state = load_state(os.path.join(data_dir, SENSOR_TYPES['activity']['output_filename']))
+    if state is not None and len(state['columns']) == activity_matrix.shape[1]:
+        forecaster.scaler = {'columns': state['columns'], 'min': state['fitted']['min'], 'max': state['fitted']['max']}
+    if save_path:
+        save_forecaster(forecaster, save_path)
+    return forecaster, {
+        'model': model,
+        'train_samples': forecaster.fit_stats['samples'],
+        'train_samples_per_sec': forecaster.fit_stats['samples_per_sec'],
+        'test_mae': metrics.get('mae'),
+        'persistence_mae': metrics.get('persistence_mae'),
+        'next_day_cows_per_sec': inference['cows_per_sec'],
+    }
+
+if __name__ == "__main__":
+    # Load the saved base matrix (memory-mapped) and dates
+    activity_matrix, sequence_dates, sequence_length = load_windowed_data()
+
+    # Determine split ratio (e.g., 80% training, 20% testing)
+    test_size = 0.2
+
+    # Split the windows into training and test sets without building the full sequence tensor
+    train_dataset, test_dataset = train_test_datasets_temporal(activity_matrix, sequence_length, test_size)
+
+    # Verify the split
+    print(f"Training sequences: {(len(train_dataset), sequence_length, train_dataset.num_features)}, Training targets: {(len(train_dataset), train_dataset.num_features)}")
+    print(f"Test sequences: {(len(test_dataset), sequence_length, test_dataset.num_features)}, Test targets: {(len(test_dataset), test_dataset.num_features)}")
+
+    # Stream shuffled training mini-batches, prepared ahead in a background thread
+    batch_size = 32
+    for X_batch, y_batch in iterate_batches(train_dataset, batch_size, shuffle=True, seed=0, prefetch=2):
+        print(f"First training batch: {X_batch.shape}, targets: {y_batch.shape}")
+        break
 
-# Split the data into training and test sets
-X_train, X_test, y_train, y_test = train_test_split_temporal(X_activity, y_activity, test_size)
+    # Check date ranges for training and test sets
+    for name, date_range in (('Training', _date_range(sequence_dates, 0, len(train_dataset))),
+                             ('Test', _date_range(sequence_dates, len(train_dataset), len(sequence_dates)))):
+        print(f"{name} set date range: {date_range[0]} to {date_range[1]}" if date_range else f"{name} set is empty")
 
-# Verify the split
-print(f"Training sequences: {X_train.shape}, Training targets: {y_train.shape}")
-print(f"Test sequences: {X_test.shape}, Test targets: {y_test.shape}")
+    # Fit the ridge baseline and the convolutional model on the training windows, the dashboard uses the ridge model
+    from forecasting import FORECASTER_PATH
 
-# Check date ranges for training and test sets
-train_dates = [seq[0] for seq in sequence_dates[:len(X_train)]]
-test_dates = [seq[0] for seq in sequence_dates[len(X_train):]]
-print(f"Training set date range: {train_dates[0]} to {train_dates[-1]}")
-print(f"Test set date range: {test_dates[0]} to {test_dates[-1]}")
+    for model in ('ridge', 'conv'):
+        _, result = train_forecaster(model=model, test_size=test_size, save_path=FORECASTER_PATH if model == 'ridge' else None)
+        if result['test_mae'] is None:
+            print(f"{model}: {result['train_samples_per_sec']:,.0f} training samples/sec, no test windows to score, "
+                  f"next-day inference {result['next_day_cows_per_sec']:,.0f} cows/sec")
+            continue
+        print(f"{model}: {result['train_samples_per_sec']:,.0f} training samples/sec, test MAE {result['test_mae']:.4f} "
+              f"(last day repeated: {result['persistence_mae']:.4f}), next-day inference {result['next_day_cows_per_sec']:,.0f} cows/sec")
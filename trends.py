@@ -0,0 +1,148 @@
+# trends.py
+import time
+import numpy as np
+import pandas as pd
+from herdalerts import weekly_sums
+
+def _masked_sums(x, values):
+    # Least squares sums of every column, skipping missing readings
+    valid = ~np.isnan(values)
+    weights = valid.astype(np.float64)
+    y = np.where(valid, values, 0.0)
+    return weights.sum(axis=0), x @ weights, (x * x) @ weights, y.sum(axis=0), x @ y
+
+def _solve(n, sx, sxx, sy, sxy):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        denominator = n * sxx - sx * sx
+        slope = np.where(denominator > 0, (n * sxy - sx * sy) / denominator, np.nan)
+        intercept = np.where(n > 0, (sy - slope * sx) / n, np.nan)
+    return slope, intercept
+
+def fit_trends(values, x=None):
+    """
+    Straight-line trend of every column at once, by closed-form least squares.
+
+    Gives the same fit as a LinearRegression per column, missing readings are left out of their column's fit.
+
+    Parameters:
+    - values: numpy array of shape (num_rows, num_columns), e.g. weekly means x cows.
+    - x: numpy array of shape (num_rows,), the regressor (default is 0, 1, 2, ...).
+
+    Returns:
+    - slope, intercept, residual_variance: numpy arrays of shape (num_columns,).
+    - counts: int array with the number of readings used per column.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    x = np.arange(len(values), dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+    n, sx, sxx, sy, sxy = _masked_sums(x, values)
+    slope, intercept = _solve(n, sx, sxx, sy, sxy)
+
+    residuals = values - (intercept + slope * x[:, None])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        residual_variance = np.where(n > 2, np.nansum(residuals ** 2, axis=0) / np.maximum(n - 2, 1), np.nan)
+    return slope, intercept, residual_variance, n.astype(np.int64)
+
+def rolling_trends(values, window, x=None):
+    """
+    Trend slope of every column over each run of window rows, from prefix sums in O(rows x columns).
+
+    Parameters:
+    - values: numpy array of shape (num_rows, num_columns).
+    - window: int, number of rows per fit.
+    - x: numpy array of shape (num_rows,), the regressor (default is 0, 1, 2, ...).
+
+    Returns:
+    - slopes: numpy array of shape (num_rows - window + 1, num_columns), row i fits rows i to i + window - 1.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if window < 2 or window > len(values):
+        raise ValueError(f"window must be between 2 and the number of rows ({len(values)}).")
+    x = np.arange(len(values), dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+    x = x - x[0]  # Smaller sums, better precision
+    valid = ~np.isnan(values)
+    weights = valid.astype(np.float64)
+    y = np.where(valid, values, 0.0)
+    column_x = x[:, None]
+
+    def windowed(block):
+        prefix = np.concatenate((np.zeros((1, block.shape[1])), np.cumsum(block, axis=0)))
+        return prefix[window:] - prefix[:-window]
+
+    slope, _ = _solve(windowed(weights), windowed(weights * column_x), windowed(weights * column_x ** 2),
+                      windowed(y), windowed(y * column_x))
+    return slope
+
+def weekly_means(data, columns, date_column='Date'):
+    """
+    Monday-to-Sunday weekly means of the given columns, as resample('W-SUN').mean() gives them.
+
+    Returns:
+    - week_numbers: int array, weeks since the first week (weeks without readings are skipped).
+    - means: numpy array of shape (num_weeks, num_columns).
+    """
+    data = data.sort_values(date_column)
+    weeks, sums, counts = weekly_sums(data[date_column].to_numpy(), data[columns].to_numpy(dtype=np.float64))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    return weeks - weeks[0], means
+
+def trend_table(data, columns, date_column='Date', window=None):
+    """
+    Per-cow trend of the weekly mean readings, one row per cow.
+
+    Parameters:
+    - data: DataFrame with the date column and one column per cow.
+    - columns: list of the cow (and group mean) columns to fit.
+    - date_column: str, name of the date column.
+    - window: optional int, also report the slope over the latest window weeks.
+
+    Returns:
+    - table: DataFrame indexed by column with slope (per week), intercept, residual_variance, weeks
+      and, with a window, recent_slope.
+    """
+    week_numbers, means = weekly_means(data, columns, date_column)
+    slope, intercept, residual_variance, counts = fit_trends(means, week_numbers)
+    table = pd.DataFrame({'slope': slope, 'intercept': intercept, 'residual_variance': residual_variance, 'weeks': counts},
+                         index=pd.Index([str(column) for column in columns], name='cow_id'))
+    if window is not None:
+        window = min(window, len(means))
+        table['recent_slope'] = rolling_trends(means[-window:], window, week_numbers[-window:])[-1] if window >= 2 else np.nan
+    return table
+
+def benchmark_trends(num_weeks=150, num_cows=500, repeats=3):
+    """
+    Times the batched fit against one sklearn LinearRegression per cow.
+
+    Returns:
+    - results: dict with both timings in seconds, the speedup and the largest slope difference.
+    """
+    from sklearn.linear_model import LinearRegression
+
+    rng = np.random.default_rng(0)
+    weeks = np.arange(num_weeks, dtype=np.float64)
+    values = 50 + rng.normal(0, 0.05, num_cows) * weeks[:, None] + rng.normal(0, 2, (num_weeks, num_cows))
+
+    def best_time(func):
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = func()
+            best = min(best, time.perf_counter() - start)
+        return best, result
+
+    per_cow_seconds, per_cow_slopes = best_time(
+        lambda: np.array([LinearRegression().fit(weeks[:, None], values[:, cow]).coef_[0] for cow in range(num_cows)]))
+    batched_seconds, (slopes, _, _, _) = best_time(lambda: fit_trends(values, weeks))
+    return {
+        'shape': [num_weeks, num_cows],
+        'per_cow_seconds': per_cow_seconds,
+        'batched_seconds': batched_seconds,
+        'speedup': per_cow_seconds / batched_seconds if batched_seconds > 0 else float('inf'),
+        'max_slope_difference': float(np.max(np.abs(slopes - per_cow_slopes))),
+    }
+
+if __name__ == "__main__":
+    results = benchmark_trends()
+    print(f"{results['shape'][1]} cows x {results['shape'][0]} weeks: sklearn per cow {results['per_cow_seconds']:.3f}s, "
+          f"batched {results['batched_seconds'] * 1000:.2f}ms, speedup {results['speedup']:.0f}x "
+          f"(max slope difference {results['max_slope_difference']:.2e})")
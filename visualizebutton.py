@@ -1,8 +1,26 @@
 # visualizebutton.py
 import tkinter as tk
-from tkinter import messagebox
+import json
+import os
+from tkinter import messagebox, ttk
 from utils import custom_error_messagebox, custom_visualize_messagebox
-from activity import plot_activity_levels  # Importing the backend function
+from backgroundjobs import get_background_jobs
+
+CONFIG_FILE = 'upload_config.json'
+
+# Fallback files used until data has been uploaded through the Upload Data window
+DEFAULT_FILE_PATHS = {
+    'activity': 'C:/Users/Jyothesh karnam/Desktop/Trail/TrailActivity.csv',  # Update this path as needed
+    'temperature': 'C:/Users/Jyothesh karnam/Desktop/Trail/trailTemp.csv',
+}
+
+def get_data_file_path(data_type):
+    config = {}
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'r') as f:
+            config = json.load(f)
+    config_key = 'activity_levels_file_path' if data_type == 'activity' else 'temperature_analysis_file_path'
+    return config.get(config_key) or DEFAULT_FILE_PATHS[data_type]
 
 class VisualizeDataApp:
     def __init__(self, root):
@@ -13,6 +31,10 @@ class VisualizeDataApp:
         self.main_frame = tk.Frame(self.root, bg='black')
         self.main_frame.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
 
+        self.jobs = get_background_jobs(self.root)
+        # A load still running when the window closes must not call back into its widgets
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
         self.create_visualize_interface()
 
         self.center_window(600, 300, 180)  # Adjusted the x_offset to move the window slightly to the right
@@ -49,6 +71,17 @@ class VisualizeDataApp:
         self.visualize_button = tk.Button(self.main_frame, text="Visualize", command=self.show_compare_dialog, bg='#2e8b57', fg='white', font=('Helvetica', 11, 'bold'), width=10, height=2, bd=0, highlightthickness=0)
         self.visualize_button.grid(row=2, column=0, columnspan=2, pady=(20, 10))  # Added vertical padding
 
+        # Progress shown while data loads in the background, hidden until then
+        self.status_frame = tk.Frame(self.main_frame, bg='black')
+        self.status_frame.grid(row=3, column=0, columnspan=2, pady=(0, 10))
+        self.status_label = tk.Label(self.status_frame, text="", bg='black', fg='white', font=('Helvetica', 10))
+        self.status_label.pack(side=tk.LEFT, padx=(0, 10))
+        self.progress_bar = ttk.Progressbar(self.status_frame, mode='indeterminate', length=120)
+        self.progress_bar.pack(side=tk.LEFT, padx=(0, 10))
+        self.cancel_button = tk.Button(self.status_frame, text="Cancel", command=self.cancel_loading, bg='#555555', fg='white', font=('Helvetica', 10), bd=0, highlightthickness=0)
+        self.cancel_button.pack(side=tk.LEFT)
+        self.status_frame.grid_remove()
+
         self.data_type = None
 
     def validate_cow_id(self, P):
@@ -94,10 +127,60 @@ class VisualizeDataApp:
             custom_error_messagebox("Error", "Please enter a Cow ID number.", self.root)
             return
 
-        file_path = 'C:/Users/Jyothesh karnam/Desktop/Trail/TrailActivity.csv'  # Update this path as needed
+        file_path = get_data_file_path(data_type)
+        # The backends pull in pandas and matplotlib, imported on the first chart rather than at startup
+        from activity import load_activity_series, draw_activity_levels
+        from temperature import load_temperature_series, draw_temperature_levels
+
+        # Load in a worker thread, repeated clicks for the same cows coalesce into the running load
+        loader, drawer = (load_activity_series, draw_activity_levels) if data_type == "activity" else (load_temperature_series, draw_temperature_levels)
+        self.show_progress(f"Loading {data_type} data for Cow ID {cow_id}...")
+        self.jobs.submit(
+            "visualize", loader, cow_id, compare_id or None, file_path,
+            on_done=lambda cow_data: self.on_data_loaded(data_type, drawer, cow_data, cow_id, compare_id or None),
+            on_error=self.on_load_error,
+            on_progress=lambda fraction, message: self.show_status(message),
+        )
+
+    def on_data_loaded(self, data_type, drawer, cow_data, cow_id, compare_id):
+        self.hide_progress()
+        from chartviews import get_chart_view
+        # Update the chart embedded in the main window, pop-out figures are only used without one
+        chart_view = get_chart_view(data_type)
+        if chart_view is not None:
+            chart_view.show(cow_data, cow_id, compare_id)
+        else:
+            drawer(cow_data, cow_id, compare_id)
 
-        if data_type == "activity":
-            plot_activity_levels(cow_id, compare_with_cow_id=compare_id, file_path=file_path)
+    def on_load_error(self, error):
+        if not self.root.winfo_exists():
+            return
+        self.hide_progress()
+        message = error.args[0] if isinstance(error, KeyError) and error.args else str(error)
+        custom_error_messagebox("Error", message, self.root)
+
+    def cancel_loading(self):
+        self.jobs.cancel("visualize")
+        self.hide_progress()
+
+    def close(self):
+        self.jobs.cancel("visualize")
+        self.root.destroy()
+
+    def show_status(self, message):
+        if self.status_label.winfo_exists():
+            self.status_label.config(text=message)
+
+    def show_progress(self, message):
+        self.status_label.config(text=message)
+        self.status_frame.grid()
+        self.progress_bar.start(10)
+
+    def hide_progress(self):
+        if not self.status_frame.winfo_exists():
+            return
+        self.progress_bar.stop()
+        self.status_frame.grid_remove()
 
     def center_window(self, width, height, x_offset=0):
         screen_width = self.root.winfo_screenwidth()